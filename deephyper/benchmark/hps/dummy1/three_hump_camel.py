@@ -2,6 +2,7 @@ import os
 from pprint import pprint
 import sys
 import argparse
+import numpy as np
 
 here = os.path.dirname(os.path.abspath(__file__))
 top = os.path.dirname(os.path.dirname(os.path.dirname(here)))
@@ -26,6 +27,14 @@ def run(param_dict):
     print("OUTPUT: ", result)
     return result
 
+def run_batch(param_dicts):
+    """Batch-capable ``run``: returns the objectives of a list of configs (``--eval-batch-size``)."""
+    x = np.array([d['x'] for d in param_dicts])
+    y = np.array([d['y'] for d in param_dicts])
+    penalty = np.array([d['penalty'] == 'yes' for d in param_dicts])
+    result = 2*x**2 - 1.05*x**4 + (1./6.)*x**6 + x*y + y**2 + 2.0*penalty
+    return result.tolist()
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument('--x', type=float, default=2.5)
@@ -2,6 +2,7 @@ import os
 from pprint import pprint
 import sys
 import argparse
+import numpy as np
 from numpy import float64
 import tensorflow as tf
 
@@ -26,6 +27,12 @@ def run(param_dict):
     print("OUTPUT:", result)
     return result
 
+def run_batch(param_dicts):
+    """Batch-capable ``run``: returns the objectives of a list of configs (``--eval-batch-size``)."""
+    x = np.array([[d[f'x{i}'] for i in range(1, 1+NDIM)] for d in param_dicts], dtype=float64)
+    result = np.sum(100*(x[:, 1:] - x[:, :-1]**2)**2 + (1 - x[:, :-1])**2, axis=1)
+    return result.tolist()
+
 
 def augment_parser(parser):
     for i in range(1, NDIM+1):
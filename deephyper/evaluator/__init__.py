@@ -3,4 +3,5 @@ The goal off the evaluator module is to have a set of objects which can helps us
 """
 
 from deephyper.evaluator.evaluate import Evaluator, Encoder
-__all__ = ['Evaluator', 'Encoder']
+from deephyper.evaluator.report import report_partial
+__all__ = ['Evaluator', 'Encoder', 'report_partial']
@@ -0,0 +1,181 @@
+from collections import namedtuple
+import asyncio
+import logging
+import os
+import shlex
+
+from deephyper.evaluator import affinity, evaluate, runner
+from deephyper.evaluator.report import PARTIAL_TAG, parse_partial
+
+logger = logging.getLogger(__name__)
+WaitResult = namedtuple('WaitResult', ['active', 'done', 'failed', 'cancelled'])
+
+class EvalFuture(asyncio.Future):
+    """Result of the task running an eval; cancelling it kills the process right away."""
+    def __init__(self, *, loop):
+        super().__init__(loop=loop)
+        self.partials = []
+        self.metrics = None
+        self.proc = None
+        self.task = None
+        self.worker_id = None
+
+    def cancel(self, *args, **kwargs):
+        if self.proc is not None and self.proc.returncode is None:
+            self.proc.kill()
+        if self.task is not None:
+            self.task.cancel()
+        return super().cancel(*args, **kwargs)
+
+class AsyncioEvaluator(evaluate.Evaluator):
+    """Evaluator using asyncio.
+
+    The ``AsyncioEvaluator`` runs every eval in a fresh ``runner.py`` process, like the ``SubprocessEvaluator``, but the processes are driven by ``asyncio.create_subprocess_exec`` on the event loop ``self.loop``. A search written as a coroutine running on this loop can ``await get_finished_evals_async()`` (or iterate ``async for x, y in as_completed()``) and react to every completion immediately instead of polling. ``add_eval`` only schedules the eval and can be called from coroutines. The synchronous ``Evaluator`` interface is also supported: it runs the loop until the requested evals complete.
+
+    Like with the ``SubprocessEvaluator``, each runner process is pinned to the cores of a worker without a running process (see ``affinity``).
+
+    Args:
+        run_function (func): takes one parameter of type dict and returns a scalar value.
+        cache_key (func): takes one parameter of type dict and returns a hashable type, used as the key for caching evaluations. Multiple inputs that map to the same hashable key will only be evaluated once. If ``None``, then cache_key defaults to a lossless (identity) encoding of the input dict.
+        **kwargs: options common to all evaluators, see ``Evaluator``.
+    """
+    MAX_OUTPUT = 65536 # last bytes of output kept to report a failure
+    READ_SIZE = 65536
+
+    def __init__(self, run_function, cache_key=None, **kwargs):
+        super().__init__(run_function, cache_key, **kwargs)
+        self.num_workers = self.WORKERS_PER_NODE
+        self.loop = asyncio.new_event_loop()
+        self._runner_args = shlex.split(self._runner_executable)
+        self._worker_cpus = self._cpu_blocks()
+        self._slots = {} # slot --> EvalFuture of the last eval started with its cores
+        logger.info(f"Asyncio Evaluator will execute {self._run_function.__name__}() from module {self._run_function.__module__}")
+
+    def _take_cpus(self, future):
+        """Cores of a worker slot without a running process, given to ``future``; ``None`` if the workers are not pinned."""
+        if self._worker_cpus is None: return None
+        slot = next((slot for slot in range(self.num_workers)
+                     if slot not in self._slots or self._slots[slot].done()), None)
+        if slot is None: return None
+        self._slots[slot] = future
+        return self._worker_cpus[slot]
+
+    async def _run(self, x, future):
+        cpus = self._take_cpus(future)
+        # the runner sends its result record through a dedicated pipe
+        read_fd, write_fd = os.pipe()
+        env = {runner.RESULT_FD_VAR: str(write_fd)}
+        if cpus is not None: env.update(affinity.runner_env(cpus))
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *self._runner_args, self.encode(x),
+                stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT,
+                pass_fds=(write_fd,), env=dict(os.environ, **env))
+        except BaseException:
+            os.close(read_fd)
+            raise
+        finally:
+            os.close(write_fd)
+        future.proc = proc
+        future.worker_id = proc.pid
+        output = bytearray() # end of the output, to report failures
+        tail = b''
+        with os.fdopen(read_fd, 'rb') as result_pipe:
+            try:
+                # read by chunks: progress bars can write long lines without a newline
+                while True:
+                    data = await proc.stdout.read(self.READ_SIZE)
+                    if not data: break
+                    output += data
+                    del output[:-self.MAX_OUTPUT]
+                    *lines, tail = (tail + data).split(b'\n')
+                    tail = tail[-self.MAX_OUTPUT:]
+                    for line in lines:
+                        if line.startswith(PARTIAL_TAG.encode()):
+                            partial = parse_partial(line.decode('utf-8', errors='replace'))
+                            if partial is not None: future.partials.append(partial)
+                retcode = await proc.wait()
+            finally:
+                # the process never outlives its task, whatever ended it
+                if proc.returncode is None:
+                    proc.kill()
+                    await proc.wait()
+            result = result_pipe.read().decode('utf-8', errors='replace')
+        if not result:
+            raise RuntimeError(f"Eval failed without a result: {output.decode('utf-8', errors='replace')}")
+        y, future.metrics, ok = self._parse_result(result)
+        if not ok or retcode != 0:
+            raise RuntimeError(f"Eval failed with exit code {retcode}")
+        return y
+
+    def _eval_exec(self, x):
+        assert isinstance(x, dict)
+        future = EvalFuture(loop=self.loop)
+        future.task = self.loop.create_task(self._run(x, future))
+        future.task.add_done_callback(lambda task: self._chain(task, future))
+        return future
+
+    @staticmethod
+    def _chain(task, future):
+        if future.done(): return
+        if task.cancelled():
+            future.cancel()
+        elif task.exception() is not None:
+            future.set_exception(task.exception())
+        else:
+            future.set_result(task.result())
+
+    def shutdown(self):
+        if self.loop.is_closed(): return
+        tasks = [future.task for future in self._running_futures()]
+        super().shutdown()
+        async def drain():
+            # the tasks kill their process on cancellation
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self.loop.run_until_complete(drain())
+        self.loop.close()
+
+    @staticmethod
+    def _classify(futures):
+        done, failed, cancelled, active = [], [], [], []
+        for f in futures:
+            if not f.done(): active.append(f)
+            elif f.cancelled(): cancelled.append(f)
+            elif f.exception() is not None: failed.append(f)
+            else: done.append(f)
+        return WaitResult(active=active, done=done, failed=failed, cancelled=cancelled)
+
+    def wait(self, futures, timeout=None, return_when='ANY_COMPLETED'):
+        futures = list(futures)
+        if futures:
+            return_when = return_when.replace('ANY', 'FIRST')
+            self.loop.run_until_complete(
+                asyncio.wait(futures, timeout=timeout, return_when=return_when))
+        results = self._classify(futures)
+        if results.active and return_when == 'ALL_COMPLETED':
+            raise TimeoutError(f'{timeout} sec timeout expired while '
+            f'waiting on {len(futures)} tasks until {return_when}')
+        return results
+
+    async def get_finished_evals_async(self):
+        """Wait until some requested evals are finished.
+
+        Returns:
+            list: ``(x, y)`` tuples of all the requested evals finished so far, at least one unless nothing is pending.
+        """
+        while not self._ready_requests and self.pending_evals:
+            self._kill_expired()
+            if self._ready_requests or not self.pending_evals: break
+            self._speculate()
+            timeout = min((t for t in (self._next_deadline_sec(), self._next_speculation_sec())
+                           if t is not None), default=None)
+            done, _ = await asyncio.wait(self._running_futures(), timeout=timeout,
+                                         return_when='FIRST_COMPLETED')
+            self._collect(f for f in done if not f.cancelled())
+        return list(self._read_ready_requests())
+
+    async def as_completed(self):
+        """Asynchronously iterate over the ``(x, y)`` results of the requested evals as they complete, until none is pending."""
+        while self.pending_evals or self._ready_requests:
+            for x_y in await self.get_finished_evals_async():
+                yield x_y
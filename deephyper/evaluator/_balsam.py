@@ -1,44 +1,106 @@
+import importlib
 import logging
 import os
 import json
+import time
 from io import StringIO
 
 from django.db import transaction
 from django.core.exceptions import ObjectDoesNotExist
 from balsam.launcher import dag
-from balsam.launcher.async import FutureTask
-from balsam.launcher.async import wait as balsam_wait
+try:
+    from balsam.launcher.futures import FutureTask, WaitResult, _to_state
+except ImportError: # balsam < 0.3.8; ``async`` is a keyword since Python 3.7
+    _futures = importlib.import_module('balsam.launcher.async')
+    FutureTask, WaitResult, _to_state = _futures.FutureTask, _futures.WaitResult, _futures._to_state
 from balsam.core.models import ApplicationDefinition as AppDef
+from balsam.core.models import BalsamJob, END_STATES
 
-from deephyper.evaluator import Evaluator
+from deephyper.evaluator import Evaluator, affinity, runner
 logger = logging.getLogger(__name__)
 
+def _result_file(jobname):
+    """Result record written by ``runner.py`` in the working directory of a job."""
+    return f'{jobname}.result.json'
+
 LAUNCHER_NODES = int(os.environ.get('BALSAM_LAUNCHER_NODES', 1))
+CORES_PER_NODE = int(os.environ.get('DEEPHYPER_CORES_PER_NODE', 64))
 class BalsamEvaluator(Evaluator):
     """Evaluator using balsam software.
 
     Documentation to balsam : https://balsam.readthedocs.io
     This class helps us to run task on HPC systems with more flexibility and ease of use.
+    Each job gets ``threads_per_rank`` cores, an equal share of the ``DEEPHYPER_CORES_PER_NODE`` cores (64 by default) of a compute node among the ``WORKERS_PER_NODE`` jobs packed on it, and its thread pools are sized accordingly (see ``affinity``); the launcher pins the job to its cores.
+    The evals which can start together, e.g. after ``add_eval_batch``, are inserted in the Balsam DB with a single bulk insert. While waiting, a single query per ``POLL_PERIOD`` fetches the jobs which reached an end state, whatever the number of pending jobs. The objective of a finished job is read from the result record that ``runner.py`` writes in its working directory, not from its output.
+    The partial objectives of a job are written by ``runner.py`` to its result record too, which is only read when the job ends or is killed: they are not known while it runs, so ``stop_losing_evals`` cannot stop the losing Balsam evals.
 
     Args:
         run_function (func): takes one parameter of type dict and returns a scalar value.
         cache_key (func): takes one parameter of type dict and returns a hashable type, used as the key for caching evaluations. Multiple inputs that map to the same hashable key will only be evaluated once. If ``None``, then cache_key defaults to a lossless (identity) encoding of the input dict.
+        **kwargs: options common to all evaluators, see ``Evaluator``.
     """
-    def __init__(self, run_function, cache_key=None):
-        super().__init__(run_function, cache_key)
+    POLL_PERIOD = 0.2 # sec between two queries for finished jobs
+
+    def __init__(self, run_function, cache_key=None, **kwargs):
+        super().__init__(run_function, cache_key, **kwargs)
         self.id_key_map = {}
         self.num_workers = max(1, LAUNCHER_NODES*self.WORKERS_PER_NODE - 2)
+        self._num_jobs = 0
+        # the cores of a compute node are shared by the jobs packed on it
+        self.threads_per_rank = max(1, CORES_PER_NODE // self.WORKERS_PER_NODE)
         logger.info("Balsam Evaluator instantiated")
         logger.debug(f"LAUNCHER_NODES = {LAUNCHER_NODES}")
         logger.debug(f"WORKERS_PER_NODE = {self.WORKERS_PER_NODE}")
+        logger.info(f"{self.WORKERS_PER_NODE} jobs per node of {CORES_PER_NODE} cores: "
+                    f"{self.threads_per_rank} threads per job")
         logger.debug(f"Total number of workers: {self.num_workers}")
         logger.info(f"Backend runs will use Python: {self.PYTHON_EXE}")
         self._init_app()
         logger.info(f"Backend runs will execute function: {self.appName}")
         self.transaction_context = transaction.atomic
+        self._objectives = {} # job pk --> objective read from the result record of the finished job
 
     def wait(self, futures, timeout=None, return_when='ANY_COMPLETED'):
-        return balsam_wait(futures, timeout=timeout, return_when=return_when)
+        futures = {future._job.pk: future for future in futures}
+        active = {pk for pk, future in futures.items() if future._state == 'active'}
+        waitall = return_when == 'ALL_COMPLETED'
+        start = time.time()
+        while True:
+            if active:
+                # only the finished jobs are transferred: no row for the running ones
+                for job in BalsamJob.objects.filter(pk__in=active, state__in=END_STATES):
+                    future = futures[job.pk]
+                    future._job = job
+                    future._state = _to_state(job.state)
+                    if future._state == 'done': self._read_result(future)
+                    active.discard(job.pk)
+            num_finished = len(futures) - len(active)
+            if not active or (num_finished and not waitall): break
+            remaining = None if timeout is None else timeout - (time.time() - start)
+            if remaining is not None and remaining <= 0: break
+            time.sleep(self.POLL_PERIOD if remaining is None else min(self.POLL_PERIOD, remaining))
+
+        if waitall and active:
+            raise TimeoutError(f'{timeout} sec timeout expired while '
+            f'waiting on {len(futures)} tasks until {return_when}')
+        results = {'active': [], 'done': [], 'failed': [], 'cancelled': []}
+        for future in futures.values(): results[future._state].append(future)
+        return WaitResult(**results)
+
+    def _kill(self, future):
+        future.cancel()
+        record = self._result_record(future._job)
+        if record is not None:
+            future.partials = [tuple(partial) for partial in record.get('partials', [])]
+        return None
+
+    @staticmethod
+    def _result_record(job):
+        """Result record written by ``runner.py`` for ``job``, or ``None`` if there is none yet."""
+        try:
+            return runner.decode_result(job.read_file_in_workdir(_result_file(job.name)))
+        except Exception:
+            return None
 
     def _init_app(self):
         funcName = self._run_function.__name__
@@ -54,53 +116,77 @@ class BalsamEvaluator(Evaluator):
             logger.info(f"BalsamEvaluator will use existing app {self.appName}: {app.executable}")
 
     def _eval_exec(self, x):
-        jobname = f"task{self.counter}"
+        return self._eval_exec_batch([x])[0]
+
+    def _eval_exec_batch(self, XX):
+        jobs = [self._create_job(x) for x in XX]
+        BalsamJob.objects.bulk_create(jobs) # within self.transaction_context
+        logger.debug(f"Created {len(jobs)} jobs")
+
+        futures = []
+        for job in jobs:
+            future = FutureTask(job, self._on_done, fail_callback=self._on_fail)
+            future.task_args = job.args
+            future.partials = []
+            future.metrics = future.worker_id = None
+            futures.append(future)
+        return futures
+
+    def _create_job(self, x):
+        """Build the unsaved ``BalsamJob`` of ``x``."""
+        self._num_jobs += 1
+        jobname = f"task{self._num_jobs}"
         args = f"'{self.encode(x)}'"
-        envs = f"KERAS_BACKEND={self.KERAS_BACKEND}"
-        #envs = ":".join(f'KERAS_BACKEND={self.KERAS_BACKEND} OMP_NUM_THREADS=62 KMP_BLOCKTIME=0 KMP_AFFINITY=\"granularity=fine,compact,1,0\"'.split())
         resources = {
             'num_nodes': 1,
             'ranks_per_node': 1,
-            'threads_per_rank': 64,
+            'threads_per_rank': self.threads_per_rank,
             'node_packing_count': self.WORKERS_PER_NODE,
         }
         for key in resources:
             if key in x: resources[key] = x[key]
+        env = {'KERAS_BACKEND': self.KERAS_BACKEND, runner.RESULT_FILE_VAR: _result_file(jobname)}
+        if self.CPU_BINDING:
+            env.update(affinity.thread_env(resources['threads_per_rank']))
+        envs = ":".join(f'{var}={value}' for var, value in env.items())
 
         if dag.current_job is not None: wf = dag.current_job.workflow
         else: wf = self.appName
-        task = dag.add_job(
+        job = dag.add_job(
                     name = jobname,
                     workflow = wf,
                     application = self.appName,
                     args = args,
                     environ_vars = envs,
+                    save = False,
                     **resources
                    )
         logger.debug(f"Created job {jobname}")
         logger.debug(f"Args: {args}")
+        return job
 
-        future = FutureTask(task, self._on_done, fail_callback=self._on_fail)
-        future.task_args = args
-        return future
+    def _read_result(self, future):
+        """Read the result record of the finished job of ``future``: its objective, its worker metrics and the worker (``host:pid``) which ran it."""
+        job = future._job
+        record = self._result_record(job)
+        if record is None:
+            logger.error(f"Job {job.name} ended without a result record")
+            self._objectives[job.pk] = self.FAIL_RETURN_VALUE
+            return
+        y, future.metrics, _ = Evaluator._parse_record(record)
+        future.partials = [tuple(partial) for partial in record.get('partials', [])]
+        if 'host' in future.metrics:
+            future.worker_id = f"{future.metrics['host']}:{future.metrics['pid']}"
+        self._objectives[job.pk] = y
 
-    @staticmethod
-    def _on_done(job): #def _on_done(job, process_data):
-        output = job.read_file_in_workdir(f'{job.name}.out')
-        # process_data(job)
-        #args = job.args
-        #args = args.replace("\'", "")
-        #with open('test.json', 'w') as f:
-        #    f.write(args)
-        #
-        #with open('test.json', 'r') as f:
-        #    args = json.load(f)
-        output = Evaluator._parse(output)
-        #job.data['reward'] = output
-        #job.data['arch_seq'] = args['arch_seq']
-        #job.data['id_worker'] = args['w']
-        #job.save()
-        return output
+    def _on_done(self, job):
+        if job.pk in self._objectives:
+            return self._objectives.pop(job.pk)
+        record = self._result_record(job)
+        if record is None:
+            logger.error(f"Job {job.name} ended without a result record")
+            return Evaluator.FAIL_RETURN_VALUE
+        return Evaluator._parse_record(record)[0]
 
     @staticmethod
     def _on_fail(job):
@@ -0,0 +1,224 @@
+from collections import deque, namedtuple
+from concurrent.futures import Future
+from concurrent.futures import wait as _futures_wait
+from concurrent.futures import CancelledError
+import atexit
+import itertools
+import logging
+import time
+
+from mpi4py import MPI
+
+from deephyper.evaluator import evaluate
+from deephyper.evaluator.report import call_with_reporter
+
+logger = logging.getLogger(__name__)
+WaitResult = namedtuple('WaitResult', ['active', 'done', 'failed', 'cancelled'])
+
+TASK_TAG, RESULT_TAG, PARTIAL_TAG, STOP_TAG, ABORT_TAG = range(5)
+POLL_PERIOD = 0.005 # sec between two probes while waiting with a timeout
+
+class EvalAborted(Exception):
+    """Raised in the run function of an eval killed by rank 0."""
+
+def _check_abort(comm, token):
+    """Raise ``EvalAborted`` if rank 0 killed the eval ``token``."""
+    while comm.Iprobe(source=0, tag=ABORT_TAG):
+        # abort messages of evals which already finished are dropped
+        if comm.recv(source=0, tag=ABORT_TAG) == token:
+            raise EvalAborted("Eval killed by rank 0")
+
+def _run(comm, run_function, x, token):
+    """Evaluate ``x``; whether rank 0 killed the eval is checked at each partial objective reported and at the end."""
+    def reporter(step, objective):
+        _check_abort(comm, token)
+        comm.send((token, step, objective), dest=0, tag=PARTIAL_TAG)
+    y = call_with_reporter(run_function, x, reporter)
+    _check_abort(comm, token)
+    return y
+
+def serve(comm, run_function):
+    """Worker loop of the ranks other than 0: evaluate the configs sent by rank 0 until it sends a stop message."""
+    status = MPI.Status()
+    while True:
+        msg = comm.recv(source=0, tag=MPI.ANY_TAG, status=status)
+        if status.Get_tag() == STOP_TAG:
+            break
+        if status.Get_tag() == ABORT_TAG:
+            continue # the eval finished before the abort message arrived
+        token, x = msg
+        try:
+            reply = (token, True, _run(comm, run_function, x, token))
+        except Exception as e:
+            reply = (token, False, f'{type(e).__name__}: {e}')
+        comm.send(reply, dest=0, tag=RESULT_TAG)
+
+
+class MPIEvaluator(evaluate.Evaluator):
+    """Evaluator using MPI.
+
+    The ``MPIEvaluator`` uses ``mpi4py`` and no database: the search script must be launched on all the ranks, e.g. ``mpirun -n 65 python -m deephyper.search.hps.ambs --evaluator mpi ...``. Rank 0 runs the search while every other rank imports the run function once, then serves evals as a persistent worker: on these ranks ``is_worker`` is ``True`` and the script must call ``serve()``, which returns once rank 0 stops the workers, instead of using the evaluator. Configs and objectives are exchanged as MPI messages, so the number of workers is the number of ranks minus one.
+
+    A killed eval (timed out, stopped or a losing duplicate) is aborted on its rank: rank 0 sends it an abort message that the rank checks each time the run function reports a partial objective (see ``report_partial``), where ``EvalAborted`` is raised. A run function which does not report runs until it returns, and its rank is not given another eval before it replied.
+
+    The evaluator does not pin the ranks to cores (see ``affinity``): their placement is set by the MPI launcher, e.g. ``mpirun --map-by node:PE=<cores per rank> --bind-to core``, and their thread pools can be sized with ``OMP_NUM_THREADS`` (``mpirun -x``).
+
+    Args:
+        run_function (func): takes one parameter of type dict and returns a scalar value.
+        cache_key (func): takes one parameter of type dict and returns a hashable type, used as the key for caching evaluations. Multiple inputs that map to the same hashable key will only be evaluated once. If ``None``, then cache_key defaults to a lossless (identity) encoding of the input dict.
+        comm (MPI.Comm): communicator of the search; ``MPI.COMM_WORLD`` by default.
+        **kwargs: options common to all evaluators, see ``Evaluator``.
+    """
+    SUPPORTS_BATCH = True
+
+    def __init__(self, run_function, cache_key=None, comm=None, **kwargs):
+        self.comm = MPI.COMM_WORLD if comm is None else comm
+        if self.comm.Get_size() < 2:
+            raise RuntimeError("MPIEvaluator needs at least 2 ranks: run the search with mpirun -n <1 + number of workers>")
+        self.is_worker = self.comm.Get_rank() != 0
+        if self.is_worker:
+            self._run_function = run_function
+            self.num_workers = self.comm.Get_size() - 1
+            return
+
+        super().__init__(run_function, cache_key, **kwargs)
+        self.num_workers = self.comm.Get_size() - 1
+        self._idle = deque(range(1, self.comm.Get_size()))
+        self._backlog = deque() # (token, x) waiting for an idle rank
+        self._futures = {} # token --> Future of the evals sent to a rank
+        self._aborting = set() # tokens of the killed evals whose rank did not reply yet
+        self._freed = False # a rank of a killed eval replied since the last dispatch
+        self._tokens = itertools.count()
+        self._status = MPI.Status()
+        atexit.register(self.shutdown)
+        logger.info(f"MPI Evaluator will execute {self._run_function.__name__}() from module {self._run_function.__module__} on {self.num_workers} ranks")
+
+    def _eval_exec(self, x):
+        assert isinstance(x, (dict, list))
+        token = next(self._tokens)
+        future = Future()
+        future.token = token
+        future.partials = []
+        future.worker_id = future.started_at = None
+        self._futures[token] = future
+        self._backlog.append((token, x))
+        self._send()
+        return future
+
+    def _send(self):
+        while self._backlog and self._idle:
+            token, x = self._backlog.popleft()
+            future = self._futures[token]
+            if future.cancelled():
+                del self._futures[token]
+                continue
+            rank = self._idle.popleft()
+            future.worker_id = rank
+            future.started_at = time.time()
+            future.set_running_or_notify_cancel()
+            self.comm.send((token, x), dest=rank, tag=TASK_TAG)
+
+    def _receive(self):
+        msg = self.comm.recv(source=MPI.ANY_SOURCE, tag=MPI.ANY_TAG, status=self._status)
+        if self._status.Get_tag() == PARTIAL_TAG:
+            token, step, objective = msg
+            self._futures[token].partials.append((step, objective))
+            return
+        token, ok, value = msg
+        self._idle.append(self._status.Get_source())
+        future = self._futures.pop(token)
+        if token in self._aborting:
+            self._aborting.discard(token)
+            self._freed = True
+        if future.cancelled(): pass
+        elif ok: future.set_result(value)
+        else: future.set_exception(RuntimeError(f"Eval failed on rank {future.worker_id}: {value}"))
+        self._send()
+
+    def _service(self, timeout=0):
+        """Handle the messages from the workers, waiting up to ``timeout`` sec for the first one (forever if ``None``)."""
+        received = timeout is None and bool(self._futures)
+        if received: self._receive()
+        deadline = time.time() + (timeout or 0)
+        while True:
+            while self.comm.Iprobe(source=MPI.ANY_SOURCE, tag=MPI.ANY_TAG):
+                self._receive()
+                received = True
+            if received or time.time() >= deadline: break
+            time.sleep(POLL_PERIOD)
+
+    def _read_partials(self):
+        self._service(0)
+
+    def _kill(self, future):
+        if future.cancel():
+            return None # not sent to a rank yet
+        # the rank stays busy until it replies, and its reply is then dropped
+        self._aborting.add(future.token)
+        self.comm.send(future.token, dest=future.worker_id, tag=ABORT_TAG)
+        return None
+
+    def _num_idle_workers(self):
+        return super()._num_idle_workers() - len(self._aborting)
+
+    def num_free_workers(self):
+        return max(super().num_free_workers() - len(self._aborting), 0)
+
+    def serve(self):
+        """Entry point of the ranks other than 0: evaluate the configs sent by rank 0 until it stops the workers."""
+        if not self.is_worker:
+            raise RuntimeError("serve() is called on the worker ranks, rank 0 runs the search")
+        serve(self.comm, self._run_function)
+
+    def shutdown(self):
+        """Kill the pending evals and stop the worker ranks; also called at exit."""
+        atexit.unregister(self.shutdown)
+        super().shutdown()
+        for rank in range(1, self.comm.Get_size()):
+            self.comm.send(None, dest=rank, tag=STOP_TAG)
+        self._idle.clear()
+
+    def wait(self, futures, timeout=None, return_when='ANY_COMPLETED'):
+        futures = list(futures)
+        if not futures and self._aborting:
+            # only ranks of killed evals are busy: wait for one of them
+            self._service(timeout)
+        try:
+            return self._wait(futures, timeout, return_when)
+        finally:
+            if self._freed:
+                self._freed = False
+                self._dispatch()
+
+    def _wait(self, futures, timeout, return_when):
+        start = time.time()
+        while True:
+            self._service(0)
+            num_done = sum(f.done() for f in futures)
+            if num_done == len(futures) or (num_done and return_when == 'ANY_COMPLETED'):
+                break
+            remaining = None if timeout is None else timeout - (time.time() - start)
+            if remaining is not None and remaining <= 0:
+                break
+            self._service(min(remaining, 1.0) if remaining is not None else None)
+        results = _futures_wait(futures, timeout=0)
+        done, failed, cancelled = [],[],[]
+        active = list(results.not_done)
+        if len(active) > 0 and return_when=='ALL_COMPLETED':
+            raise TimeoutError(f'{timeout} sec timeout expired while '
+            f'waiting on {len(futures)} tasks until {return_when}')
+        for res in results.done:
+            try:
+                res.result(timeout=0)
+            except CancelledError:
+                cancelled.append(res)
+            except Exception:
+                failed.append(res)
+            else:
+                done.append(res)
+        return WaitResult(
+            active=active,
+            done=done,
+            failed=failed,
+            cancelled=cancelled
+        )
@@ -2,37 +2,194 @@ from collections import namedtuple
 from concurrent.futures import ProcessPoolExecutor
 from concurrent.futures import wait as _futures_wait
 from concurrent.futures import CancelledError
+import itertools
 import logging
+import multiprocessing
 import os
-from deephyper.evaluator import evaluate
+import queue
+import signal
+import time
+from deephyper.evaluator import affinity, evaluate
+from deephyper.evaluator.report import call_with_reporter
 logger = logging.getLogger(__name__)
 WaitResult = namedtuple('WaitResult', ['active', 'done', 'failed', 'cancelled'])
 
+STARTED_MSG, PARTIAL_MSG, ENDED_MSG = range(3) # kinds of the messages of the partials queue
+ABORT_RING = 4096 # the killed evals are flagged in a ring of this size, indexed by token
+
+# set in each pool process
+_partials_queue = None
+_aborts = None # token of a killed eval, at its index in the ring
+
+class EvalAborted(Exception):
+    """Raised in the run function of an eval killed by the evaluator."""
+
+def _init_process(partials_queue, aborts, cpu_blocks=None):
+    global _partials_queue, _aborts
+    _partials_queue = partials_queue
+    _aborts = aborts
+    if cpu_blocks is not None:
+        # each pool process takes the cores of one worker
+        try:
+            affinity.pin(cpu_blocks.get(timeout=5))
+        except queue.Empty:
+            pass
+
+def _on_alarm(signum, frame):
+    raise TimeoutError("Eval exceeded its timeout")
+
+def _check_abort(token):
+    if _aborts[token % ABORT_RING] == token:
+        raise EvalAborted("Eval killed by the evaluator")
+
+def _run(run_function, x, token, timeout=None):
+    """Run in a pool process.
+
+    The start of the eval, with the pid of the process, its partial objectives and its end are sent back to the evaluator through the partials queue, tagged with ``token``. Whether the evaluator killed the eval is checked before it starts, at each partial objective reported and when it returns. If ``timeout`` is given, a ``SIGALRM`` interrupts the run after ``timeout`` seconds so that the process is freed.
+    """
+    def reporter(step, objective):
+        _check_abort(token)
+        _partials_queue.put((PARTIAL_MSG, token, (step, objective)))
+    _partials_queue.put((STARTED_MSG, token, (time.time(), os.getpid())))
+    try:
+        _check_abort(token)
+        if timeout is None:
+            y = call_with_reporter(run_function, x, reporter)
+        else:
+            previous = signal.signal(signal.SIGALRM, _on_alarm)
+            signal.setitimer(signal.ITIMER_REAL, timeout)
+            try:
+                y = call_with_reporter(run_function, x, reporter)
+            finally:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+                signal.signal(signal.SIGALRM, previous)
+        _check_abort(token)
+        return y
+    finally:
+        _partials_queue.put((ENDED_MSG, token, None))
+
 class ProcessPoolEvaluator(evaluate.Evaluator):
     """Evaluator using ProcessPoolExecutor.
 
     The ProcessPoolEvaluator use the ``concurrent.futures.ProcessPoolExecutor`` class. The processes doesn't share memory but they are forked from the mother process so imports done before are done repeated. Be carefull if your ``run_function`` is loading an package such as tensorflow it can hang.
 
+    A killed eval (timed out, stopped or a losing duplicate) is flagged in memory shared with the pool processes, and ``EvalAborted`` is raised in its run function when it reports its next partial objective (see ``report_partial``). A run function which does not report runs until it returns, or until ``eval_timeout``, and its process is not counted as free before the eval stopped. ``shutdown`` waits ``SHUTDOWN_TIMEOUT`` sec for the killed evals to stop, then terminates the pool processes.
+
+    With ``start_method='forkserver'`` the pool processes are instead forked from a template process, a fresh interpreter which imports the ``preload`` modules once: every pool process starts with these modules already loaded but without the state of the search, such as an initialized TensorFlow runtime, so forking is safe. The template process is shared by all the evaluators of a search: only the ``preload`` of the first one is imported.
+
     Args:
         run_function (func): takes one parameter of type dict and returns a scalar value.
         cache_key (func): takes one parameter of type dict and returns a hashable type, used as the key for caching evaluations. Multiple inputs that map to the same hashable key will only be evaluated once. If ``None``, then cache_key defaults to a lossless (identity) encoding of the input dict.
+        start_method (str): ``multiprocessing`` start method of the pool processes: ``'fork'``, ``'forkserver'`` or ``'spawn'``. Defaults to ``DEEPHYPER_START_METHOD``, or to the ``multiprocessing`` default if unset.
+        preload (list): with ``'forkserver'``, names of the modules imported once by the template process, e.g. ``['numpy', 'tensorflow']``. Defaults to the comma-separated ``DEEPHYPER_PRELOAD``, or to ``numpy`` and the module of ``run_function``.
+        **kwargs: options common to all evaluators, see ``Evaluator``.
     """
-    def __init__(self, run_function, cache_key=None):
-        super().__init__(run_function, cache_key)
+    SUPPORTS_BATCH = True
+    SHUTDOWN_TIMEOUT = 10 # sec given to the killed evals to stop before the pool processes are terminated
+
+    def __init__(self, run_function, cache_key=None, start_method=None, preload=None, **kwargs):
+        super().__init__(run_function, cache_key, **kwargs)
         self.num_workers = self.WORKERS_PER_NODE
+        ctx = multiprocessing.get_context(start_method or os.environ.get('DEEPHYPER_START_METHOD'))
+        if ctx.get_start_method() == 'forkserver':
+            if preload is None:
+                preload = os.environ.get('DEEPHYPER_PRELOAD')
+                preload = preload.split(',') if preload else ['numpy', self._run_function.__module__]
+            ctx.set_forkserver_preload(preload)
+            logger.info(f"Pool processes are forked from a template process preloading {preload}")
+        self._partials_queue = ctx.Queue()
+        self._futures = {} # token --> Future, until the eval ends
+        self._aborting = {} # token --> Future of the killed evals which did not stop yet
+        self._tokens = itertools.count()
+        self._aborts = ctx.RawArray('q', [-1] * ABORT_RING)
+        blocks = self._cpu_blocks()
+        self._cpu_queue = None
+        if blocks is not None:
+            self._cpu_queue = ctx.Queue()
+            for cpus in blocks: self._cpu_queue.put(cpus)
         self.executor = ProcessPoolExecutor(
-            max_workers = self.num_workers
+            max_workers = self.num_workers,
+            mp_context = ctx,
+            initializer = _init_process,
+            initargs = (self._partials_queue, self._aborts, self._cpu_queue)
         )
         logger.info(f"ProcessPool Evaluator will execute {self._run_function.__name__}() from module {self._run_function.__module__}")
 
     def _eval_exec(self, x):
-        assert isinstance(x, dict)
-        future = self.executor.submit(self._run_function, x)
+        assert isinstance(x, (dict, list))
+        token = next(self._tokens)
+        future = self.executor.submit(_run, self._run_function, x, token, self.eval_timeout)
+        future.token = token
+        future.partials = []
+        future.worker_id = future.started_at = None
+        self._futures[token] = future
         return future
 
+    def _read_partials(self):
+        while True:
+            try:
+                kind, token, value = self._partials_queue.get_nowait()
+            except queue.Empty:
+                break
+            if kind == STARTED_MSG:
+                future = self._futures[token]
+                future.started_at, future.worker_id = value
+            elif kind == PARTIAL_MSG:
+                self._futures[token].partials.append(value)
+            else:
+                self._futures.pop(token, None)
+
+    def _kill(self, future):
+        if future.cancel():
+            del self._futures[future.token]
+            return None # not given to a pool process yet
+        # the process stays busy until the eval stopped, and its result is then dropped
+        self._aborts[future.token % ABORT_RING] = future.token
+        self._aborting[future.token] = future
+        return None
+
+    def _release_aborted(self):
+        """Forget the killed evals which stopped.
+
+        Returns:
+            int: the number of pool processes freed.
+        """
+        stopped = [token for token, future in self._aborting.items() if future.done()]
+        for token in stopped: del self._aborting[token]
+        return len(stopped)
+
+    def _num_idle_workers(self):
+        self._release_aborted()
+        return super()._num_idle_workers() - len(self._aborting)
+
+    def num_free_workers(self):
+        self._release_aborted()
+        return max(super().num_free_workers() - len(self._aborting), 0)
+
+    def shutdown(self):
+        super().shutdown()
+        deadline = time.time() + self.SHUTDOWN_TIMEOUT
+        while self._aborting and time.time() < deadline:
+            self.wait([], timeout=deadline - time.time())
+        if self._aborting:
+            logger.warning(f"{len(self._aborting)} killed evals did not stop after "
+                           f"{self.SHUTDOWN_TIMEOUT} sec: terminating the pool processes")
+            for process in list(self.executor._processes.values()): process.terminate()
+        self.executor.shutdown(wait=True)
+
     def wait(self, futures, timeout=None, return_when='ANY_COMPLETED'):
+        futures = list(futures)
         return_when=return_when.replace('ANY','FIRST')
-        results = _futures_wait(futures, timeout=timeout, return_when=return_when)
+        self._read_partials()
+        aborting = list(self._aborting.values()) if return_when == 'FIRST_COMPLETED' else []
+        try:
+            # the process of a killed eval which stops can take a queued eval
+            results = _futures_wait(futures + aborting, timeout=timeout, return_when=return_when)
+        finally:
+            if self._release_aborted(): self._dispatch()
+        # start messages of the evals which just finished
+        self._read_partials()
+        results = _futures_wait(futures, timeout=0)
         done, failed, cancelled = [],[],[]
         active = list(results.not_done)
         if len(active) > 0 and return_when=='ALL_COMPLETED':
@@ -43,10 +200,9 @@ class ProcessPoolEvaluator(evaluate.Evaluator):
                 res.result(timeout=0)
             except CancelledError:
                 cancelled.append(res)
-            except Exception as e:
-                logger.exception("Eval exception:")
-                res.set_result(evaluate.Evaluator.FAIL_RETURN_VALUE)
-                res.set_exception(None)
+            except Exception:
+                # the exception is logged and turned into FAIL_RETURN_VALUE
+                # when the evaluator collects the result
                 failed.append(res)
             else:
                 done.append(res)
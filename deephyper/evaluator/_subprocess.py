@@ -1,54 +1,265 @@
-from collections import namedtuple, defaultdict
+from collections import namedtuple, defaultdict, deque
 import logging
+import os
+import selectors
+import shlex
 import subprocess
 import time
-import sys
 
-from deephyper.evaluator import evaluate
+from deephyper.evaluator import affinity, evaluate, runner
+from deephyper.evaluator.report import PARTIAL_TAG, parse_partial
 
 logger = logging.getLogger(__name__)
 
+class OutputMonitor:
+    """Drains the stdout pipes of many child processes without blocking.
+
+    Registered pipes are watched with a ``selectors`` selector, so a single ``poll`` call reads whatever output is available on any of them and returns as soon as one child writes or exits. ``callback(data)`` is called with every chunk read from a pipe and with ``b''`` once the pipe is closed.
+    """
+    def __init__(self):
+        self._selector = selectors.DefaultSelector()
+
+    def register(self, pipe, callback):
+        os.set_blocking(pipe.fileno(), False)
+        self._selector.register(pipe, selectors.EVENT_READ, callback)
+
+    def unregister(self, pipe):
+        try: self._selector.unregister(pipe)
+        except (KeyError, ValueError): pass
+
+    def poll(self, timeout=0):
+        """Process available output, waiting at most ``timeout`` seconds (forever if ``None``) for some."""
+        if not self._selector.get_map():
+            return
+        for key, _ in self._selector.select(timeout):
+            try:
+                data = os.read(key.fd, 65536)
+            except BlockingIOError:
+                continue
+            if not data:
+                self._selector.unregister(key.fileobj)
+            key.data(data)
+
+
+def _popen_options(cpus, env=None):
+    """``Popen`` keyword arguments starting a child with the variables ``env`` set and pinned to ``cpus`` (see ``affinity``)."""
+    env = dict(env or {})
+    if cpus is not None: env.update(affinity.runner_env(cpus))
+    return dict(env=dict(os.environ, **env)) if env else {}
+
+
 class PopenFuture:
+    """Eval run by a fresh ``runner.py`` process.
+
+    The runner sends its result record through a dedicated pipe; its output is only scanned for ``DH-PARTIAL:`` lines and only its last ``MAX_OUTPUT`` bytes are kept, to report failures.
+    """
     FAIL_RETURN_VALUE = evaluate.Evaluator.FAIL_RETURN_VALUE
+    MAX_OUTPUT = 65536
 
-    def __init__(self, args, parse_fxn):
-        self.proc = subprocess.Popen(args, shell=True, stdout=subprocess.PIPE,
-                                     stderr=subprocess.STDOUT, encoding='utf-8')
+    def __init__(self, args, parse_fxn, monitor, cpus=None):
+        read_fd, write_fd = os.pipe()
+        try:
+            self.proc = subprocess.Popen(args, shell=True, stdout=subprocess.PIPE,
+                                         stderr=subprocess.STDOUT, pass_fds=(write_fd,),
+                                         **_popen_options(cpus, {runner.RESULT_FD_VAR: str(write_fd)}))
+        except BaseException:
+            os.close(read_fd)
+            raise
+        finally:
+            os.close(write_fd)
+        self._result_pipe = os.fdopen(read_fd, 'rb')
+        self.worker_id = self.proc.pid
         self._state = 'active'
         self._result = None
+        self.metrics = None
         self._parse = parse_fxn
+        self._output = bytearray()
+        self._tail = b''
+        self.partials = []
+        self._monitor = monitor
+        self._monitor.register(self.proc.stdout, self._on_output)
 
-    def _poll(self):
-        if not self._state == 'active': return
-        retcode = self.proc.poll()
-        if retcode is None:
-            self._state = 'active'
-            stdout, _ = self.proc.communicate()
-            tmp_res = self._parse(stdout)
-            if tmp_res != sys.float_info.max:
-                self._result = tmp_res
-        elif retcode == 0:
-            self._state = 'done'
-        else:
+    @property
+    def stdout(self):
+        """The end of the output of the eval."""
+        return self._output.decode('utf-8', errors='replace')
+
+    def _on_output(self, data):
+        if data:
+            self._output += data
+            del self._output[:-self.MAX_OUTPUT]
+            self._read_partials(data)
+            return
+        self.proc.stdout.close()
+        retcode = self.proc.wait()
+        # the result record is small: the runner wrote all of it before exiting
+        with self._result_pipe:
+            result = self._result_pipe.read().decode('utf-8', errors='replace')
+        if self._state != 'active': return
+        if not result:
             self._state = 'failed'
+            self._result = self.FAIL_RETURN_VALUE
+            logger.error(f"Eval failed without a result: {self.stdout}")
+            return
+        self._result, self.metrics, ok = self._parse(result)
+        self._state = 'done' if ok and retcode == 0 else 'failed'
+
+    def _read_partials(self, data):
+        self._tail += data
+        if b'\n' not in data: return
+        *lines, self._tail = self._tail.split(b'\n')
+        for line in lines:
+            if PARTIAL_TAG.encode() in line:
+                partial = parse_partial(line.decode('utf-8', errors='replace'))
+                if partial is not None: self.partials.append(partial)
+
+    def _poll(self):
+        if self._state == 'active':
+            self._monitor.poll()
 
     def result(self):
-        if self._result is not None:
-            return self._result
+        while self._state == 'active':
+            self._monitor.poll(None)
+        if self._result is None:
+            self._result = self.FAIL_RETURN_VALUE
+        return self._result
+
+    def cancel(self):
+        self._state = 'cancelled'
+        self._monitor.unregister(self.proc.stdout)
+        self.proc.kill()
+        self.proc.wait()
+        self.proc.stdout.close()
+        self._result_pipe.close()
+
+    @property
+    def active(self):
+        self._poll()
+        return self._state == 'active'
+
+    @property
+    def done(self):
+        self._poll()
+        return self._state == 'done'
+
+    @property
+    def failed(self):
+        self._poll()
+        return self._state == 'failed'
+
+    @property
+    def cancelled(self):
+        self._poll()
+        return self._state == 'cancelled'
+
+class RunnerWorker:
+    """A long-lived ``runner.py --persistent`` process evaluating one config at a time.
+
+    Args:
+        args (list): command line of the runner in persistent mode.
+        monitor (OutputMonitor): reads the replies written by the worker.
+        slot (int): index of the worker in its pool.
+        cpus (list): cores the worker is pinned to; not pinned if ``None``.
+    """
+    def __init__(self, args, monitor, slot=0, cpus=None):
+        self.proc = subprocess.Popen(args, stdin=subprocess.PIPE,
+                                     stdout=subprocess.PIPE, **_popen_options(cpus))
+        self.slot = slot
+        self._buffer = b''
+        self._replies = deque()
+        self._closed = False
+        self._monitor = monitor
+        self._monitor.register(self.proc.stdout, self._on_output)
+        self.future = None
+        self.num_evals = 0
+
+    def _on_output(self, data):
+        if not data:
+            self._closed = True
+            return
+        self._buffer += data
+        *lines, self._buffer = self._buffer.split(b'\n')
+        self._replies.extend(line.decode('utf-8') for line in lines)
+
+    def send(self, future):
+        self.future = future
+        future.worker_id = self.proc.pid
+        self.num_evals += 1
+        try:
+            self.proc.stdin.write(future.key.encode('utf-8') + b'\n')
+            self.proc.stdin.flush()
+        except (BrokenPipeError, ValueError):
+            pass # the worker died; read_reply() will report it
+
+    def read_reply(self):
+        """Reply to the current eval.
+
+        Returns:
+            str: the reply line, ``''`` if the worker died before replying or ``None`` if the eval is still running.
+        """
+        if self._replies:
+            return self._replies.popleft()
+        if self._closed:
+            self.proc.wait()
+            return ''
+        return None
+
+    def stop(self):
+        self._monitor.unregister(self.proc.stdout)
+        try: self.proc.stdin.close()
+        except BrokenPipeError: pass
+        try:
+            self.proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+            self.proc.wait()
+        self.proc.stdout.close()
+
+    def kill(self):
+        self._monitor.unregister(self.proc.stdout)
+        self.proc.kill()
         self.proc.wait()
-        if self.done:
-            stdout, _ = self.proc.communicate()
-            self._result = self._parse(stdout)
+        try: self.proc.stdin.close()
+        except BrokenPipeError: pass
+        self.proc.stdout.close()
+
+
+class WorkerFuture:
+    """Future of an eval executed by a ``RunnerWorker`` of a ``WorkerPool``."""
+    FAIL_RETURN_VALUE = evaluate.Evaluator.FAIL_RETURN_VALUE
+
+    def __init__(self, pool, key, parse_fxn):
+        self.key = key
+        self.worker_id = None
+        self.metrics = None
+        self.partials = []
+        self._pool = pool
+        self._state = 'active'
+        self._result = None
+        self._parse = parse_fxn
+
+    def _set_reply(self, reply):
+        if reply.startswith(runner.RESULT_TAG):
+            self._result, self.metrics, ok = self._parse(reply[len(runner.RESULT_TAG):])
+            self._state = 'done' if ok else 'failed'
         else:
-            stdout, _ = self.proc.communicate()
+            logger.error(f"Eval failed: worker died while evaluating {self.key}")
+            self._result = self.FAIL_RETURN_VALUE
+            self._state = 'failed'
+
+    def _poll(self):
+        if self._state == 'active':
+            self._pool.service()
+
+    def result(self):
+        while self._state == 'active':
+            self._pool.service(timeout=None)
+        if self._result is None:
             self._result = self.FAIL_RETURN_VALUE
-            logger.error(f"Eval failed: {stdout}")
         return self._result
 
     def cancel(self):
-        self.proc.kill()
-        try: self.proc.communicate()
-        except ValueError: pass
+        self._pool.cancel(self)
         self._state = 'cancelled'
 
     @property
@@ -71,20 +282,128 @@ class PopenFuture:
         self._poll()
         return self._state == 'cancelled'
 
+
+class WorkerPool:
+    """Pool of persistent runner processes.
+
+    The run function is imported once per worker; configs are then sent to idle workers over a pipe. Submitted configs wait in a FIFO queue until a worker is free.
+
+    Args:
+        args (list): command line of the runner in persistent mode.
+        num_workers (int): maximum number of worker processes.
+        monitor (OutputMonitor): reads the replies written by the workers.
+        parse_fxn (func): reads a result record, see ``Evaluator._parse_result``.
+        max_evals_per_worker (int): a worker is replaced by a fresh process after this number of evals. If ``None``, workers are only replaced when they crash.
+        cpu_blocks (list): cores of each of the ``num_workers`` workers, a replaced worker gets the cores of its predecessor. If ``None``, workers are not pinned.
+    """
+    def __init__(self, args, num_workers, monitor, parse_fxn, max_evals_per_worker=None, cpu_blocks=None):
+        self.args = args
+        self.num_workers = num_workers
+        self.cpu_blocks = cpu_blocks
+        self._monitor = monitor
+        self.max_evals_per_worker = max_evals_per_worker
+        self._parse = parse_fxn
+        self._queue = deque()
+        self._idle = []
+        self._busy = []
+
+    def submit(self, key):
+        future = WorkerFuture(self, key, self._parse)
+        self._queue.append(future)
+        self.service()
+        return future
+
+    def _expired(self, worker):
+        return (self.max_evals_per_worker is not None
+                and worker.num_evals >= self.max_evals_per_worker)
+
+    def service(self, timeout=0):
+        """Collect the replies of busy workers then feed queued configs to idle ones.
+
+        Args:
+            timeout (float): wait at most this number of seconds (forever if ``None``) for some worker output.
+        """
+        self._monitor.poll(timeout)
+        for worker in self._busy[:]:
+            reply = worker.read_reply()
+            while reply is not None and reply.startswith(PARTIAL_TAG):
+                partial = parse_partial(reply)
+                if partial is not None: worker.future.partials.append(partial)
+                reply = worker.read_reply()
+            if reply is None: continue
+            self._busy.remove(worker)
+            future, worker.future = worker.future, None
+            future._set_reply(reply)
+            if not reply:
+                logger.warning(f"Worker {worker.proc.pid} died; it will be replaced")
+                worker.kill()
+            elif self._expired(worker):
+                logger.debug(f"Recycling worker {worker.proc.pid} after {worker.num_evals} evals")
+                worker.stop()
+            else:
+                self._idle.append(worker)
+
+        while self._queue:
+            if self._idle:
+                worker = self._idle.pop()
+            elif len(self._busy) < self.num_workers:
+                slot = min(set(range(self.num_workers)) - {w.slot for w in self._busy + self._idle})
+                cpus = None if self.cpu_blocks is None else self.cpu_blocks[slot]
+                worker = RunnerWorker(self.args, self._monitor, slot, cpus)
+                logger.debug(f"Started worker {worker.proc.pid}")
+            else:
+                break
+            worker.send(self._queue.popleft())
+            self._busy.append(worker)
+
+    def cancel(self, future):
+        if future in self._queue:
+            self._queue.remove(future)
+            return
+        for worker in self._busy:
+            if worker.future is future:
+                self._busy.remove(worker)
+                worker.kill()
+                break
+
+    def shutdown(self):
+        for future in self._queue: future._state = 'cancelled'
+        self._queue.clear()
+        for worker in self._busy: worker.kill()
+        for worker in self._idle: worker.stop()
+        self._busy, self._idle = [], []
+
+
 class SubprocessEvaluator(evaluate.Evaluator):
     """Evaluator using subprocess.
 
         The ``SubprocessEvaluator`` use the ``subprocess`` package. The generated processes have a fresh memory independant from their parent process. All the imports are going to be repeated.
 
+        With ``persistent=True`` the evaluator instead keeps ``WORKERS_PER_NODE`` long-lived runner processes which import the run function once and then receive configs over a pipe, so the import cost is only paid when a worker is started.
+
         Args:
             run_function (func): takes one parameter of type dict and returns a scalar value.
             cache_key (func): takes one parameter of type dict and returns a hashable type, used as the key for caching evaluations. Multiple inputs that map to the same hashable key will only be evaluated once. If ``None``, then cache_key defaults to a lossless (identity) encoding of the input dict.
+            persistent (bool): reuse worker processes across evaluations.
+            max_evals_per_worker (int): with ``persistent=True``, replace a worker by a fresh process after this number of evals. If ``None``, workers are only replaced when they crash.
+            **kwargs: options common to all evaluators, see ``Evaluator``.
     """
     WaitResult = namedtuple('WaitResult', ['active', 'done', 'failed', 'cancelled'])
-    def __init__(self, run_function, cache_key=None):
-        super().__init__(run_function, cache_key)
+    def __init__(self, run_function, cache_key=None, persistent=False, max_evals_per_worker=None, **kwargs):
+        super().__init__(run_function, cache_key, **kwargs)
         self.num_workers = self.WORKERS_PER_NODE
+        self.persistent = persistent
+        self._monitor = OutputMonitor()
+        self._worker_cpus = self._cpu_blocks()
+        self._slots = {} # slot --> PopenFuture of the last eval started with its cores
+        if self.persistent:
+            args = shlex.split(self._runner_executable) + [runner.PERSISTENT_FLAG]
+            self._pool = WorkerPool(args, self.num_workers, self._monitor, self._parse_result,
+                                    max_evals_per_worker=max_evals_per_worker,
+                                    cpu_blocks=self._worker_cpus)
         logger.info(f"Subprocess Evaluator will execute {self._run_function.__name__}() from module {self._run_function.__module__}")
+        if self.persistent:
+            logger.info(f"Using {self.num_workers} persistent workers")
 
     def _args(self, x):
         exe = self._runner_executable
@@ -93,38 +412,59 @@ class SubprocessEvaluator(evaluate.Evaluator):
 
     def _eval_exec(self, x):
         assert isinstance(x, dict)
+        if self.persistent:
+            return self._pool.submit(self.encode(x))
         cmd = self._args(x)
-        future = PopenFuture(cmd, self._parse)
+        cpus = None
+        if self._worker_cpus is not None:
+            # cores of a worker slot without a running process
+            slot = next((slot for slot in range(self.num_workers)
+                         if slot not in self._slots or self._slots[slot].proc.poll() is not None), None)
+            if slot is not None: cpus = self._worker_cpus[slot]
+        future = PopenFuture(cmd, self._parse_result, self._monitor, cpus)
+        if cpus is not None: self._slots[slot] = future
         return future
 
-    @staticmethod
-    def _timer(timeout):
-        if timeout is None:
-            return lambda : True
+    def _read_partials(self):
+        self._service(0)
+
+    def shutdown(self):
+        super().shutdown()
+        if self.persistent: self._pool.shutdown()
+
+    def _service(self, timeout):
+        if self.persistent:
+            self._pool.service(timeout)
         else:
-            timeout = max(float(timeout), 0.01)
-            start = time.time()
-            return lambda : (time.time()-start) < timeout
+            self._monitor.poll(timeout)
 
     def wait(self, futures, timeout=None, return_when='ANY_COMPLETED'):
+        """Block until ``return_when`` is satisfied.
+
+        Output of every child is drained through the ``OutputMonitor`` as it arrives, so this returns as soon as any of the children exits instead of polling each of them in turn.
+        """
         assert return_when.strip() in ['ANY_COMPLETED', 'ALL_COMPLETED']
         waitall = bool(return_when.strip() == 'ALL_COMPLETED')
 
+        futures = list(futures)
         num_futures = len(futures)
-        active_futures = [f for f in futures if f.active]
-        time_isLeft = self._timer(timeout)
-
-        if waitall: can_exit = lambda : len(active_futures) == 0
-        else: can_exit = lambda : len(active_futures) < num_futures
+        deadline = None if timeout is None else time.time() + max(float(timeout), 0.01)
 
-        while time_isLeft():
-            if can_exit():
+        self._service(0)
+        while True:
+            num_active = sum(f._state == 'active' for f in futures)
+            if waitall: can_exit = num_active == 0
+            else: can_exit = num_active < num_futures
+            if can_exit or num_active == 0:
                 break
+            if deadline is None:
+                self._service(None)
             else:
-                active_futures = [f for f in futures if f.active]
-                time.sleep(0.04)
+                remaining = deadline - time.time()
+                if remaining <= 0: break
+                self._service(remaining)
 
-        if not can_exit():
+        if not can_exit:
             raise TimeoutError(f'{timeout} sec timeout expired while '
             f'waiting on {len(futures)} tasks until {return_when}')
 
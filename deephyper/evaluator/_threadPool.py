@@ -4,10 +4,18 @@ from concurrent.futures import wait as _futures_wait
 from concurrent.futures import CancelledError
 import logging
 import os
+import threading
+import time
 from deephyper.evaluator import evaluate
+from deephyper.evaluator.report import call_with_reporter
 logger = logging.getLogger(__name__)
 WaitResult = namedtuple('WaitResult', ['active', 'done', 'failed', 'cancelled'])
 
+def _run(run_function, x, reporter, started):
+    """Run in a thread of the pool; the start time and the name of the thread are written to ``started``."""
+    started.update(time=time.time(), worker=threading.current_thread().name)
+    return call_with_reporter(run_function, x, reporter)
+
 class ThreadPoolEvaluator(evaluate.Evaluator):
     """Evaluator using ThreadPoolExecutor.
 
@@ -16,9 +24,12 @@ class ThreadPoolEvaluator(evaluate.Evaluator):
     Args:
         run_function (func): takes one parameter of type dict and returns a scalar value.
         cache_key (func): takes one parameter of type dict and returns a hashable type, used as the key for caching evaluations. Multiple inputs that map to the same hashable key will only be evaluated once. If ``None``, then cache_key defaults to a lossless (identity) encoding of the input dict.
+        **kwargs: options common to all evaluators, see ``Evaluator``.
     """
-    def __init__(self, run_function, cache_key=None):
-        super().__init__(run_function, cache_key)
+    SUPPORTS_BATCH = True
+
+    def __init__(self, run_function, cache_key=None, **kwargs):
+        super().__init__(run_function, cache_key, **kwargs)
         self.num_workers = self.WORKERS_PER_NODE
         self.executor = ThreadPoolExecutor(
             max_workers = self.num_workers
@@ -26,10 +37,26 @@ class ThreadPoolEvaluator(evaluate.Evaluator):
         logger.info(f"ThreadPool Evaluator will execute {self._run_function.__name__}() from module {self._run_function.__module__}")
 
     def _eval_exec(self, x):
-        assert isinstance(x, dict)
-        future = self.executor.submit(self._run_function, x)
+        assert isinstance(x, (dict, list))
+        partials = []
+        reporter = lambda step, objective: partials.append((step, objective))
+        started = {}
+        future = self.executor.submit(_run, self._run_function, x, reporter, started)
+        future.partials = partials
+        future.started = started
         return future
 
+    def _kill(self, future):
+        if not future.cancel():
+            logger.warning("A thread cannot be killed: the killed eval keeps "
+                           "running in the background and occupies its thread")
+        return None
+
+    def shutdown(self):
+        super().shutdown()
+        # the running evals cannot be killed: do not wait for them
+        self.executor.shutdown(wait=False)
+
     def wait(self, futures, timeout=None, return_when='ANY_COMPLETED'):
         return_when=return_when.replace('ANY','FIRST')
         results = _futures_wait(futures, timeout=timeout, return_when=return_when)
@@ -39,14 +66,14 @@ class ThreadPoolEvaluator(evaluate.Evaluator):
             raise TimeoutError(f'{timeout} sec timeout expired while '
             f'waiting on {len(futures)} tasks until {return_when}')
         for res in results.done:
+            res.started_at, res.worker_id = res.started.get('time'), res.started.get('worker')
             try:
                 res.result(timeout=0)
             except CancelledError:
                 cancelled.append(res)
-            except Exception as e:
-                logger.exception("Eval exception:")
-                res.set_result(evaluate.Evaluator.FAIL_RETURN_VALUE)
-                res.set_exception(None)
+            except Exception:
+                # the exception is logged and turned into FAIL_RETURN_VALUE
+                # when the evaluator collects the result
                 failed.append(res)
             else:
                 done.append(res)
@@ -0,0 +1,101 @@
+"""
+Partition of the cores of a node among the workers of an evaluator.
+
+With several workers per node, every worker would otherwise size the thread
+pools of TensorFlow and of the OpenMP/BLAS libraries for the whole node and
+the workers would fight over the same cores. Each worker instead gets its own
+contiguous block of cores: it is pinned to the block with
+``os.sched_setaffinity`` (by ``runner.py`` itself for the workers started as a
+runner process, see ``runner_env``) and its thread pools are sized to the block through
+the ``OMP_NUM_THREADS``, ``MKL_NUM_THREADS``, ``OPENBLAS_NUM_THREADS`` and
+``TF_NUM_INTRAOP_THREADS``/``TF_NUM_INTEROP_THREADS`` environment variables.
+Set ``DEEPHYPER_CPU_BINDING=0`` to disable it.
+"""
+import os
+
+from deephyper.evaluator import runner
+
+THREAD_VARS = ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'TF_NUM_INTRAOP_THREADS')
+NUM_THREADS_VAR = 'OMP_NUM_THREADS'
+INTER_OP_THREADS = 2 # TensorFlow ops run concurrently by a worker
+
+_tf_configured = False
+
+def available_cpus():
+    """Cores the current process may run on."""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+def partition(cpus, num_workers):
+    """Split ``cpus`` in ``num_workers`` contiguous blocks of the same size, give or take one core.
+
+    With more workers than cores, each worker gets a single core and cores are shared round-robin.
+
+    Returns:
+        list: the list of cores of each worker.
+    """
+    cpus = list(cpus)
+    if num_workers >= len(cpus):
+        return [[cpus[i % len(cpus)]] for i in range(num_workers)]
+    size, extra = divmod(len(cpus), num_workers)
+    blocks, start = [], 0
+    for i in range(num_workers):
+        end = start + size + (i < extra)
+        blocks.append(cpus[start:end])
+        start = end
+    return blocks
+
+def thread_env(num_threads):
+    """Environment variables sizing the thread pools of a worker running on ``num_threads`` cores."""
+    env = {var: str(num_threads) for var in THREAD_VARS}
+    env['TF_NUM_INTEROP_THREADS'] = str(min(INTER_OP_THREADS, num_threads))
+    return env
+
+def pin(cpus):
+    """Pin the calling process to ``cpus`` and size its thread pools accordingly.
+
+    The threads started afterwards inherit the affinity, so this must run before the numerical libraries start their thread pools, e.g. in the initializer of a pool process.
+    """
+    os.environ.update(thread_env(len(cpus)))
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cpus)
+
+def runner_env(cpus):
+    """Environment variables of a ``runner.py`` process pinning it to ``cpus`` and sizing its thread pools accordingly.
+
+    The runner pins itself at startup: pinning the child between fork and exec, with ``preexec_fn``, is not safe once the parent runs threads.
+    """
+    return dict(thread_env(len(cpus)), **{runner.CPUS_VAR: format_cpus(cpus)})
+
+def format_cpus(cpus):
+    """Compact string of a list of cores, e.g. ``0-7,16``."""
+    ranges = []
+    for cpu in sorted(cpus):
+        if ranges and cpu == ranges[-1][1] + 1: ranges[-1][1] = cpu
+        else: ranges.append([cpu, cpu])
+    return ','.join(str(a) if a == b else f'{a}-{b}' for a, b in ranges)
+
+def describe(blocks):
+    """One log line describing the cores of each worker."""
+    return '; '.join(f'worker {i}: cores {format_cpus(cpus)}' for i, cpus in enumerate(blocks))
+
+def configure_tensorflow():
+    """Size the thread pools of TensorFlow from ``OMP_NUM_THREADS``, as set by ``pin``.
+
+    TensorFlow 1 ignores ``TF_NUM_INTRAOP_THREADS``: run functions call this before building their model. Does nothing when the worker was not pinned.
+    """
+    global _tf_configured
+    if _tf_configured or NUM_THREADS_VAR not in os.environ: return
+    num_threads = int(os.environ[NUM_THREADS_VAR])
+    inter_op = min(INTER_OP_THREADS, num_threads)
+    import tensorflow as tf
+    if hasattr(tf, 'ConfigProto'):
+        from tensorflow import keras
+        keras.backend.set_session(tf.Session(config=tf.ConfigProto(
+            intra_op_parallelism_threads=num_threads,
+            inter_op_parallelism_threads=inter_op)))
+    else:
+        tf.config.threading.set_intra_op_parallelism_threads(num_threads)
+        tf.config.threading.set_inter_op_parallelism_threads(inter_op)
+    _tf_configured = True
@@ -0,0 +1,84 @@
+"""
+On-disk store of evaluation results shared across runs.
+
+The store is a SQLite database, so it can be shared by several searches (or
+MPI ranks) of the same node: the results of a run function are looked up by
+the ``uid`` that ``Evaluator`` computes from a config, before the config is
+dispatched. Results are only shared within a namespace, which identifies both
+the run function and the problem, since the same run function (e.g. the one
+of the NAS searches) evaluates configs of different problems and datasets.
+
+SQLite relies on file locks which are broken on most shared and network
+filesystems (NFS, Lustre, GPFS): when several agents use the same cache, the
+database must be on a node-local filesystem, and agents running on different
+nodes cannot share it.
+"""
+import json
+import logging
+import sqlite3
+import time
+
+logger = logging.getLogger(__name__)
+
+class EvalCache:
+    """Persistent cache of objective values.
+
+    Args:
+        path (str): path of the SQLite database; created if it does not exist.
+        namespace (str): results are only shared between evaluators using the same namespace, typically the full name of the run function and the problem.
+        max_entries (int): when the store grows beyond this number of results, the least recently used ones are evicted. If ``None``, the store is never trimmed.
+    """
+    EVICTION_PERIOD = 100 # number of puts between two size checks
+
+    def __init__(self, path, namespace='', max_entries=None):
+        self.path = path
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self._num_puts = 0
+        self._conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS evals ('
+            'namespace TEXT NOT NULL, uid TEXT NOT NULL, objective REAL NOT NULL, '
+            'last_access REAL NOT NULL, PRIMARY KEY (namespace, uid))')
+        self._conn.execute(
+            'CREATE INDEX IF NOT EXISTS evals_last_access ON evals (last_access)')
+        logger.info(f"Using evaluation cache {path} with {len(self)} entries")
+
+    @staticmethod
+    def _key(uid):
+        return uid if isinstance(uid, str) else json.dumps(uid, sort_keys=True)
+
+    def __len__(self):
+        return self._conn.execute('SELECT COUNT(*) FROM evals').fetchone()[0]
+
+    def get(self, uid):
+        """Return the cached objective of ``uid`` or ``None``."""
+        key = self._key(uid)
+        row = self._conn.execute(
+            'SELECT objective FROM evals WHERE namespace=? AND uid=?',
+            (self.namespace, key)).fetchone()
+        if row is None:
+            return None
+        self._conn.execute(
+            'UPDATE evals SET last_access=? WHERE namespace=? AND uid=?',
+            (time.time(), self.namespace, key))
+        return row[0]
+
+    def put(self, uid, objective):
+        self._conn.execute(
+            'INSERT OR REPLACE INTO evals (namespace, uid, objective, last_access) '
+            'VALUES (?, ?, ?, ?)',
+            (self.namespace, self._key(uid), float(objective), time.time()))
+        self._num_puts += 1
+        if self.max_entries is not None and self._num_puts % self.EVICTION_PERIOD == 0:
+            self.evict()
+
+    def evict(self):
+        """Trim the store to ``max_entries`` by dropping the least recently used results."""
+        if self.max_entries is None: return
+        excess = len(self) - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                'DELETE FROM evals WHERE rowid IN ('
+                'SELECT rowid FROM evals ORDER BY last_access LIMIT ?)', (excess,))
+            logger.info(f"Evicted {excess} entries from evaluation cache {self.path}")
@@ -1,8 +1,11 @@
-import csv
-from collections import OrderedDict
+from collections import Counter, OrderedDict, defaultdict, deque
 from contextlib import suppress as dummy_context
+import heapq
+import itertools
+import hashlib
 from math import isnan
-from numpy import integer, floating, ndarray
+from statistics import median
+from numpy import bool_, integer, floating, ndarray
 import json
 import uuid
 import logging
@@ -11,7 +14,10 @@ import sys
 import time
 import types
 
-from deephyper.evaluator import runner
+from deephyper.evaluator import affinity, runner
+from deephyper.evaluator.cache import EvalCache
+from deephyper.evaluator import journal
+from deephyper.evaluator.metrics import EvalMetrics, format_summary
 logger = logging.getLogger(__name__)
 
 class Encoder(json.JSONEncoder):
@@ -27,23 +33,74 @@ class Encoder(json.JSONEncoder):
             return f'{obj.__module__}.{obj.__name__}'
         else: return super(Encoder, self).default(obj)
 
+_canonical_encoder = Encoder(sort_keys=True, separators=(',', ':'))
+
+def _canonical_value(obj):
+    """``obj`` with its numbers normalized: numpy scalars and arrays as Python numbers and lists, integral floats as ints."""
+    kind = type(obj)
+    # fast path for the plain values of most configs
+    if kind is str or kind is int or kind is bool or obj is None:
+        return obj
+    if kind is float:
+        return int(obj) if obj.is_integer() else obj
+    if isinstance(obj, dict):
+        return {key: _canonical_value(value) for key, value in obj.items()}
+    if isinstance(obj, ndarray):
+        obj = obj.tolist()
+    if isinstance(obj, (list, tuple)):
+        return [_canonical_value(value) for value in obj]
+    if isinstance(obj, (bool, bool_)):
+        return bool(obj)
+    if isinstance(obj, integer):
+        return int(obj)
+    if isinstance(obj, (float, floating)):
+        obj = float(obj)
+        return int(obj) if obj.is_integer() else obj
+    return obj
+
 class Evaluator:
+    """Abstract evaluator: runs the evaluations of a run function on a backend.
+
+    Use ``Evaluator.create`` to instantiate one of the backends.
+
+    Args:
+        run_function (func): takes one parameter of type dict and returns a scalar value, or a dict with the ``objective`` and other metrics of the eval, saved with its result (see ``runner``).
+        cache_key (func): takes one parameter of type dict and returns a hashable type, used as the key for caching evaluations. Multiple inputs that map to the same hashable key will only be evaluated once. If ``None``, then cache_key defaults to ``digest``, a fixed-size digest of the canonical encoding of the input dict.
+        cache_file (str): path of an ``EvalCache`` database. Results found there are reused instead of being evaluated again and new results are added to it, so that restarted searches do not repeat evaluations. Failed evaluations are not cached. The database must not be on a shared or network filesystem when several agents use it.
+        cache_namespace (str): identity of the problem, e.g. the name of the problem and its dataset: results are only reused by evaluators of the same run function and ``cache_namespace``. Required with ``cache_file``.
+        cache_max_entries (int): maximum number of results kept in ``cache_file``.
+        journal_file (str): every finished eval is appended to this ``ResultsJournal``, kept across runs. Defaults to ``results.jsonl``, or ``results.<rank>.jsonl`` on the MPI ranks other than 0 (see ``journal.default_path``). ``dump_evals(compact=True)`` materializes ``results.json`` and ``results.csv`` from the records of this run. If ``None``, results are not saved.
+        eval_timeout (float): evals running for longer than this number of seconds are killed and their objective is set to the last partial objective they reported, or to ``FAIL_RETURN_VALUE``. If ``None``, evals are never killed.
+        batch_size (int): declares the run function batch-capable: it takes a list of configs and returns the list of their objectives. Each free worker then gets a micro-batch of up to ``batch_size`` queued configs in a single call; killing one eval of a micro-batch kills the whole micro-batch. Only backends with ``SUPPORTS_BATCH`` accept it. If ``None``, the run function is called on one config at a time.
+        speculation_percentile (float): straggler mitigation. While no eval is queued and some workers are free, a pending eval running for longer than this percentile (0-100) of the run times of the finished evals is duplicated on a free worker; the first copy to finish gives the objective and the other one is killed. Needs ``SPECULATION_MIN_EVALS`` finished evals and cannot be combined with ``batch_size``. If ``None``, evals are never duplicated.
+    """
     FAIL_RETURN_VALUE = sys.float_info.max
     PYTHON_EXE = os.environ.get('DEEPHYPER_PYTHON_BACKEND', sys.executable)
     WORKERS_PER_NODE = int(os.environ.get('DEEPHYPER_WORKERS_PER_NODE', 1))
     KERAS_BACKEND = os.environ.get('KERAS_BACKEND', 'tensorflow')
     os.environ['KERAS_BACKEND'] = KERAS_BACKEND
+    METRICS_PERIOD = 60 # sec between two metrics summaries in the log
+    SUPPORTS_BATCH = False # True for backends calling the run function in-process
+    SPECULATION_MIN_EVALS = 5 # finished evals needed to estimate the straggler threshold
+    CPU_BINDING = os.environ.get('DEEPHYPER_CPU_BINDING', '1') != '0' # see ``affinity``
+    is_worker = False # True on the ranks which serve the evals of another process, see ``MPIEvaluator``
     assert os.path.isfile(PYTHON_EXE)
 
     @staticmethod
-    def create(run_function, cache_key=None, method='balsam'):
-        assert method in ['balsam', 'subprocess', 'processPool', 'threadPool']
+    def create(run_function, cache_key=None, method='balsam', **kwargs):
+        assert method in ['balsam', 'subprocess', 'processPool', 'threadPool', 'asyncio', 'mpi']
         if method == "balsam":
             from deephyper.evaluator._balsam import BalsamEvaluator
             Eval = BalsamEvaluator
         elif method == "subprocess":
             from deephyper.evaluator._subprocess import SubprocessEvaluator
             Eval = SubprocessEvaluator
+        elif method == "asyncio":
+            from deephyper.evaluator._asyncio import AsyncioEvaluator
+            Eval = AsyncioEvaluator
+        elif method == "mpi":
+            from deephyper.evaluator._mpi import MPIEvaluator
+            Eval = MPIEvaluator
         elif method == "processPool":
             from deephyper.evaluator._processPool import ProcessPoolEvaluator
             Eval = ProcessPoolEvaluator
@@ -51,26 +108,51 @@ class Evaluator:
             from deephyper.evaluator._threadPool import ThreadPoolEvaluator
             Eval = ThreadPoolEvaluator
 
-        return Eval(run_function, cache_key=cache_key)
+        return Eval(run_function, cache_key=cache_key, **kwargs)
 
-    def __init__(self, run_function, cache_key=None):
+    def __init__(self, run_function, cache_key=None, cache_file=None, cache_namespace=None, cache_max_entries=None,
+                 journal_file=journal.DEFAULT_PATH, eval_timeout=None, batch_size=None,
+                 speculation_percentile=None):
         self.pending_evals = {} # uid --> Future
+        self.queued_evals = [] # heap of (-priority, order, uid, x)
+        self._deadlines = [] # heap of (deadline, order, uid) of pending evals
         self.finished_evals = OrderedDict() # uid --> scalar
-        self.requested_evals = [] # keys
+        self.partial_evals = {} # uid --> [(step, partial objective)]
+        self.requested_evals = Counter() # key --> number of unread requests
         self.key_uid_map = {} # map keys to uids
 
+        self._uids = set() # uids ever submitted
+        self._configs = {} # key --> decoded x
+        self._running_configs = {} # uid --> x of the pending evals
+        self._speculative = {} # uid --> Future of the duplicate of a straggler
+        self._unfinished_requests = defaultdict(list) # uid --> requested keys
+        self._ready_requests = deque() # requested keys with a finished uid
+        self._journaled_keys = set()
+
+        self._queue_order = itertools.count()
         self.transaction_context = dummy_context
         self._start_sec = time.time()
         self.elapsed_times = {}
+        self._metrics = EvalMetrics()
+        self._last_metrics_log = self._start_sec
 
         self._run_function = run_function
         self.num_workers = 0
+        self.eval_timeout = eval_timeout
+        if batch_size is not None and not self.SUPPORTS_BATCH:
+            raise ValueError(f"{type(self).__name__} does not support batch-capable run functions")
+        self.batch_size = batch_size
+        if speculation_percentile is not None:
+            if batch_size is not None:
+                raise ValueError("speculation_percentile cannot be combined with batch_size")
+            assert 0 < speculation_percentile <= 100
+        self.speculation_percentile = speculation_percentile
 
         if cache_key is not None:
             assert callable(cache_key)
             self._gen_uid = cache_key
         else:
-            self._gen_uid = lambda d: self.encode(d)
+            self._gen_uid = self.digest
 
         moduleName = self._run_function.__module__
         if moduleName == '__main__':
@@ -78,11 +160,30 @@ class Evaluator:
             "because it is in the __main__ module.  Please provide a function "
             "imported from an external module!")
 
+        if cache_file is not None:
+            # the same run function can evaluate the configs of several problems
+            if not cache_namespace:
+                raise ValueError("cache_file needs a cache_namespace identifying the problem")
+            namespace = f'{moduleName}.{self._run_function.__name__}:{cache_namespace}'
+            self._cache = EvalCache(cache_file, namespace, max_entries=cache_max_entries)
+        else:
+            self._cache = None
+        self._journal = journal.ResultsJournal(journal_file) if journal_file else None
+
     def encode(self, x):
         if not isinstance(x, dict):
             raise ValueError(f'Expected dict, but got {type(x)}')
         return json.dumps(x, cls=Encoder)
 
+    def _canonical(self, x):
+        if not isinstance(x, dict):
+            raise ValueError(f'Expected dict, but got {type(x)}')
+        return _canonical_encoder.encode(_canonical_value(x))
+
+    def digest(self, x):
+        """Key of the config ``x``: a 32 characters digest of its canonical JSON encoding (sorted keys, no whitespace, numpy numbers and arrays as Python numbers and lists, integral floats as ints), so equal configs get equal keys whatever their field order."""
+        return hashlib.blake2b(self._canonical(x).encode(), digest_size=16).hexdigest()
+
     def _elapsed_sec(self):
         return time.time() - self._start_sec
 
@@ -93,22 +194,349 @@ class Evaluator:
             raise ValueError(f'Expected dict, but got {type(x)}')
         return x
 
-    def add_eval(self, x):
-        key = self.encode(x)
-        self.requested_evals.append(key)
-        uid = self._gen_uid(x)
-        if uid in self.key_uid_map.values():
+    def add_eval(self, x, priority=0):
+        """Request the evaluation of ``x``.
+
+        At most ``num_workers`` evals run at the same time; extra requests wait in ``queued_evals`` and are dispatched as running evals finish, highest ``priority`` first and in submission order for equal priorities.
+
+        Args:
+            x (dict): input of the run function.
+            priority (float): dispatch priority of ``x`` while it is queued.
+        """
+        self._request(x, priority)
+        self._dispatch()
+
+    def _request(self, x, priority):
+        key = self.digest(x)
+        self.requested_evals[key] += 1
+        if key not in self._configs:
+            # the only full copy of the config
+            self._configs[key] = self.decode(self.encode(x))
+        uid = key if self._gen_uid == self.digest else self._gen_uid(x)
+        if uid in self._uids:
             logger.info(f"UID: {uid} already evaluated; skipping execution")
+        elif self._cache_lookup(uid):
+            logger.info(f"UID: {uid} found in evaluation cache; skipping execution")
         else:
-            future = self._eval_exec(x)
-            logger.info(f"Submitted new eval of {x}")
-            future.uid = uid
-            self.pending_evals[uid] = future
+            self._uids.add(uid)
+            self._metrics.submitted(uid)
+            heapq.heappush(self.queued_evals, (-priority, next(self._queue_order), uid, x))
+        if uid in self.finished_evals:
+            self._ready_requests.append(key)
+            self._record(key, uid)
+        else:
+            self._unfinished_requests[uid].append(key)
         self.key_uid_map[key] = uid
 
-    def add_eval_batch(self, XX):
+    def _cache_lookup(self, uid):
+        if self._cache is None: return False
+        y = self._cache.get(uid)
+        if y is None: return False
+        self._uids.add(uid)
+        self.elapsed_times[uid] = self._elapsed_sec()
+        self.finished_evals[uid] = y
+        return True
+
+    def add_eval_batch(self, XX, priorities=None):
+        """Request the evaluation of every ``x`` in ``XX``; the evals that can start are submitted together with ``_eval_exec_batch``.
+
+        Args:
+            XX (list): inputs of the run function.
+            priorities (list): dispatch priority of each input, 0 by default.
+        """
+        if priorities is None: priorities = itertools.repeat(0)
+        for x, priority in zip(XX, priorities): self._request(x, priority)
+        self._dispatch()
+
+    def _dispatch(self):
+        """Start queued evals while some workers are free."""
+        if self.batch_size is not None:
+            return self._dispatch_micro_batches()
+        num_free = self._num_idle_workers()
+        if not self.queued_evals or num_free <= 0: return
+        batch = [heapq.heappop(self.queued_evals) for _ in range(min(num_free, len(self.queued_evals)))]
         with self.transaction_context():
-            for x in XX: self.add_eval(x)
+            futures = self._eval_exec_batch([x for _, _, _, x in batch])
+        for (_, _, uid, x), future in zip(batch, futures):
+            future.uid = uid
+            self._start(uid, x, future)
+
+    def _num_idle_workers(self):
+        return max(self.num_workers, 1) - len(self.pending_evals) - len(self._speculative)
+
+    def _dispatch_micro_batches(self):
+        num_running = len({id(future) for future in self.pending_evals.values()})
+        while self.queued_evals and num_running < max(self.num_workers, 1):
+            batch = [heapq.heappop(self.queued_evals) for _ in range(min(self.batch_size, len(self.queued_evals)))]
+            with self.transaction_context():
+                future = self._eval_exec([x for _, _, _, x in batch])
+            future.uid = batch[0][2]
+            future.uids = [uid for _, _, uid, _ in batch]
+            for _, _, uid, x in batch: self._start(uid, x, future)
+            num_running += 1
+
+    def _start(self, uid, x, future):
+        logger.info("Submitted new eval of %s", x)
+        self._metrics.started(uid)
+        if not hasattr(future, 'partials'): future.partials = []
+        self.pending_evals[uid] = future
+        self._running_configs[uid] = x
+        self.partial_evals[uid] = future.partials
+        if self.eval_timeout is not None:
+            heapq.heappush(self._deadlines, (time.time() + self.eval_timeout, next(self._queue_order), uid))
+
+    def _cpu_blocks(self):
+        """Cores of each worker of the node, or ``None`` if the workers are not pinned (see ``affinity``)."""
+        if not self.CPU_BINDING or self.num_workers <= 1: return None
+        blocks = affinity.partition(affinity.available_cpus(), self.num_workers)
+        logger.info(f"CPU binding of the {self.num_workers} workers: {affinity.describe(blocks)}")
+        return blocks
+
+    def _straggler_threshold(self):
+        """Run time in seconds beyond which a pending eval is duplicated, or ``None`` if no duplicate can start now."""
+        if self.speculation_percentile is None or self.queued_evals or self._num_idle_workers() <= 0:
+            return None
+        return self._metrics.run_time_percentile(self.speculation_percentile, self.SPECULATION_MIN_EVALS)
+
+    def _straggler_starts(self):
+        """``(start, uid)`` of the pending evals without a duplicate, oldest first."""
+        return sorted((self._metrics.timings[uid]['start'], uid)
+                      for uid in self.pending_evals if uid not in self._speculative)
+
+    def _speculate(self):
+        """Start a duplicate of the stragglers on the free workers."""
+        threshold = self._straggler_threshold()
+        if threshold is None: return
+        now = time.time()
+        for start, uid in self._straggler_starts()[:self._num_idle_workers()]:
+            if now - start < threshold: break
+            with self.transaction_context():
+                future = self._eval_exec(self._running_configs[uid])
+            future.uid = uid
+            if not hasattr(future, 'partials'): future.partials = []
+            self._speculative[uid] = future
+            logger.info(f'Eval {uid} running for {now - start:.3g} sec (threshold {threshold:.3g} sec): '
+                        'started a speculative duplicate')
+
+    def _next_speculation_sec(self):
+        """Seconds until the next pending eval becomes a straggler, or ``None``."""
+        threshold = self._straggler_threshold()
+        if threshold is None: return None
+        starts = self._straggler_starts()
+        if not starts: return None
+        return max(starts[0][0] + threshold - time.time(), 0)
+
+    def _running_futures(self):
+        """Futures of the pending evals and of their speculative duplicates."""
+        return list(self.pending_evals.values()) + list(self._speculative.values())
+
+    def _eval_exec_batch(self, XX):
+        """Start the evals of ``XX``; backends which can submit several evals at once override this.
+
+        Returns:
+            list: the future of each eval.
+        """
+        return [self._eval_exec(x) for x in XX]
+
+    def _collect(self, futures):
+        # the evals of a micro-batch share their future
+        for future in {id(future): future for future in futures}.values():
+            try:
+                y = future.result()
+            except Exception:
+                logger.exception("Eval exception:")
+                y = self.FAIL_RETURN_VALUE
+            if isinstance(y, dict):
+                # the other keys returned by the run function are metrics of the eval
+                future.metrics = {k: v for k, v in y.items() if k != 'objective'}
+                y = y.get('objective', self.FAIL_RETURN_VALUE)
+            for uid, y in self._split(future, y):
+                if uid not in self.pending_evals: continue
+                logger.info(f'New eval finished: {uid} --> {y}')
+                self._finish(future, y, uid=uid)
+        self._dispatch()
+        self._log_metrics()
+
+    def _split(self, future, y):
+        """``(uid, objective)`` of the evals of ``future``."""
+        uids = getattr(future, 'uids', None)
+        if uids is None:
+            return [(future.uid, y)]
+        if isinstance(y, ndarray): y = y.tolist()
+        if isinstance(y, (list, tuple)) and len(y) == len(uids):
+            return list(zip(uids, y))
+        if y != self.FAIL_RETURN_VALUE:
+            logger.error(f"Batch-capable run function returned {y!r} for {len(uids)} configs")
+        return [(uid, self.FAIL_RETURN_VALUE) for uid in uids]
+
+    def _finish(self, future, y, cache=True, uid=None):
+        if uid is None: uid = future.uid
+        self.elapsed_times[uid] = self._elapsed_sec()
+        original = self.pending_evals.pop(uid)
+        self._running_configs.pop(uid, None)
+        duplicate = self._speculative.pop(uid, None)
+        if duplicate is not None:
+            # the first copy to finish wins: kill the other one
+            if future is duplicate:
+                logger.info(f'Speculative duplicate of eval {uid} finished first')
+            self._kill(original if future is duplicate else duplicate)
+        self.finished_evals[uid] = y
+        self._metrics.ended(uid, getattr(future, 'worker_id', None), started=self._worker_start(future))
+        if cache and self._cache is not None and y != self.FAIL_RETURN_VALUE:
+            self._cache.put(uid, y)
+        keys = self._unfinished_requests.pop(uid, ())
+        self._ready_requests.extend(keys)
+        for key in keys: self._record(key, uid, future)
+
+    @staticmethod
+    def _worker_start(future):
+        """Time at which the worker started the eval of ``future``, or ``None`` if the backend did not report it.
+
+        Backends which know it set ``future.started_at``; otherwise it is the ``start_time`` of the result record written by ``runner.py``.
+        """
+        started = getattr(future, 'started_at', None)
+        if started is None: started = (getattr(future, 'metrics', None) or {}).get('start_time')
+        return started
+
+    def _kill(self, future):
+        """Terminate a running eval.
+
+        Returns:
+            float: the last partial objective reported by the eval, or ``None``.
+        """
+        future.cancel()
+        return None
+
+    def _kill_expired(self):
+        """Kill the pending evals which exceeded ``eval_timeout``."""
+        now = time.time()
+        killed = False
+        while self._deadlines and self._deadlines[0][0] <= now:
+            _, _, uid = heapq.heappop(self._deadlines)
+            future = self.pending_evals.get(uid)
+            if future is None: continue
+            self._terminate(future, f'{self.eval_timeout} sec timeout')
+            killed = True
+        if killed: self._dispatch()
+
+    def _terminate(self, future, reason):
+        """Kill a pending eval and finish it with its partial objective."""
+        self._read_partials()
+        y = self._kill(future)
+        if y is None and future.partials: y = future.partials[-1][1]
+        if y is None: y = self.FAIL_RETURN_VALUE
+        for uid in getattr(future, 'uids', [future.uid]):
+            logger.warning(f'Eval {uid} killed after {reason} --> {y}')
+            self._finish(future, y, cache=False, uid=uid)
+
+    def _read_partials(self):
+        """Collect the partial objectives sent by the running evals; backends using a side channel override this."""
+
+    def partial_results(self, x):
+        """Partial objectives reported by the eval of ``x`` with ``report_partial``.
+
+        Returns:
+            list: ``(step, objective)`` tuples, in the order they were reported.
+        """
+        self._read_partials()
+        return list(self.partial_evals.get(self._gen_uid(x), []))
+
+    def stop_eval(self, x):
+        """Kill the pending eval of ``x``; its objective is set to the last partial objective it reported, or to ``FAIL_RETURN_VALUE``.
+
+        Returns:
+            bool: ``False`` if ``x`` was not running.
+        """
+        future = self.pending_evals.get(self._gen_uid(x))
+        if future is None: return False
+        self._terminate(future, 'stop request')
+        self._dispatch()
+        return True
+
+    def stop_losing_evals(self, min_steps=1, min_evals=3):
+        """Median stopping rule.
+
+        A pending eval is killed when its last partial objective is worse (greater) than the median of the partial objectives that the other evals reported at the same step.
+
+        Args:
+            min_steps (int): evals are not stopped before reporting this number of partial objectives.
+            min_evals (int): minimum number of other evals which must have reached the same step.
+
+        Returns:
+            list: uids of the stopped evals.
+        """
+        self._read_partials()
+        at_step = defaultdict(list)
+        for uid, partials in self.partial_evals.items():
+            for step, y in partials: at_step[step].append((uid, y))
+
+        stopped = []
+        for uid, future in list(self.pending_evals.items()):
+            if len(future.partials) < min_steps: continue
+            step, y = future.partials[-1]
+            others = [other_y for other, other_y in at_step[step] if other != uid]
+            if len(others) >= min_evals and y > median(others):
+                self._terminate(future, f'median stopping rule at step {step}')
+                stopped.append(uid)
+        if stopped: self._dispatch()
+        return stopped
+
+    def _next_deadline_sec(self):
+        """Seconds until the next eval must be killed, or ``None``."""
+        if not self._deadlines: return None
+        return max(self._deadlines[0][0] - time.time(), 0)
+
+    def _record(self, key, uid, future=None):
+        """Append the result of ``key`` to the journal, once per key."""
+        if self._journal is None or key in self._journaled_keys: return
+        self._journaled_keys.add(key)
+        self._journal.append(dict(
+            uid=uid if isinstance(uid, str) else json.dumps(uid, cls=Encoder),
+            x=self._configs[key],
+            objective=self.finished_evals[uid],
+            elapsed_sec=self.elapsed_times[uid],
+            queue_wait_sec=self._metrics.queue_wait(uid),
+            run_sec=self._metrics.run_time(uid),
+            worker=getattr(future, 'worker_id', None),
+            metrics=getattr(future, 'metrics', None)
+        ), cls=Encoder)
+
+    def metrics(self):
+        """Live utilization metrics of the workers, see ``EvalMetrics.summary``.
+
+        Returns:
+            dict: utilization, throughput, run time and queue wait percentiles and idle time of the workers.
+        """
+        return self._metrics.summary(self.num_workers)
+
+    def eval_timing(self, x):
+        """Timings of the eval of ``x``.
+
+        Returns:
+            dict: ``submit``, ``start`` and ``end`` timestamps (``None`` until reached), ``queue_wait`` and ``run_time`` in seconds and the ``worker`` which ran the eval; ``None`` if ``x`` was not evaluated by this evaluator.
+        """
+        uid = self._gen_uid(x)
+        timing = self._metrics.timings.get(uid)
+        if timing is None: return None
+        return dict(timing, queue_wait=self._metrics.queue_wait(uid),
+                    run_time=self._metrics.run_time(uid))
+
+    def _log_metrics(self):
+        now = time.time()
+        if now - self._last_metrics_log < self.METRICS_PERIOD: return
+        self._last_metrics_log = now
+        logger.info(f"Evaluator metrics: {format_summary(self.metrics())}")
+
+    def _read_request(self, key):
+        """Mark one request of ``key`` as read; returns ``False`` if there was none left."""
+        count = self.requested_evals.get(key, 0)
+        if count == 0:
+            return False
+        if count == 1:
+            del self.requested_evals[key]
+        else:
+            self.requested_evals[key] = count - 1
+        return True
 
     def _eval_exec(self, x):
         raise NotImplementedError
@@ -130,6 +558,33 @@ class Evaluator:
         if isnan(y): y = sys.float_info.max
         return y
 
+    @staticmethod
+    def _parse_result(text):
+        """Read a result record written by ``runner.py``.
+
+        Returns:
+            tuple: the objective (``FAIL_RETURN_VALUE`` if the eval failed), the metrics of the eval (``start_time``, ``run_sec``, ``host``, ``pid``, ``max_rss_mb`` and the other keys returned by the run function) and whether it succeeded.
+        """
+        record = runner.decode_result(text)
+        if record is None:
+            logger.error(f"Eval failed: invalid result record {text[:200]!r}")
+            return Evaluator.FAIL_RETURN_VALUE, {}, False
+        return Evaluator._parse_record(record)
+
+    @staticmethod
+    def _parse_record(record):
+        """Same as ``_parse_result`` for a decoded result record."""
+        metrics = {k: v for k, v in record.items() if k not in ('objective', 'error', 'partials')}
+        if 'error' in record:
+            logger.error(f"Eval failed: {record['error']}")
+            return Evaluator.FAIL_RETURN_VALUE, metrics, False
+        if 'objective' not in record:
+            logger.error("Eval failed: it stopped before writing its result")
+            return Evaluator.FAIL_RETURN_VALUE, metrics, False
+        y = record['objective']
+        if isnan(y): y = Evaluator.FAIL_RETURN_VALUE
+        return y, metrics, True
+
     @property
     def _runner_executable(self):
         funcName = self._run_function.__name__
@@ -143,77 +598,103 @@ class Evaluator:
         return runner_exec
 
     def await_evals(self, to_read, timeout=None):
-        keys = list(map(self.encode, to_read))
+        keys = list(map(self.digest, to_read))
         uids = [self._gen_uid(x) for x in to_read]
-        futures = {uid : self.pending_evals[uid]
-                   for uid in set(uids) if uid in self.pending_evals}
-        logger.info(f"Waiting on {len(futures)} evals to finish...")
-
-        logger.info(f'Blocking on completion of {len(futures)} pending evals')
-        self.wait(futures.values(), timeout=timeout, return_when='ALL_COMPLETED')
-        # TODO: on TimeoutError, kill the evals that did not finish; return infinity
-        for uid in futures:
-            y = futures[uid].result()
-            self.elapsed_times[uid] = self._elapsed_sec()
-            del self.pending_evals[uid]
-            self.finished_evals[uid] = y
+        targets = set(uids)
+        logger.info(f'Blocking on completion of {len(targets)} evals')
+        deadline = None if timeout is None else time.time() + timeout
+
+        while True:
+            self._kill_expired()
+            self._speculate()
+            waiting = [uid for uid in targets if uid not in self.finished_evals]
+            if not waiting:
+                break
+            if deadline is not None:
+                timeout = deadline - time.time()
+                if timeout <= 0:
+                    raise TimeoutError(f'Timeout expired while waiting on {len(waiting)} evals')
+            # wake up in time to kill the next expired eval or duplicate the next straggler
+            wait_timeout = min((t for t in (timeout, self._next_deadline_sec(), self._next_speculation_sec())
+                                if t is not None), default=None)
+            try:
+                if all(uid in self.pending_evals for uid in waiting) and not self._speculative:
+                    futures = [self.pending_evals[uid] for uid in waiting]
+                    self.wait(futures, timeout=wait_timeout, return_when='ALL_COMPLETED')
+                    self._collect(futures)
+                else:
+                    # some of the targets are still queued, or duplicated: free workers for
+                    # them and take whichever copy of a duplicated eval finishes first
+                    futures = self._running_futures()
+                    waitRes = self.wait(futures, timeout=wait_timeout, return_when='ANY_COMPLETED')
+                    self._collect(waitRes.done + waitRes.failed)
+            except TimeoutError:
+                # keep the evals which completed before the timeout
+                try:
+                    waitRes = self.wait(futures, timeout=0, return_when='ANY_COMPLETED')
+                except TimeoutError:
+                    pass # none did
+                else:
+                    self._collect(waitRes.done + waitRes.failed)
+                if wait_timeout == timeout: raise
+
         for (key, uid, x) in zip(keys, uids, to_read):
             y = self.finished_evals[uid]
-            logger.info(f"x: {x} y: {y}")
-            try: self.requested_evals.remove(key)
-            except ValueError: pass
+            logger.info("x: %s y: %s", x, y)
+            self._read_request(key)
             yield (x,y)
 
     def get_finished_evals(self):
-        futures = self.pending_evals.values()
+        self._kill_expired()
+        self._speculate()
+        futures = self._running_futures()
         try:
             waitRes = self.wait(futures, timeout=0.5, return_when='ANY_COMPLETED')
         except TimeoutError:
             pass
         else:
-            for future in (waitRes.done + waitRes.failed):
-                uid = future.uid
-                y = future.result()
-                logger.info(f'New eval finished: {uid} --> {y}')
-                self.elapsed_times[uid] = self._elapsed_sec()
-                del self.pending_evals[uid]
-                self.finished_evals[uid] = y
-
-        for key in self.requested_evals[:]:
-            uid = self.key_uid_map[key]
-            if uid in self.finished_evals:
-                self.requested_evals.remove(key)
-                x = self.decode(key)
-                y = self.finished_evals[uid]
-                logger.debug(f"Requested eval x: {x} y: {y}")
-                yield (x,y)
+            self._collect(waitRes.done + waitRes.failed)
+        self._kill_expired()
+        yield from self._read_ready_requests()
+
+    def _read_ready_requests(self):
+        while self._ready_requests:
+            key = self._ready_requests.popleft()
+            # requests already read by await_evals are skipped
+            if not self._read_request(key): continue
+            x = self._configs[key]
+            y = self.finished_evals[self.key_uid_map[key]]
+            logger.debug("Requested eval x: %s y: %s", x, y)
+            yield (x,y)
 
     @property
     def counter(self):
-        return len(self.finished_evals) + len(self.pending_evals)
+        return len(self.finished_evals) + len(self.pending_evals) + len(self.queued_evals)
 
     def num_free_workers(self):
-        num_evals = len(self.pending_evals)
-        logger.debug(f"{num_evals} pending evals; {self.num_workers} workers")
-        return max(self.num_workers - num_evals, 0)
-
-    def dump_evals(self):
-        if not self.finished_evals: return
-
-        with open('results.json', 'w') as fp:
-            json.dump(self.finished_evals, fp, indent=4, sort_keys=True, cls=Encoder)
-
-        resultsList = []
-
-        for key,uid in self.key_uid_map.items():
-            if uid not in self.finished_evals: continue
-            result = self.decode(key)
-            result['objective'] = self.finished_evals[uid]
-            result['elapsed_sec'] = self.elapsed_times[uid]
-            resultsList.append(result)
-
-        with open('results.csv', 'w') as fp:
-            columns = resultsList[0].keys()
-            writer = csv.DictWriter(fp, columns)
-            writer.writeheader()
-            writer.writerows(resultsList)
+        num_evals = len(self.pending_evals) + len(self._speculative) + len(self.queued_evals)
+        logger.debug(f"{len(self.pending_evals)} pending evals; {len(self.queued_evals)} queued evals; {self.num_workers} workers")
+        capacity = self.num_workers * (self.batch_size or 1)
+        return max(capacity - num_evals, 0)
+
+    def shutdown(self):
+        """Kill the pending evals and stop the workers; the evaluator cannot be used afterwards.
+
+        Searches call it once they are done, so that no worker process outlives them.
+        """
+        self.queued_evals.clear()
+        for future in self._running_futures(): self._kill(future)
+        if self._journal is not None: self._journal.sync()
+
+    def dump_evals(self, compact=False):
+        """Checkpoint the results saved in the journal.
+
+        The journal already holds every finished eval, so a checkpoint only forces it to disk.
+
+        Args:
+            compact (bool): also materialize ``results.json`` and ``results.csv`` from the records of this run in the journal; this reads the whole journal.
+        """
+        if self._journal is None or not self.finished_evals: return
+        self._journal.sync()
+        if compact:
+            journal.compact(self._journal.path, run=self._journal.run_id)
@@ -0,0 +1,123 @@
+"""
+Append-only journal of finished evaluations.
+
+Every finished evaluation is appended to the journal as one JSON record per
+line, so that checkpointing the results of a search costs O(1) I/O per
+evaluation. A restarted search appends to the journal of the previous run:
+every record is tagged with the ``run`` id of the journal which wrote it, so
+that the results of each run can be told apart. When the search is launched on several MPI ranks (e.g. the agents of a NAS
+search), each rank but rank 0 writes its own ``results.<rank>.jsonl``, see
+``default_path``. The ``results.json`` and ``results.csv`` files are
+materialized from the records of one run, or of all the runs, on demand:
+
+Usage: python -m deephyper.evaluator.journal [results.jsonl [run]]
+"""
+import csv
+import json
+import logging
+import os
+import sys
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# rank of the process set by the MPI launchers (Open MPI, MPICH/Cray PMI, PMIx, Slurm)
+RANK_VARS = ('OMPI_COMM_WORLD_RANK', 'PMI_RANK', 'PMIX_RANK', 'SLURM_PROCID')
+
+def default_path():
+    """``results.jsonl``, or ``results.<rank>.jsonl`` on the MPI ranks other than 0, so that ranks sharing a working directory do not write the same journal."""
+    rank = next((int(os.environ[var]) for var in RANK_VARS if os.environ.get(var, '').isdigit()), 0)
+    return 'results.jsonl' if rank == 0 else f'results.{rank}.jsonl'
+
+DEFAULT_PATH = default_path()
+
+class ResultsJournal:
+    """Journal of finished evaluations.
+
+    The file is opened in append mode when the first record is appended, so the records of a previous run are kept; the records appended by this journal are tagged with its ``run_id``. Records are flushed as they are written and the file is ``fsync``-ed at most every ``SYNC_PERIOD`` seconds, or when ``sync`` is called.
+
+    Args:
+        path (str): path of the journal.
+    """
+    SYNC_PERIOD = 5 # seconds
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self.run_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self._fp = None
+        self._last_sync = time.time()
+
+    def append(self, record, cls=None):
+        if self._fp is None:
+            self._fp = open(self.path, 'a')
+            # a run killed while writing left a truncated line
+            if self._fp.tell() > 0 and not _ends_with_newline(self.path):
+                self._fp.write('\n')
+        self._fp.write(json.dumps(dict(record, run=self.run_id), cls=cls) + '\n')
+        self._fp.flush()
+        if time.time() - self._last_sync > self.SYNC_PERIOD:
+            self.sync()
+
+    def sync(self):
+        if self._fp is None: return
+        self._fp.flush()
+        os.fsync(self._fp.fileno())
+        self._last_sync = time.time()
+
+    def close(self):
+        if self._fp is None: return
+        self.sync()
+        self._fp.close()
+        self._fp = None
+
+def _ends_with_newline(path):
+    with open(path, 'rb') as fp:
+        fp.seek(-1, os.SEEK_END)
+        return fp.read(1) == b'\n'
+
+def read(path=DEFAULT_PATH):
+    """Iterate over the records of a journal; a truncated last line is ignored."""
+    with open(path) as fp:
+        for line in fp:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                logger.warning(f"Skipping incomplete record in {path}: {line}")
+
+def compact(path=DEFAULT_PATH, run=None, json_path=None, csv_path=None):
+    """Materialize ``results.json`` (uid --> objective) and ``results.csv`` (one row per config) from a journal.
+
+    Args:
+        path (str): path of the journal.
+        run (str): only the records of this run (see ``ResultsJournal.run_id``) are materialized; all the records if ``None``.
+        json_path (str): defaults to the path of the journal with a ``.json`` extension, e.g. ``results.json``.
+        csv_path (str): defaults to the path of the journal with a ``.csv`` extension, e.g. ``results.csv``.
+    """
+    base = path[:-len('.jsonl')] if path.endswith('.jsonl') else path
+    if json_path is None: json_path = base + '.json'
+    if csv_path is None: csv_path = base + '.csv'
+
+    objectives = {}
+    rows = []
+    columns = {}
+    for record in read(path):
+        if run is not None and record.get('run') != run: continue
+        objectives[record['uid']] = record['objective']
+        row = dict(record['x'])
+        row['objective'] = record['objective']
+        row['elapsed_sec'] = record['elapsed_sec']
+        columns.update(dict.fromkeys(row))
+        rows.append(row)
+    if not rows: return
+
+    with open(json_path, 'w') as fp:
+        json.dump(objectives, fp, indent=4, sort_keys=True)
+
+    with open(csv_path, 'w') as fp:
+        writer = csv.DictWriter(fp, list(columns))
+        writer.writeheader()
+        writer.writerows(rows)
+
+if __name__ == "__main__":
+    compact(*sys.argv[1:3])
@@ -0,0 +1,118 @@
+"""
+Timings of the evaluations and worker utilization of an evaluator.
+
+For every eval the evaluator records when it was submitted (requested with
+``add_eval``), started and ended, and which worker ran it. An eval counts as
+started when it is handed to the backend; once it ended, the start time is
+replaced by the time at which the worker actually started it, when the
+backend reports it, so that the time spent waiting inside the backend counts
+as queue wait and not as run time. ``EvalMetrics.summary`` aggregates these
+timings into live metrics, used to size ``WORKERS_PER_NODE`` and to spot the
+periods when the search driver leaves the workers idle.
+"""
+import time
+
+import numpy as np
+
+class EvalMetrics:
+    """Per-eval timestamps and live utilization metrics."""
+    def __init__(self):
+        self.timings = {} # uid --> dict(submit, start, end, worker)
+        self.idle_gaps = [] # sec without any running eval, between two evals
+        self._running = {} # uid --> start
+        self._queue_waits = []
+        self._run_times = []
+        self._busy_sec = 0.0 # run time of the finished evals
+        self._first_start = None
+        self._idle_since = None
+
+    def submitted(self, uid, now=None):
+        self.timings[uid] = dict(submit=time.time() if now is None else now,
+                                 start=None, end=None, worker=None)
+
+    def started(self, uid, now=None):
+        now = time.time() if now is None else now
+        timing = self.timings[uid]
+        timing['start'] = now
+        if self._first_start is None: self._first_start = now
+        if self._idle_since is not None:
+            self.idle_gaps.append(now - self._idle_since)
+            self._idle_since = None
+        self._running[uid] = now
+
+    def ended(self, uid, worker=None, now=None, started=None):
+        """Record the end of the eval of ``uid``.
+
+        Args:
+            uid: uid of the eval.
+            worker: identifier of the worker which ran the eval.
+            now (float): end time; the current time if ``None``.
+            started (float): time at which the worker started the eval, if reported by the backend.
+        """
+        now = time.time() if now is None else now
+        start = self._running.pop(uid, None)
+        if start is None: return # never started, e.g. found in the cache
+        if started is not None:
+            # the clocks of the workers can differ slightly from this one
+            start = min(max(started, start), now)
+        timing = self.timings[uid]
+        timing['start'], timing['end'], timing['worker'] = start, now, worker
+        self._queue_waits.append(start - timing['submit'])
+        self._run_times.append(now - start)
+        self._busy_sec += now - start
+        if not self._running: self._idle_since = now
+
+    def queue_wait(self, uid):
+        """Seconds the eval of ``uid`` waited for a free worker, or ``None`` if it did not start."""
+        timing = self.timings.get(uid)
+        if timing is None or timing['start'] is None: return None
+        return timing['start'] - timing['submit']
+
+    def run_time(self, uid):
+        """Seconds the eval of ``uid`` ran, or ``None`` if it did not end."""
+        timing = self.timings.get(uid)
+        if timing is None or timing['end'] is None: return None
+        return timing['end'] - timing['start']
+
+    def run_time_percentile(self, q, min_count=1):
+        """Percentile ``q`` (0-100) of the run times of the finished evals, or ``None`` with fewer than ``min_count`` of them."""
+        if len(self._run_times) < max(min_count, 1): return None
+        return float(np.percentile(self._run_times, q))
+
+    def summary(self, num_workers, now=None):
+        """Metrics of the evals since the first one started.
+
+        Args:
+            num_workers (int): number of evals the backend runs at the same time.
+
+        Returns:
+            dict: ``num_finished``, ``num_running``, ``utilization`` (fraction of the worker time spent running evals), ``throughput`` (finished evals per second), ``run_p50``/``run_p95`` and ``wait_p50``/``wait_p95`` (percentiles of the run times and queue waits of the finished evals in seconds), ``idle_sec`` (total time without any running eval) and ``max_idle_gap``.
+        """
+        now = time.time() if now is None else now
+        elapsed = 0.0 if self._first_start is None else now - self._first_start
+        busy = self._busy_sec + sum(now - start for start in self._running.values())
+        idle_gaps = list(self.idle_gaps)
+        if self._idle_since is not None: idle_gaps.append(now - self._idle_since)
+        percentile = lambda a, q: float(np.percentile(a, q)) if a else None
+        return dict(
+            num_finished=len(self._run_times),
+            num_running=len(self._running),
+            utilization=busy / (max(num_workers, 1) * elapsed) if elapsed > 0 else None,
+            throughput=len(self._run_times) / elapsed if elapsed > 0 else None,
+            run_p50=percentile(self._run_times, 50),
+            run_p95=percentile(self._run_times, 95),
+            wait_p50=percentile(self._queue_waits, 50),
+            wait_p95=percentile(self._queue_waits, 95),
+            idle_sec=sum(idle_gaps),
+            max_idle_gap=max(idle_gaps, default=0.0),
+        )
+
+def format_summary(summary):
+    """One log line from the result of ``EvalMetrics.summary``."""
+    fmt = lambda v, spec: '-' if v is None else format(v, spec)
+    return (f"{summary['num_finished']} evals finished, {summary['num_running']} running | "
+            f"utilization {fmt(summary['utilization'], '.1%')} | "
+            f"throughput {fmt(summary['throughput'], '.3g')} evals/s | "
+            f"run p50/p95 {fmt(summary['run_p50'], '.3g')}/{fmt(summary['run_p95'], '.3g')} s | "
+            f"queue wait p50/p95 {fmt(summary['wait_p50'], '.3g')}/{fmt(summary['wait_p95'], '.3g')} s | "
+            f"idle {summary['idle_sec']:.3g} s (max gap {summary['max_idle_gap']:.3g} s)")
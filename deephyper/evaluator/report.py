@@ -0,0 +1,67 @@
+"""
+Report intermediate objective values from a run function.
+
+A run function can call ``report_partial`` while it is running, for instance
+at the end of every training epoch::
+
+    from deephyper.evaluator import report_partial
+
+    def run(config):
+        for epoch in range(10):
+            ...
+            report_partial(val_loss, step=epoch)
+        return val_loss
+
+The evaluator collects these values while the eval is running (see
+``Evaluator.partial_results``), so that a search can stop the evals which
+are clearly worse than the others (see ``Evaluator.stop_losing_evals``).
+When the run function is executed in a separate process, the values are
+printed on stdout as ``DH-PARTIAL: <step> <objective>`` lines.
+"""
+import threading
+
+PARTIAL_TAG = 'DH-PARTIAL:'
+
+_local = threading.local()
+
+def set_reporter(reporter):
+    """Send the partial objectives reported by the current thread to ``reporter(step, objective)`` instead of stdout.
+
+    Returns:
+        the previous reporter.
+    """
+    previous = getattr(_local, 'reporter', None)
+    _local.reporter = reporter
+    _local.count = 0
+    return previous
+
+def report_partial(objective, step=None):
+    """Report an intermediate objective value of the current eval.
+
+    Args:
+        objective (float): intermediate objective value, e.g. the validation loss after an epoch.
+        step (int): index of the step (epoch) at which the value was obtained. If ``None``, reports are numbered 1, 2, 3...
+    """
+    _local.count = getattr(_local, 'count', 0) + 1
+    if step is None: step = _local.count
+    reporter = getattr(_local, 'reporter', None)
+    if reporter is None:
+        print(PARTIAL_TAG, step, objective, flush=True)
+    else:
+        reporter(step, objective)
+
+def parse_partial(line):
+    """Parse a ``DH-PARTIAL:`` line into a ``(step, objective)`` tuple."""
+    try:
+        _, step, objective = line.split()
+        return float(step), float(objective)
+    except ValueError:
+        return None
+
+def call_with_reporter(run_function, x, reporter):
+    """Call ``run_function(x)`` with the partial objectives sent to ``reporter``."""
+    previous = set_reporter(reporter)
+    try:
+        return run_function(x)
+    finally:
+        set_reporter(previous)
@@ -2,16 +2,53 @@
 Command line script to run Python function in an external process
 
 Usage: python runner.py <modulePath> <moduleName> <funcName> <args>
+       python runner.py <modulePath> <moduleName> <funcName> --persistent
 
 Loads Python module <moduleName> located in the <modulePath> directory.
 The function <funcName> must be a module-level attribute (e.g. not nested
 inside a class), take one dictionary argument, and return a scalar objective
-value. The passed dictionary is obtained by decoding <args>, which should be a
+value, or a dictionary with the ``objective`` and other metrics of the eval,
+e.g. ``dict(objective=-val_loss, val_acc=val_acc)``, which are added to its
+result record. The passed dictionary is obtained by decoding <args>, which should be a
 JSON-formatted dictionary escaped by single quotes.
+
+The outcome of the eval is a result record, a one-line JSON dictionary with
+the ``objective`` (or the ``error`` traceback if the function raised), the
+``start_time`` and ``run_sec`` of the function, the ``host`` and ``pid`` of the
+process which ran it and its ``max_rss_mb``. The record
+is written to the file descriptor ``DEEPHYPER_RESULT_FD`` or to the file
+``DEEPHYPER_RESULT_FILE``, so that the evaluator never scans the output of the
+function; without either, a ``DH-OUTPUT:`` line is printed instead. With
+``DEEPHYPER_RESULT_FILE``, the partial objectives reported by the function
+are written to the result file as they come, as a record with only their
+``partials``, and the final record also lists them, so that the evaluator
+never reads the output of the function.
+
+With ``--persistent`` the runner becomes a long-lived worker: the module is
+imported once, then one JSON-formatted dictionary is read per line on stdin
+and a single ``DH-RESULT:`` line with the result record is written back for
+each of them, preceded by the ``DH-PARTIAL:`` lines of the partial objectives
+it reported. Anything printed by the function itself is redirected to stderr
+so that stdout only carries these result lines.
+
+If ``DEEPHYPER_CPUS`` is set, e.g. to ``0-7,16``, the runner pins itself to
+these cores before importing the module, so that the thread pools started by
+the imports run on them (see ``affinity``).
 """
 import importlib
 import sys
 import json
+import os
+import socket
+import time
+import traceback
+
+PERSISTENT_FLAG = '--persistent'
+RESULT_TAG = 'DH-RESULT:'
+RESULT_FD_VAR = 'DEEPHYPER_RESULT_FD'
+RESULT_FILE_VAR = 'DEEPHYPER_RESULT_FILE'
+CPUS_VAR = 'DEEPHYPER_CPUS'
+MAX_ERROR_CHARS = 4000 # end of the traceback kept in a result record
 
 def load_module(name, path):
     try:
@@ -21,15 +58,131 @@ def load_module(name, path):
         mod = importlib.import_module(name)
     return mod
 
+def parse_cpus(text):
+    """List of cores from its compact string, e.g. ``0-2,5`` --> ``[0, 1, 2, 5]``."""
+    cpus = []
+    for part in text.split(','):
+        first, _, last = part.partition('-')
+        cpus.extend(range(int(first), int(last or first) + 1))
+    return cpus
+
+def pin_from_env():
+    """Pin the process to the cores listed in ``DEEPHYPER_CPUS``, if set."""
+    if os.environ.get(CPUS_VAR) and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, parse_cpus(os.environ[CPUS_VAR]))
+
+def _max_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 # kB on Linux
+
+def evaluate(func, d, reporter=None):
+    """Call ``func(d)``, with the partial objectives sent to ``reporter`` if given.
+
+    Returns:
+        dict: the result record of the eval.
+    """
+    start = time.time()
+    try:
+        if reporter is None:
+            retval = func(d)
+        else:
+            from deephyper.evaluator import report
+            retval = report.call_with_reporter(func, d, reporter)
+        if isinstance(retval, dict):
+            # the other keys are metrics of the eval
+            record = dict(retval, objective=float(retval['objective']))
+        else:
+            record = dict(objective=float(retval))
+    except Exception:
+        traceback.print_exc()
+        sys.stderr.flush()
+        record = dict(error=traceback.format_exc()[-MAX_ERROR_CHARS:])
+    record['start_time'] = start
+    record['run_sec'] = time.time() - start
+    record['host'] = socket.gethostname()
+    record['pid'] = os.getpid()
+    record['max_rss_mb'] = _max_rss_mb()
+    return record
+
+def _jsonable(value):
+    """JSON value of a metric returned by the function, e.g. a numpy scalar or array."""
+    return value.tolist() if hasattr(value, 'tolist') else str(value)
+
+def encode_result(record):
+    return json.dumps(record, separators=(',', ':'), default=_jsonable)
+
+def decode_result(text):
+    """Result record from its encoding, or ``None`` if ``text`` is not a result record."""
+    try:
+        record = json.loads(text)
+    except ValueError:
+        return None
+    return record if isinstance(record, dict) else None
+
+def write_result(record):
+    """Send ``record`` to the result channel given by the environment; returns ``False`` if there is none."""
+    if os.environ.get(RESULT_FD_VAR):
+        with os.fdopen(int(os.environ[RESULT_FD_VAR]), 'w') as fp:
+            fp.write(encode_result(record))
+    elif os.environ.get(RESULT_FILE_VAR):
+        path = os.environ[RESULT_FILE_VAR]
+        with open(path + '.tmp', 'w') as fp:
+            fp.write(encode_result(record))
+        os.replace(path + '.tmp', path)
+    else:
+        return False
+    return True
+
+def file_reporter(partials):
+    """Reporter appending the partial objectives to ``partials`` and writing them to ``DEEPHYPER_RESULT_FILE``."""
+    def reporter(step, objective):
+        partials.append((step, objective))
+        write_result(dict(partials=partials))
+    return reporter
+
+def serve(func):
+    """Evaluate ``func`` on every JSON line received on stdin until EOF."""
+    from deephyper.evaluator import report
+
+    channel = os.fdopen(os.dup(sys.stdout.fileno()), 'w')
+    sys.stdout.flush()
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+    def reporter(step, objective):
+        channel.write(f"{report.PARTIAL_TAG} {step} {objective}\n")
+        channel.flush()
+
+    for line in sys.stdin:
+        if not line.strip(): continue
+        d = json.loads(line)
+        record = evaluate(func, d, reporter)
+        sys.stdout.flush()
+        channel.write(f"{RESULT_TAG} {encode_result(record)}\n")
+        channel.flush()
+
 if __name__ == "__main__":
+    pin_from_env()
     modulePath = sys.argv[1]
     moduleName = sys.argv[2]
     module = load_module(moduleName, modulePath)
 
     funcName = sys.argv[3]
-    args = sys.argv[4]
-    d = json.loads(args)
     func = getattr(module, funcName)
+    args = sys.argv[4]
 
-    retval = func(d)
-    print("DH-OUTPUT:", retval)
+    if args == PERSISTENT_FLAG:
+        serve(func)
+    else:
+        d = json.loads(args)
+        reporter, partials = None, []
+        if os.environ.get(RESULT_FILE_VAR) and not os.environ.get(RESULT_FD_VAR):
+            reporter = file_reporter(partials)
+        record = evaluate(func, d, reporter)
+        if partials: record['partials'] = partials
+        sys.stdout.flush()
+        if not write_result(record) and 'objective' in record:
+            print("DH-OUTPUT:", record['objective'])
+        if 'error' in record: sys.exit(1)
@@ -0,0 +1,112 @@
+"""
+Dataset shared by the workers of an evaluator through memory-mapped files.
+
+A search loads its dataset once and saves it with ``share`` as ``.npy`` files;
+run functions then ``load`` it with ``numpy.load(..., mmap_mode='r')``: the
+arrays are read-only views of the OS page cache, so every worker process on a
+node (pool processes, persistent or fresh ``runner.py`` processes, MPI ranks)
+maps the same physical memory instead of reading and holding its own copy.
+The files are written in the temporary directory of the node by default; set
+``DEEPHYPER_DATA_DIR`` to a directory of a shared file system so that workers
+on other nodes can map them too.
+
+Only arrays, or nested tuples and lists of arrays, can be shared: a dataset
+made of generators or dicts is not (see ``shareable``).
+"""
+import atexit
+import json
+import logging
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = 'manifest.json'
+
+_loaded = {} # dirname --> data already mapped by this process
+
+def shareable(data):
+    """Whether ``data`` is an array, or nested tuples and lists of arrays, which ``share`` can save."""
+    if isinstance(data, (tuple, list)):
+        return len(data) > 0 and all(map(shareable, data))
+    return isinstance(data, np.ndarray) and data.dtype != object
+
+def _save(data, dirname, files):
+    if isinstance(data, (tuple, list)):
+        return [_save(item, dirname, files) for item in data]
+    fname = f'{len(files)}.npy'
+    np.save(os.path.join(dirname, fname), np.asarray(data))
+    files.append(fname)
+    return fname
+
+def _map(layout, dirname):
+    if isinstance(layout, list):
+        return tuple(_map(item, dirname) for item in layout)
+    return np.load(os.path.join(dirname, layout), mmap_mode='r')
+
+def share(data, dirname=None, cleanup=True):
+    """Save ``data`` for ``load``.
+
+    Args:
+        data: an array, or nested tuples or lists of arrays, e.g. ``(train_X, train_y), (valid_X, valid_y)``.
+        dirname (str): new directory holding the files; a fresh directory in ``DEEPHYPER_DATA_DIR`` (the temporary directory by default) if ``None``.
+        cleanup (bool): remove the directory when the process exits.
+
+    Returns:
+        str: the directory to pass to ``load``.
+    """
+    if dirname is None:
+        dirname = tempfile.mkdtemp(prefix='deephyper-data-',
+                                   dir=os.environ.get('DEEPHYPER_DATA_DIR', tempfile.gettempdir()))
+    else:
+        os.makedirs(dirname)
+    files = []
+    layout = _save(data, dirname, files)
+    with open(os.path.join(dirname, MANIFEST), 'w') as fp:
+        json.dump(layout, fp)
+    size = sum(os.path.getsize(os.path.join(dirname, f)) for f in files)
+    logger.info(f"Shared {len(files)} arrays ({size/2**20:.1f} MB) in {dirname}")
+    if cleanup:
+        atexit.register(shutil.rmtree, dirname, ignore_errors=True)
+    return dirname
+
+def load(dirname):
+    """Map the data saved by ``share``: same nesting of tuples, with read-only ``numpy.memmap`` arrays."""
+    if dirname not in _loaded:
+        with open(os.path.join(dirname, MANIFEST)) as fp:
+            layout = json.load(fp)
+        _loaded[dirname] = _map(layout, dirname)
+    return _loaded[dirname]
+
+def share_load_data(load_data, comm=None):
+    """Run the ``load_data`` function of a NAS problem once and share its result with the workers.
+
+    Sets ``load_data['shared']`` to the directory of the shared data, which ``deephyper.search.nas.model.run.alpha.run`` maps instead of calling the function again in every eval. If the data is not ``shareable``, nothing is shared and every eval still calls the function.
+
+    Args:
+        load_data (dict): the ``load_data`` entry of a NAS problem space, with a ``func`` (callable or its full name) and optional ``kwargs``.
+        comm (MPI.Comm): if given, the data is loaded by rank 0 only and its directory is broadcast to the other ranks.
+
+    Returns:
+        str: the directory of the shared data, or ``None``.
+    """
+    dirname = None
+    if comm is None or comm.Get_rank() == 0:
+        func = load_data['func']
+        if isinstance(func, str):
+            from deephyper.search.util import load_attr_from
+            func = load_attr_from(func)
+        data = func(**load_data.get('kwargs', None) or {})
+        if shareable(data):
+            dirname = share(data)
+        else:
+            logger.warning(f"The data returned by {load_data['func']} is not made of arrays: "
+                           "it is not shared and every eval loads it")
+    if comm is not None:
+        dirname = comm.bcast(dirname, root=0)
+    if dirname is not None:
+        load_data['shared'] = dirname
+    return dirname
@@ -7,6 +7,70 @@ def run(d):
     time.sleep(sleep)
     return  d['x1']**2 + d['x2']**2
 
+def run_metrics(d):
+    """``run`` returning its objective with another metric of the eval."""
+    import numpy as np
+    return dict(objective=run(d), norm=np.sqrt(run(d)))
+
+def run_batch(dd):
+    """Batch-capable ``run``."""
+    return [run(d) for d in dd]
+
+def run_straggler(d):
+    """``run`` where only the first attempt at ``d`` sleeps: it creates the file ``d['marker']``. It sleeps by steps of 0.1 sec, reporting a partial objective after each one so that it can be aborted."""
+    import os
+    from deephyper.evaluator.report import report_partial
+    try:
+        os.close(os.open(d['marker'], os.O_CREAT | os.O_EXCL))
+    except FileExistsError:
+        d = dict(d, sleep=0)
+    for _ in range(int(d.get('sleep', 0) * 10)):
+        time.sleep(0.1)
+        report_partial(0)
+    return run(dict(d, sleep=0))
+
+def run_affinity(d):
+    """``1000 * first core + number of cores`` the worker runs on; negative if ``OMP_NUM_THREADS`` is not the number of cores."""
+    import os
+    time.sleep(d.get('sleep', 0))
+    cpus = os.sched_getaffinity(0)
+    y = 1000 * min(cpus) + len(cpus)
+    return y if os.environ.get('OMP_NUM_THREADS') == str(len(cpus)) else -y
+
+def run_verbose(d):
+    """``run`` printing ``d['lines']`` lines of progress, among which a misleading ``DH-OUTPUT:`` line, then a progress bar of ``d['steps']`` steps redrawn with ``\\r`` on a single line."""
+    print("DH-OUTPUT: -1", flush=True)
+    for i in range(d.get('lines', 0)):
+        print(f"epoch {i}: loss {1/(i+1)}")
+    for i in range(d.get('steps', 0)):
+        print(f"\r{i}/{d['steps']} [" + "=" * 50 + "]", end='')
+    if d.get('steps'): print()
+    return run(d)
+
 def key(d):
     x1, x2, sleep, fail = d['x1'], d['x2'], d.get('sleep', 0), d.get('fail', False)
     return json.dumps(dict(x1=x1, x2=x2, sleep=sleep, fail=fail))
+
+def run_partial(d):
+    """Reports one partial objective per step, then sleeps before returning."""
+    from deephyper.evaluator.report import report_partial
+    if d.get('fail', False):
+        raise RuntimeError("Simulated failure (meant to happen!)")
+    y = d['x1']**2 + d['x2']**2
+    for step in range(1, d.get('steps', 3) + 1):
+        report_partial(y + 1.0/step)
+        time.sleep(d.get('step_sleep', 0))
+    time.sleep(d.get('sleep', 0))
+    return y
+
+def run_shared(d):
+    """Sum of the row ``i`` of the array shared in ``d['shared']``."""
+    from deephyper.evaluator import shared_data
+    (X, _), _ = shared_data.load(d['shared'])
+    return float(X[d['i']].sum())
+
+def load_data(n=4):
+    """Toy dataset in the ``load_data`` format of NAS problems."""
+    import numpy as np
+    X = np.arange(n*3, dtype=float).reshape(n, 3)
+    return (X, X[:, :1]), (X[:2], X[:2, :1])
@@ -21,12 +21,24 @@ Arguments of AMBS :
     * ``EI`` :
     * ``PI`` :
     * ``gp_hedge`` : (default)
+
+* ``refit-every`` : refit the surrogate model once this number of new results were received (default 1)
+* ``surrogate-jobs`` : number of jobs fitting the ``RF``, ``ET`` and ``GBRT`` learners and scoring the candidates, -1 for all the cores (default 1)
+* ``n-candidates`` : number of random candidates scored by the acquisition function (default 10000)
+* ``gp-max-points`` : maximum number of points the ``GP`` learner is fitted on, the best and the most recent ones, 0 for all the points (default 1000)
+* ``buffer-size`` : number of proposed points kept ready by the background optimizer (default: the number of workers)
+* ``stop-losing-evals-after`` : stop the evals whose partial objective (see ``report_partial``) is worse than the median of the other evals at the same step, once they reported this number of partial objectives; the optimizer is told their last partial objective (default: evals are not stopped)
+
+The surrogate is refitted and new points are proposed in a background thread (see ``BackgroundOptimizer``) so that freed workers are refilled right away from a buffer of ready points. The time workers spend waiting for a point is logged.
 """
 
 
+import asyncio
+from collections import deque
 import signal
+import time
 
-from deephyper.search.hps.optimizer import Optimizer
+from deephyper.search.hps.optimizer import Optimizer, BackgroundOptimizer
 from deephyper.search import Search
 from deephyper.search import util
 
@@ -34,6 +46,7 @@ logger = util.conf_logger('deephyper.search.hps.ambs')
 
 SERVICE_PERIOD = 2          # Delay (seconds) between main loop iterations
 CHECKPOINT_INTERVAL = 10    # How many jobs to complete between optimizer checkpoints
+REFILL_PERIOD = 0.5         # Delay (seconds) between checks of the ready points while workers are idle
 EXIT_FLAG = False
 
 def on_exit(signum, stack):
@@ -45,6 +58,11 @@ class AMBS(Search):
         super().__init__(problem, run, evaluator, **kwargs)
         logger.info("Initializing AMBS")
         self.optimizer = Optimizer(self.problem, self.num_workers, self.args)
+        buffer_size = self.args.buffer_size or self.num_workers
+        self.background = BackgroundOptimizer(self.optimizer, buffer_size)
+        self._freed = deque() # times at which workers were freed, not refilled yet
+        self.idle_sec = 0.0 # total time workers waited for a point
+        self.num_refills = 0
 
     @staticmethod
     def _extend_parser(parser):
@@ -63,9 +81,80 @@ class AMBS(Search):
             choices=["LCB", "EI", "PI","gp_hedge"],
             help='Acquisition function type'
         )
+        parser.add_argument('--refit-every',
+            type=int,
+            default=1,
+            help='Refit the surrogate model once this number of new results were received'
+        )
+        parser.add_argument('--surrogate-jobs',
+            type=int,
+            default=1,
+            help='Number of jobs fitting the RF, ET and GBRT learners and scoring the candidates (-1 for all the cores)'
+        )
+        parser.add_argument('--n-candidates',
+            type=int,
+            default=10000,
+            help='Number of random candidates scored by the acquisition function to propose new points'
+        )
+        parser.add_argument('--gp-max-points',
+            type=int,
+            default=1000,
+            help='Maximum number of points the GP learner is fitted on, the best and the most recent ones (0 for all the points)'
+        )
+        parser.add_argument('--buffer-size',
+            type=int,
+            default=None,
+            help='Number of proposed points kept ready for freed workers (default: the number of workers)'
+        )
+        parser.add_argument('--stop-losing-evals-after',
+            type=int,
+            default=None,
+            help='Stop the evals worse than the median of the other evals once they reported this number of partial objectives (default: never)'
+        )
         return parser
 
+    def _free(self, results):
+        """Hand ``results`` to the background optimizer; their workers wait for new points."""
+        if not results: return
+        self.background.tell(results)
+        self._freed.extend([time.time()] * len(results))
+
+    def _refill(self):
+        """Submit ready points to the waiting workers, waiting for one if no eval is running."""
+        if not self._freed: return
+        running = self.evaluator.pending_evals or self.evaluator.queued_evals
+        XX = self.background.take(len(self._freed), timeout=0 if running else REFILL_PERIOD)
+        if not XX: return
+        now = time.time()
+        for _ in XX:
+            self.idle_sec += now - self._freed.popleft()
+        self.num_refills += len(XX)
+        self.evaluator.add_eval_batch(XX)
+
+    def _stop_losing_evals(self):
+        """Apply the median stopping rule if ``--stop-losing-evals-after`` is set."""
+        if self.args.stop_losing_evals_after is None: return
+        stopped = self.evaluator.stop_losing_evals(min_steps=self.args.stop_losing_evals_after)
+        if stopped: logger.info(f"Stopped {len(stopped)} losing evals")
+
+    def _log_idle_time(self):
+        mean = self.idle_sec / self.num_refills if self.num_refills else 0.0
+        logger.info(f"Worker idle time: {self.idle_sec:.2f} sec in total, "
+                    f"{mean:.3f} sec per refill over {self.num_refills} refills")
+
     def main(self):
+        if self.evaluator.is_worker:
+            return self.evaluator.serve()
+        try:
+            if self.args.evaluator == 'asyncio':
+                self.evaluator.loop.run_until_complete(self.main_async())
+            else:
+                self.main_sync()
+        finally:
+            self.evaluator.shutdown()
+
+    def main_sync(self):
+        """Main loop polling the evaluator every ``SERVICE_PERIOD`` seconds."""
         timer = util.DelayTimer(max_minutes=None, period=SERVICE_PERIOD)
         chkpoint_counter = 0
         num_evals = 0
@@ -74,26 +163,70 @@ class AMBS(Search):
         XX = self.optimizer.ask_initial(n_points=self.num_workers)
         self.evaluator.add_eval_batch(XX)
 
-        # MAIN LOOP
-        for elapsed_str in timer:
-            logger.info(f"Elapsed time: {elapsed_str}")
-            results = list(self.evaluator.get_finished_evals())
-            num_evals += len(results)
-            chkpoint_counter += len(results)
-            if EXIT_FLAG or num_evals >= self.args.max_evals:
-                break
-            if results:
-                logger.info(f"Refitting model with batch of {len(results)} evals")
-                self.optimizer.tell(results)
-                logger.info(f"Drawing {len(results)} points with strategy {self.optimizer.strategy}")
-                for batch in self.optimizer.ask(n_points=len(results)):
-                    self.evaluator.add_eval_batch(batch)
-            if chkpoint_counter >= CHECKPOINT_INTERVAL:
-                self.evaluator.dump_evals()
-                chkpoint_counter = 0
+        self.background.start()
+        try:
+            # MAIN LOOP
+            for elapsed_str in timer:
+                logger.info(f"Elapsed time: {elapsed_str}")
+                self._stop_losing_evals()
+                results = list(self.evaluator.get_finished_evals())
+                num_evals += len(results)
+                chkpoint_counter += len(results)
+                if EXIT_FLAG or num_evals >= self.args.max_evals:
+                    break
+                self._free(results)
+                self._refill()
+                # no delay while workers are waiting for points
+                timer.delay = not self._freed
+                if chkpoint_counter >= CHECKPOINT_INTERVAL:
+                    self.evaluator.dump_evals()
+                    self._log_idle_time()
+                    chkpoint_counter = 0
+        finally:
+            self.background.stop()
+
+        logger.info('Hyperopt driver finishing')
+        self._log_idle_time()
+        self.evaluator.dump_evals(compact=True)
+
+    async def main_async(self):
+        """Main loop reacting to each completion as soon as it happens; requires the ``asyncio`` evaluator."""
+        chkpoint_counter = 0
+        num_evals = 0
+
+        logger.info(f"Generating {self.num_workers} initial points...")
+        XX = self.optimizer.ask_initial(n_points=self.num_workers)
+        self.evaluator.add_eval_batch(XX)
+
+        self.background.start()
+        try:
+            # MAIN LOOP
+            while True:
+                self._refill()
+                self._stop_losing_evals()
+                # while workers are waiting, the ready points are checked regularly
+                if self._freed: timeout = REFILL_PERIOD
+                elif self.args.stop_losing_evals_after is not None: timeout = SERVICE_PERIOD
+                else: timeout = None
+                try:
+                    results = await asyncio.wait_for(self.evaluator.get_finished_evals_async(), timeout)
+                except asyncio.TimeoutError:
+                    continue
+                num_evals += len(results)
+                chkpoint_counter += len(results)
+                if EXIT_FLAG or num_evals >= self.args.max_evals or not (results or self._freed):
+                    break
+                self._free(results)
+                if chkpoint_counter >= CHECKPOINT_INTERVAL:
+                    self.evaluator.dump_evals()
+                    self._log_idle_time()
+                    chkpoint_counter = 0
+        finally:
+            self.background.stop()
 
         logger.info('Hyperopt driver finishing')
-        self.evaluator.dump_evals()
+        self._log_idle_time()
+        self.evaluator.dump_evals(compact=True)
 
 if __name__ == "__main__":
     args = AMBS.parse_args()
@@ -35,6 +35,14 @@ class GA(Search):
         return parser
 
     def run(self):
+        if self.evaluator.is_worker:
+            return self.evaluator.serve()
+        try:
+            self.evolve()
+        finally:
+            self.evaluator.shutdown()
+
+    def evolve(self):
         # opt = GAOptimizer(cfg)
         # evaluator = evaluate.create_evaluator(cfg)
         logger.info(f"Starting new run")
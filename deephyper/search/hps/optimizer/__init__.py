@@ -1,4 +1,5 @@
 from deephyper.search.hps.optimizer.optimizer import Optimizer
+from deephyper.search.hps.optimizer.background import BackgroundOptimizer
 from deephyper.search.hps.optimizer.ga_optimizer import GAOptimizer
 
-__all__ = ['Optimizer', 'GAOptimizer']
+__all__ = ['Optimizer', 'BackgroundOptimizer', 'GAOptimizer']
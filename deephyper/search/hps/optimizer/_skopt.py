@@ -0,0 +1,28 @@
+"""
+The private parts of ``skopt`` used by ``Optimizer``.
+
+``skopt.Optimizer`` has no public way to refit its model without telling a
+new point, to read the number of initial random points left, or to evaluate
+an acquisition function on given predictions. These functions are the only
+place where the internals of ``skopt`` are used, so that a new version of
+``skopt`` only has to be checked here (the supported versions are pinned in
+``setup.py`` and the functions are tested in ``tests/deephyper/search/hps``).
+"""
+from skopt.acquisition import _gaussian_acquisition
+
+# ``acq_optimizer_kwargs`` of a ``skopt.Optimizer`` whose candidates are
+# scored outside of it: the point skopt proposes after a fit is not used
+NO_SAMPLING = {'n_points': 1}
+
+def refit(optimizer):
+    """Refit the model of the ``skopt.Optimizer`` on its current history, without telling a new point."""
+    optimizer._tell([], [], fit=True)
+
+def num_initial_points_left(optimizer):
+    """Number of random points the ``skopt.Optimizer`` proposes before fitting its model."""
+    return optimizer._n_initial_points
+
+def acquisition(X, model, y_opt, acq_func, acq_func_kwargs):
+    """Values of the acquisition function ``acq_func`` on the transformed points ``X`` under ``model``, lower is better."""
+    return _gaussian_acquisition(X=X, model=model, y_opt=y_opt, acq_func=acq_func,
+                                 acq_func_kwargs=acq_func_kwargs)
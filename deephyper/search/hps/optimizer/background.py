@@ -0,0 +1,90 @@
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+class BackgroundOptimizer:
+    """Run an ``Optimizer`` in a background thread which keeps a buffer of proposed points ready.
+
+    The results given to ``tell`` are told to the optimizer by the thread, which refits the surrogate while the search goes on, and the points consumed by ``take`` are replaced by new ones proposed with the latest model. A worker freed by a finished eval is thus refilled right away with a point of the buffer instead of waiting for the fit. The fits of scikit-learn release the GIL for most of their work, so a thread is enough to overlap them with the search.
+
+    Once started, the optimizer must only be used through this class.
+
+    Args:
+        optimizer (Optimizer): the optimizer, which already proposed the initial points.
+        buffer_size (int): number of points kept ready.
+    """
+    def __init__(self, optimizer, buffer_size):
+        self.optimizer = optimizer
+        self.buffer_size = max(buffer_size, 1)
+        self._results = queue.Queue()
+        self._ready = queue.Queue()
+        self._error = None
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name='BackgroundOptimizer', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        """Stop the thread after the fit or the points it is working on."""
+        self._stopped.set()
+        self._results.put(None) # wakes up the thread
+        self._thread.join()
+
+    def tell(self, results):
+        """Hand the ``(x, y)`` results to the thread, without waiting for the fit."""
+        self._results.put(list(results))
+
+    def take(self, n, timeout=0):
+        """Up to ``n`` ready points.
+
+        Args:
+            n (int): number of points wanted.
+            timeout (float): seconds to wait for a point if none is ready.
+
+        Returns:
+            list: the points, possibly fewer than ``n``.
+        """
+        points = []
+        try:
+            if n > 0 and timeout:
+                points.append(self._ready.get(timeout=timeout))
+            while len(points) < n:
+                points.append(self._ready.get_nowait())
+        except queue.Empty:
+            pass
+        if points:
+            self._results.put(None) # wakes up the thread to refill the buffer
+        if self._error is not None:
+            raise RuntimeError("The background optimizer failed") from self._error
+        return points
+
+    def _next_results(self, block):
+        """All the results told since the last call, waiting for some if ``block``."""
+        batches = []
+        try:
+            if block:
+                batches.append(self._results.get())
+            while True:
+                batches.append(self._results.get_nowait())
+        except queue.Empty:
+            pass
+        return [x_y for batch in batches if batch is not None for x_y in batch]
+
+    def _loop(self):
+        try:
+            while not self._stopped.is_set():
+                results = self._next_results(block=self._ready.qsize() >= self.buffer_size)
+                if results:
+                    logger.info(f"Refitting model with batch of {len(results)} evals")
+                    self.optimizer.tell(results)
+                # few points at a time, so that new results are told in between
+                missing = min(self.buffer_size - self._ready.qsize(), self.optimizer.POINTS_PER_FIT)
+                if missing > 0 and not self._stopped.is_set():
+                    for batch in self.optimizer.ask(n_points=missing):
+                        for x in batch: self._ready.put(x)
+        except Exception as e:
+            logger.exception("The background optimizer failed")
+            self._error = e
@@ -1,40 +1,119 @@
 from sys import float_info
 from skopt import Optimizer as SkOptimizer
+from skopt.learning import GaussianProcessRegressor
+from skopt.utils import cook_estimator
+from deephyper.search.hps.optimizer import _skopt
+from joblib import Parallel, delayed
+import numpy as np
 from numpy import inf
 import logging
 
 logger = logging.getLogger(__name__)
 
+class _Predictions:
+    """Stands for a model whose predictions on the candidates were already computed."""
+    def __init__(self, mu, std):
+        self.mu, self.std = mu, std
+
+    def predict(self, X, return_std=False):
+        return (self.mu, self.std) if return_std else self.mu
+
+class WindowedGaussianProcessRegressor(GaussianProcessRegressor):
+    """Gaussian process fitted on a window of at most ``max_points`` points, so that its fit and predictions take a bounded time whatever the number of points.
+
+    The window keeps the ``max_points // 2`` points with the lowest objectives, which shape the model around the optimum, and the most recent of the other points, which include the lies of the pending points. With fewer points the model is the exact Gaussian process.
+
+    Args:
+        max_points (int): size of the window.
+        **kwargs: parameters of ``skopt.learning.GaussianProcessRegressor``.
+    """
+    def __init__(self, max_points=1000, kernel=None, alpha=1e-10, optimizer='fmin_l_bfgs_b',
+                 n_restarts_optimizer=0, normalize_y=False, copy_X_train=True, random_state=None, noise=None):
+        super().__init__(kernel=kernel, alpha=alpha, optimizer=optimizer,
+                         n_restarts_optimizer=n_restarts_optimizer, normalize_y=normalize_y,
+                         copy_X_train=copy_X_train, random_state=random_state, noise=noise)
+        self.max_points = max_points
+
+    def _window(self, y):
+        """Mask of the points kept to fit the model."""
+        keep = np.zeros(len(y), dtype=bool)
+        num_best = self.max_points // 2
+        keep[np.argsort(y, kind='stable')[:num_best]] = True
+        keep[np.flatnonzero(~keep)[len(y) - self.max_points:]] = True
+        return keep
+
+    def fit(self, X, y):
+        X, y = np.asarray(X), np.asarray(y)
+        if len(y) > self.max_points:
+            keep = self._window(y)
+            X, y = X[keep], y[keep]
+        return super().fit(X, y)
+
 class Optimizer:
+    """Asynchronous Bayesian optimizer of AMBS, wrapping ``skopt.Optimizer``.
+
+    Every point handed to the search is told to the surrogate right away with a constant lie (see ``liar_strategy``), which ``tell`` replaces in place by the evaluated objective. The surrogate is refitted once ``args.refit_every`` results were told since the last fit, so the cost of a ``tell`` does not grow with the history besides the fit itself.
+
+    A batch of points is proposed with one fit per ``POINTS_PER_FIT`` points instead of one per point: the acquisition function is evaluated once on ``args.n_candidates`` random candidates and the best ones are picked greedily, each pick excluding its nearest candidates so that the points of a batch are spread out. The lies of a round of picks are taken into account by the fit of the next round.
+
+    The ``RF``, ``ET`` and ``GBRT`` learners are fitted with ``args.surrogate_jobs`` jobs, and the candidates are scored by chunks of ``SCORE_CHUNK`` candidates in as many threads, with a single prediction of the model per chunk for all the acquisition functions.
+
+    The ``GP`` learner is a ``WindowedGaussianProcessRegressor`` fitted on at most ``args.gp_max_points`` points, unless it is 0.
+
+    Args:
+        problem: the ``HpProblem`` to optimize.
+        num_workers (int): number of initial random points.
+        args: the AMBS command line arguments ``learner``, ``acq_func``, ``liar_strategy``, ``refit_every``, ``surrogate_jobs``, ``n_candidates`` and ``gp_max_points``.
+    """
     SEED = 12345
     KAPPA = 1.96
+    POINTS_PER_FIT = 16 # points of a batch proposed by the same model
+    SCORE_CHUNK = 4096 # candidates scored at once, bounds the memory of the predictions
+    HEDGE_FUNCS = ['EI', 'LCB', 'PI'] # acquisition functions mixed by gp_hedge
+    HEDGE_ETA = 1.0
 
     def __init__(self, problem, num_workers, args):
         assert args.learner in ["RF", "ET", "GBRT", "GP", "DUMMY"], f"Unknown scikit-optimize base_estimator: {args.learner}"
 
         self.space = problem.space
         n_init = inf if args.learner=='DUMMY' else num_workers
+        base_estimator = args.learner
+        if args.learner == 'GP' and args.gp_max_points > 0:
+            gp = cook_estimator('GP', space=self.space.values(), random_state=self.SEED)
+            base_estimator = WindowedGaussianProcessRegressor(max_points=args.gp_max_points,
+                                                              **gp.get_params(deep=False))
         self._optimizer = SkOptimizer(
             self.space.values(),
-            base_estimator=args.learner,
+            base_estimator=base_estimator,
             acq_optimizer='sampling',
             acq_func=args.acq_func,
             acq_func_kwargs={'kappa':self.KAPPA},
+            # the candidates are scored by ``_select``, not by skopt
+            acq_optimizer_kwargs=_skopt.NO_SAMPLING,
             random_state=self.SEED,
-            n_initial_points=n_init
+            n_initial_points=n_init,
+            model_queue_size=1,
+            n_jobs=args.surrogate_jobs
         )
+        self.n_jobs = args.surrogate_jobs
+        self.n_candidates = args.n_candidates
 
         assert args.liar_strategy in "cl_min cl_mean cl_max".split()
         self.strategy = args.liar_strategy
         self.evals = {}
         self.counter = 0
+        self._positions = {} # key --> indices of its lies and results in Xi/yi
+        self.refit_every = max(args.refit_every, 1)
+        self._num_unfitted = 0 # results told since the last fit
+        self._gains = np.zeros(len(self.HEDGE_FUNCS))
+        self._hedge_xs = None # best candidate of each acquisition function
         logger.info("Using skopt.Optimizer with %s base_estimator" % args.learner)
 
     def _get_lie(self):
         if self.strategy == "cl_min":
             return min(self._optimizer.yi) if self._optimizer.yi else 0.0
         elif self.strategy == "cl_mean":
-            return self._optimizer.yi.mean() if self._optimizer.yi else 0.0
+            return sum(self._optimizer.yi) / len(self._optimizer.yi) if self._optimizer.yi else 0.0
         else:
             return  max(self._optimizer.yi) if self._optimizer.yi else 0.0
 
@@ -46,52 +125,130 @@ class Optimizer:
     def to_dict(self, x):
         return {k:v for k,v in zip(self.space, x)}
 
-    def _ask(self):
-        x = self._optimizer.ask()
-        y = self._get_lie()
-        self._optimizer.tell(x,y)
+    def _append(self, x, y, fit):
+        """Tell the lie ``y`` of the new point ``x``."""
+        self._positions.setdefault(tuple(x), []).append(len(self._optimizer.yi))
+        self._optimizer.tell(x, y, fit=fit)
         self.evals[tuple(x)] = y
-        logger.debug(f'_ask: {x} lie: {y}')
-        return self.to_dict(x)
+
+    def _fit(self):
+        """Refit the surrogate on the current history and update the next point it proposes."""
+        _skopt.refit(self._optimizer)
+        self._num_unfitted = 0
+
+    def _score(self, est, X, acq_funcs):
+        """Values of each of the ``acq_funcs`` on the transformed candidates ``X`` under the model ``est``, lower is better."""
+        opt = self._optimizer
+        y_opt = np.min(opt.yi)
+        def score(chunk):
+            model = _Predictions(*est.predict(chunk, return_std=True))
+            return [_skopt.acquisition(chunk, model, y_opt, func, opt.acq_func_kwargs)
+                    for func in acq_funcs]
+        chunks = [X[i:i+self.SCORE_CHUNK] for i in range(0, len(X), self.SCORE_CHUNK)]
+        values = Parallel(n_jobs=self.n_jobs, prefer='threads')(delayed(score)(chunk) for chunk in chunks)
+        return [np.concatenate([v[k] for v in values]) for k in range(len(acq_funcs))]
+
+    def _acquisition(self, est, X):
+        """Acquisition values of the transformed candidates ``X`` under the model ``est``, lower is better."""
+        opt = self._optimizer
+        if opt.acq_func != 'gp_hedge':
+            return self._score(est, X, [opt.acq_func])[0]
+        # rewards each acquisition function with the value its last best candidate has under the new model
+        if self._hedge_xs is not None:
+            self._gains -= est.predict(self._hedge_xs)
+        values = self._score(est, X, self.HEDGE_FUNCS)
+        self._hedge_xs = np.vstack([X[np.argmin(v)] for v in values])
+        logits = self.HEDGE_ETA * (self._gains - np.max(self._gains))
+        probs = np.exp(logits) / np.sum(np.exp(logits))
+        return values[np.argmax(opt.rng.multinomial(1, probs))]
+
+    def _select(self, est, n):
+        """``n`` new points with the best acquisition values, spread out over the space."""
+        opt = self._optimizer
+        X = opt.space.transform(opt.space.rvs(n_samples=self.n_candidates, random_state=opt.rng))
+        values = self._acquisition(est, X)
+        available = np.ones(len(X), dtype=bool)
+        num_excluded = max(len(X) // (2 * n), 1) # neighbourhood claimed by a pick
+        XX = []
+        for i in np.argsort(values):
+            if len(XX) == n: break
+            if not available[i]: continue
+            x = opt.space.inverse_transform(X[i:i+1])[0]
+            if tuple(x) in self.evals or x in XX: continue
+            XX.append(x)
+            dist = np.sum((X - X[i])**2, axis=1)
+            available[np.argpartition(dist, num_excluded - 1)[:num_excluded]] = False
+        if len(XX) < n:
+            XX += opt.space.rvs(n_samples=n - len(XX), random_state=opt.rng)
+        return XX
+
+    def _ask_points(self, n):
+        """Generate ``n`` new points, told to the surrogate with their lies."""
+        opt = self._optimizer
+        fitted = False
+        while n > 0:
+            num_initial = _skopt.num_initial_points_left(opt)
+            if num_initial > 0 or opt.base_estimator_ is None:
+                k = int(min(n, num_initial))
+                XX = opt.space.rvs(n_samples=k, random_state=opt.rng)
+            else:
+                # the model of the first round is the one fitted by the last tell
+                if fitted or not opt.models: self._fit()
+                fitted = True
+                k = min(n, self.POINTS_PER_FIT)
+                XX = self._select(opt.models[-1], k)
+            for x in XX:
+                y = self._get_lie()
+                self._append(x, y, fit=False)
+                logger.debug(f'_ask: {x} lie: {y}')
+                yield self.to_dict(x)
+            n -= k
 
     def ask(self, n_points=None, batch_size=20):
+        """New points to evaluate.
+
+        Args:
+            n_points (int): number of points; if ``None``, a single point is returned.
+            batch_size (int): the points are generated in lists of up to ``batch_size`` points.
+
+        Returns:
+            dict: the point if ``n_points`` is ``None``, else a generator of lists of points.
+        """
         if n_points is None:
             self.counter += 1
-            return self._ask()
-        else:
-            self.counter += n_points
-            batch = []
-            for i in range(n_points):
-                batch.append(self._ask())
-                if len(batch) == batch_size:
-                    yield batch
-                    batch = []
-            if batch:
+            return next(self._ask_points(1))
+        self.counter += n_points
+        return self._batches(n_points, batch_size)
+
+    def _batches(self, n_points, batch_size):
+        batch = []
+        for x in self._ask_points(n_points):
+            batch.append(x)
+            if len(batch) == batch_size:
                 yield batch
+                batch = []
+        if batch:
+            yield batch
 
     def ask_initial(self, n_points):
-        XX = self._optimizer.ask(n_points=n_points)
-        for x in XX:
-            self.evals[tuple(x)] = 0.0
         self.counter += n_points
-        return [self.to_dict(x) for x in XX]
+        return list(self._ask_points(n_points))
 
     def tell(self, xy_data):
         assert isinstance(xy_data, list), f"where type(xy_data)=={type(xy_data)}"
-        maxval = max(self._optimizer.yi) if self._optimizer.yi else 0.0
+        yi = self._optimizer.yi
+        maxval = max(yi) if yi else 0.0
         for x,y in xy_data:
             key = tuple(x[k] for k in self.space)
             assert key in self.evals, f"where key=={key} and self.evals=={self.evals}"
             logger.debug(f'tell: {x} --> {key}: evaluated objective: {y}')
             self.evals[key] = (y if y < float_info.max else maxval)
+            # the lie is replaced in place
+            for i in self._positions[key]: yi[i] = self.evals[key]
 
-        self._optimizer.Xi = []
-        self._optimizer.yi = []
-        XX, YY = self._xy_from_dict()
-        assert len(XX) == len(YY) == self.counter, (
-            f"where len(XX)=={len(XX)},"
-            f"len(YY)=={len(YY)}, self.counter=={self.counter}")
-        self._optimizer.tell(XX, YY)
+        self._num_unfitted += len(xy_data)
+        if self._num_unfitted >= self.refit_every:
+            self._fit()
         assert len(self._optimizer.Xi) == len(self._optimizer.yi) == self.counter, (
             f"where len(self._optimizer.Xi)=={len(self._optimizer.Xi)}, "
             f"len(self._optimizer.yi)=={len(self._optimizer.yi)},"
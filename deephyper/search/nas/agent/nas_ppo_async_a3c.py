@@ -34,7 +34,7 @@ def train(num_episodes, seed, space, evaluator, num_episodes_per_batch, reward_r
     timesteps_per_actorbatch = num_nodes * num_episodes_per_batch
     num_timesteps = timesteps_per_actorbatch * num_episodes
 
-    env = NasEnv(space, evaluator, structure)
+    env = NasEnv(space, evaluator, structure, eval_batch_size=num_episodes_per_batch)
 
     def policy_fn(name, ob_space, ac_space): #pylint: disable=W0613
         return lstm.LstmPolicy(name=name, ob_space=ob_space, ac_space=ac_space,
@@ -104,7 +104,7 @@ def train(num_episodes, seed, space, evaluator, num_episodes_per_batch):
         max_timesteps = num_timesteps
         timesteps_per_actorbatch=timesteps_per_actorbatch
 
-        env = NasEnv(space, evaluator, structure)
+        env = NasEnv(space, evaluator, structure, eval_batch_size=num_episodes_per_batch)
 
         seg_gen = traj_segment_generator(env, timesteps_per_actorbatch)
 
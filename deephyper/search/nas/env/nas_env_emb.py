@@ -6,11 +6,13 @@ from gym import spaces
 
 class NasEnvEmb(gym.Env):
 
-    def __init__(self, space, evaluator, structure):
+    def __init__(self, space, evaluator, structure, eval_batch_size=1):
 
         self.space = space
         self.structure = structure
         self.evaluator = evaluator
+        self.eval_batch_size = eval_batch_size
+        self.eval_buffer = []
 
         self.dim_ob_sp = len(structure.get_hash(0, 0))
         self.observation_space = spaces.Box(low=0, high=1,
@@ -44,14 +46,24 @@ class NasEnvEmb(gym.Env):
         if rank != None:
             cfg['rank'] = rank
 
-        self.evaluator.add_eval(cfg)
+        self.eval_buffer.append(cfg)
+        if len(self.eval_buffer) >= self.eval_batch_size:
+            self.flush_evals()
 
         # ob, reward, terminal
         return self._state, None, terminal, {}
 
+    def flush_evals(self):
+        """Submit the finished episodes waiting in ``eval_buffer`` with a single ``add_eval_batch`` call."""
+        if self.eval_buffer:
+            self.evaluator.add_eval_batch(self.eval_buffer)
+            self.eval_buffer = []
+
     def get_rewards_ready(self):
+        self.flush_evals()
         return self.evaluator.get_finished_evals()
 
     def reset(self):
-        self.__init__(self.space, self.evaluator, self.structure)
+        self._state = np.array([0 for i in range(self.dim_ob_sp)])
+        self.action_buffer = []
         return self._state
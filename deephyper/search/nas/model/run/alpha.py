@@ -1,8 +1,10 @@
+import os
 from random import random
 
 import numpy as np
 from tensorflow import keras
 
+from deephyper.evaluator import affinity, shared_data
 from deephyper.search import util
 from deephyper.search.nas.model.trainer.classifier_train_valid import \
     TrainerClassifierTrainValid
@@ -12,6 +14,9 @@ from deephyper.search.nas.model.trainer.regressor_train_valid import \
 logger = util.conf_logger('deephyper.search.nas.run')
 
 def run(config):
+    # thread pools sized to the cores of this worker
+    affinity.configure_tensorflow()
+
     # load functions
     load_data = util.load_attr_from(config['load_data']['func'])
     config['load_data']['func'] = load_data
@@ -19,8 +24,14 @@ def run(config):
         config['create_structure']['func'])
 
     # Loading data
-    kwargs = config['load_data'].get('kwargs')
-    (t_X, t_y), (v_X, v_y) = load_data() if kwargs is None else load_data(**kwargs)
+    shared = config['load_data'].get('shared')
+    if shared is not None and os.path.isdir(shared):
+        # zero-copy views of the data loaded once by the search
+        (t_X, t_y), (v_X, v_y) = shared_data.load(shared)
+    else:
+        # not shared, or shared in the temporary directory of another node
+        kwargs = config['load_data'].get('kwargs')
+        (t_X, t_y), (v_X, v_y) = load_data() if kwargs is None else load_data(**kwargs)
     print('[PARAM] Data loaded')
 
     # Set data shape
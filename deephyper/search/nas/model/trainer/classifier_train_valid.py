@@ -3,6 +3,7 @@ import numpy as np
 
 import deephyper.search.nas.model.arch as a
 import deephyper.search.nas.model.train_utils as U
+from deephyper.evaluator import report_partial
 from deephyper.search import util
 from deephyper.search.nas.utils._logging import JsonMessage as jm
 
@@ -116,5 +117,6 @@ class TrainerClassifierTrainValid:
 
             max_acc = max(max_acc, valid_acc)
             logger.info(jm(epoch=i, validation_loss=valid_loss, validation_acc=float(valid_acc)))
+            report_partial(float(valid_acc), step=i)
         logger.info(jm(type='result', acc=float(max_acc)))
         return max_acc
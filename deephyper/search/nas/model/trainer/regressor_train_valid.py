@@ -6,6 +6,7 @@ from sklearn.metrics import mean_squared_error
 
 import deephyper.search.nas.model.arch as a
 import deephyper.search.nas.model.train_utils as U
+from deephyper.evaluator import report_partial
 from deephyper.search import util
 from deephyper.search.nas.utils._logging import JsonMessage as jm
 
@@ -158,6 +159,8 @@ class TrainerRegressorTrainValid:
 
             min_mse = min(min_mse, unnormalize_mse)
             logger.info(jm(epoch=i, validation_mse=float(unnormalize_mse)))
+            # the objective of the eval is -mse
+            report_partial(-float(unnormalize_mse), step=i)
 
         logger.info(jm(type='result', mse=float(min_mse)))
         return min_mse
@@ -0,0 +1,29 @@
+from deephyper.evaluator import shared_data
+from deephyper.search import Search
+
+
+class NeuralArchitectureSearch(Search):
+    """Base class of the neural architecture searches.
+
+    The MPI ranks of a neural architecture search are its agents, which all submit evals to their own evaluator: the ``mpi`` evaluator, whose ranks are workers, is not supported.
+    """
+    EVALUATORS = [method for method in Search.EVALUATORS if method != 'mpi']
+
+    def share_load_data(self, comm=None):
+        """With ``--share-data``, load the dataset of the problem once and share it with the workers (see ``shared_data.share_load_data``).
+
+        Args:
+            comm (MPI.Comm): the agents of the search; only rank 0 loads the data.
+        """
+        if self.args.share_data:
+            shared_data.share_load_data(self.problem.space['load_data'], comm=comm)
+
+    @staticmethod
+    def _base_parser(evaluators=EVALUATORS):
+        parser = Search._base_parser(evaluators)
+        parser.add_argument('--share-data',
+            action='store_true',
+            help="Load the dataset once and share it with the workers through memory-mapped files; "
+            "set DEEPHYPER_DATA_DIR to a shared file system when the workers run on other nodes"
+        )
+        return parser
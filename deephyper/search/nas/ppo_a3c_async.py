@@ -6,7 +6,8 @@ from mpi4py import MPI
 import math
 
 from deephyper.evaluator import Evaluator
-from deephyper.search import util, Search
+from deephyper.search import util
+from deephyper.search.nas.nas_search import NeuralArchitectureSearch
 
 from deephyper.search.nas.agent import nas_ppo_async_a3c
 
@@ -22,7 +23,7 @@ def key(d):
 LAUNCHER_NODES = int(os.environ.get('BALSAM_LAUNCHER_NODES', 1))
 WORKERS_PER_NODE = int(os.environ.get('DEEPHYPER_WORKERS_PER_NODE', 1))
 
-class NasPPOAsyncA3C(Search):
+class NasPPOAsyncA3C(NeuralArchitectureSearch):
     """Neural Architecture search using proximal policy gradient with asynchronous optimization.
     """
 
@@ -33,7 +34,8 @@ class NasPPOAsyncA3C(Search):
         # set in super : self.evaluator
         self.evaluator = Evaluator.create(self.run_func,
                                           cache_key=key,
-                                          method=evaluator)
+                                          method=evaluator,
+                                          **self.evaluator_options())
 
         self.num_episodes = kwargs.get('num_episodes')
         if self.num_episodes is None:
@@ -42,6 +44,7 @@ class NasPPOAsyncA3C(Search):
         self.reward_rule = util.load_attr_from('deephyper.search.nas.agent.utils.'+kwargs['reward_rule'])
 
         self.space = self.problem.space
+        self.share_load_data(comm=MPI.COMM_WORLD)
 
         logger.debug(f'evaluator: {type(self.evaluator)}')
 
@@ -80,14 +83,17 @@ class NasPPOAsyncA3C(Search):
             logger.debug(f'<Rank={self.rank}> num_episodes_per_batch: {num_episodes_per_batch}')
 
         logger.debug(f'<Rank={self.rank}> starting training...')
-        nas_ppo_async_a3c.train(
-            num_episodes=self.num_episodes,
-            seed=2018,
-            space=self.problem.space,
-            evaluator=self.evaluator,
-            num_episodes_per_batch=num_episodes_per_batch,
-            reward_rule=self.reward_rule
-        )
+        try:
+            nas_ppo_async_a3c.train(
+                num_episodes=self.num_episodes,
+                seed=2018,
+                space=self.problem.space,
+                evaluator=self.evaluator,
+                num_episodes_per_batch=num_episodes_per_batch,
+                reward_rule=self.reward_rule
+            )
+        finally:
+            self.evaluator.shutdown()
 
 if __name__ == "__main__":
     args = NasPPOAsyncA3C.parse_args()
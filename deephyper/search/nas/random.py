@@ -8,7 +8,8 @@ import tensorflow as tf
 from mpi4py import MPI
 
 from deephyper.evaluator import Evaluator
-from deephyper.search import Search, util
+from deephyper.search import util
+from deephyper.search.nas.nas_search import NeuralArchitectureSearch
 from deephyper.search.nas.agent import nas_random
 
 logger = util.conf_logger('deephyper.search.run_nas')
@@ -23,9 +24,10 @@ def key(d):
 LAUNCHER_NODES = int(os.environ.get('BALSAM_LAUNCHER_NODES', 1))
 WORKERS_PER_NODE = int(os.environ.get('DEEPHYPER_WORKERS_PER_NODE', 1))
 
-class NasRandom(Search):
+class NasRandom(NeuralArchitectureSearch):
     """Neural Architecture search using random search.
     """
+
     def __init__(self, problem, run, evaluator, **kwargs):
         super().__init__(problem, run, evaluator, **kwargs)
         # set in super : self.problem
@@ -33,11 +35,13 @@ class NasRandom(Search):
         # set in super : self.evaluator
         self.evaluator = Evaluator.create(self.run_func,
                                           cache_key=key,
-                                          method=evaluator)
+                                          method=evaluator,
+                                          **self.evaluator_options())
         self.num_episodes = kwargs.get('num_episodes')
         if self.num_episodes is None:
             self.num_episodes = math.inf
         self.space = self.problem.space
+        self.share_load_data(comm=MPI.COMM_WORLD)
         logger.debug(f'evaluator: {type(self.evaluator)}')
         self.num_agents = MPI.COMM_WORLD.Get_size() - 1 # one is  the parameter server
         self.rank = MPI.COMM_WORLD.Get_rank()
@@ -66,13 +70,16 @@ class NasRandom(Search):
 
         logger.debug(f'<Rank={self.rank}> starting training...')
 
-        nas_random.train(
-            num_episodes=self.num_episodes,
-            seed=2018,
-            space=self.problem.space,
-            evaluator=self.evaluator,
-            num_episodes_per_batch=num_episodes_per_batch
-        )
+        try:
+            nas_random.train(
+                num_episodes=self.num_episodes,
+                seed=2018,
+                space=self.problem.space,
+                evaluator=self.evaluator,
+                num_episodes_per_batch=num_episodes_per_batch
+            )
+        finally:
+            self.evaluator.shutdown()
 
 if __name__ == "__main__":
     args = NasRandom.parse_args()
@@ -22,18 +22,25 @@ class Search:
     Args:
         problem (str):
         run (str):
-        evaluator (str): in ['balsam', 'subprocess', 'processPool', 'threadPool']
+        evaluator (str): one of ``EVALUATORS``.
     """
+    EVALUATORS = ['balsam', 'subprocess', 'processPool', 'threadPool', 'asyncio', 'mpi']
+
     def __init__(self, problem, run, evaluator, **kwargs):
+        if evaluator not in self.EVALUATORS:
+            raise ValueError(f"{type(self).__name__} does not support the {evaluator} evaluator, use one of {self.EVALUATORS}")
         _args = vars(self.parse_args(''))
         _args.update(kwargs)
+        if _args['persistent_workers'] and evaluator != 'subprocess':
+            raise ValueError("--persistent-workers requires the subprocess evaluator")
         _args['problem'] = problem
         _args['run'] = run
         self.args = Namespace(**_args)
         self.problem = util.generic_loader(problem, 'Problem')
         self.run_func = util.generic_loader(run, 'run')
         logger.info('Evaluator will execute the function: '+run)
-        self.evaluator = Evaluator.create(self.run_func, method=evaluator)
+        self.evaluator = Evaluator.create(self.run_func, method=evaluator,
+                                          **self.evaluator_options())
         self.num_workers = self.evaluator.num_workers
 
         logger.info(f'Options: '+pformat(self.args.__dict__, indent=4))
@@ -41,12 +48,30 @@ class Search:
         logger.info(f'Created {self.args.evaluator} evaluator')
         logger.info(f'Evaluator: num_workers is {self.num_workers}')
 
+    def evaluator_options(self):
+        """Keyword arguments of ``Evaluator.create`` set from the command line."""
+        options = dict(
+            cache_file=self.args.cache_file,
+            cache_namespace=self.args.cache_namespace or self._problem_name(),
+            cache_max_entries=self.args.cache_max_entries,
+            eval_timeout=self.args.eval_timeout_minutes * 60,
+            batch_size=self.args.eval_batch_size,
+            speculation_percentile=self.args.speculation_percentile
+        )
+        if self.args.persistent_workers:
+            options.update(persistent=True, max_evals_per_worker=self.args.max_evals_per_worker)
+        return options
+
+    def _problem_name(self):
+        problem = self.args.problem
+        return problem if isinstance(problem, str) else f'{type(problem).__module__}.{type(problem).__name__}'
+
     def main(self):
         raise NotImplementedError
 
     @classmethod
     def parse_args(cls, arg_str=None):
-        base_parser = cls._base_parser()
+        base_parser = cls._base_parser(cls.EVALUATORS)
         parser = cls._extend_parser(base_parser)
         if arg_str is not None:
             return parser.parse_args(arg_str)
@@ -58,7 +83,7 @@ class Search:
         raise NotImplementedError
 
     @staticmethod
-    def _base_parser():
+    def _base_parser(evaluators=EVALUATORS):
         parser = argparse.ArgumentParser()
         parser.add_argument("--problem",
             default="deephyper.benchmark.hps.rosen2.problem.Problem"
@@ -81,7 +106,45 @@ class Search:
         )
         parser.add_argument('--evaluator',
             default='subprocess',
-            choices=['balsam', 'subprocess', 'processPool', 'threadPool'],
+            choices=evaluators,
             help="The evaluator is an object used to run the model."
         )
+        parser.add_argument('--cache-file',
+            default=None,
+            help="SQLite file caching evaluations across runs; it must be on a node-local "
+            "filesystem when several agents share it"
+        )
+        parser.add_argument('--cache-namespace',
+            default=None,
+            help="Results are only reused by searches with the same run function and namespace; "
+            "defaults to the --problem, set it when the problem loads different datasets"
+        )
+        parser.add_argument('--cache-max-entries',
+            type=int,
+            default=None,
+            help="Maximum number of results kept in --cache-file, the least recently used ones "
+            "are evicted (default: no limit)"
+        )
+        parser.add_argument('--persistent-workers',
+            action='store_true',
+            help="With the subprocess evaluator, keep long-lived worker processes which import "
+            "the run function once instead of starting a process per eval"
+        )
+        parser.add_argument('--max-evals-per-worker',
+            type=int,
+            default=None,
+            help="With --persistent-workers, replace a worker by a fresh process after this number of evals"
+        )
+        parser.add_argument('--eval-batch-size',
+            type=int,
+            default=None,
+            help="The run function is batch-capable (list of configs --> list of objectives): "
+            "send up to this number of configs per call"
+        )
+        parser.add_argument('--speculation-percentile',
+            type=float,
+            default=None,
+            help="Duplicate an eval on a free worker when it runs longer than this "
+            "percentile (0-100) of the finished evals' run times; the first copy to finish wins"
+        )
         return parser
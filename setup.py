@@ -26,7 +26,7 @@ VERSION = None
 REQUIRED = [
     # 'requests', 'maya', 'records',
     'numpy',
-    'scikit-optimize',
+    'scikit-optimize>=0.10,<0.11', # private API used in deephyper/search/hps/optimizer/_skopt.py
     'scikit-learn',
     'tqdm',
     'tensorflow>=1.11.0',
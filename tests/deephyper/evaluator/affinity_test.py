@@ -0,0 +1,42 @@
+import os
+
+import pytest
+
+from deephyper.evaluator import Evaluator, affinity, runner
+from deephyper.evaluator.test_functions import run_affinity
+
+
+def test_partition():
+    assert affinity.partition(range(8), 3) == [[0, 1, 2], [3, 4, 5], [6, 7]]
+    assert affinity.partition([4, 5], 3) == [[4], [5], [4]]
+    assert affinity.format_cpus([0, 1, 2, 5, 7, 8]) == '0-2,5,7-8'
+    assert runner.parse_cpus('0-2,5,7-8') == [0, 1, 2, 5, 7, 8]
+    env = affinity.thread_env(4)
+    assert env['OMP_NUM_THREADS'] == env['TF_NUM_INTRAOP_THREADS'] == '4'
+    assert env['TF_NUM_INTEROP_THREADS'] == '2'
+
+
+@pytest.mark.skipif(not hasattr(os, 'sched_setaffinity'), reason="needs sched_setaffinity")
+@pytest.mark.parametrize('method,options', [
+    ('subprocess', {}),
+    ('subprocess', dict(persistent=True)),
+    ('processPool', {}),
+    ('asyncio', {}),
+])
+def test_workers_are_pinned(method, options, monkeypatch):
+    monkeypatch.setattr(Evaluator, 'WORKERS_PER_NODE', 2)
+    blocks = affinity.partition(affinity.available_cpus(), 2)
+    ev = Evaluator.create(run_affinity, method=method, **options)
+    evals = [dict(x1=i, x2=0, sleep=0.5) for i in range(2)]
+    ev.add_eval_batch(evals)
+    res = list(ev.await_evals(evals, timeout=30))
+
+    # each of the two concurrent evals ran on the cores of its own worker
+    assert sorted(y for _, y in res) == sorted(1000 * cpus[0] + len(cpus) for cpus in blocks)
+
+
+def test_binding_can_be_disabled(monkeypatch):
+    monkeypatch.setattr(Evaluator, 'WORKERS_PER_NODE', 2)
+    monkeypatch.setattr(Evaluator, 'CPU_BINDING', False)
+    ev = Evaluator.create(run_affinity, method='subprocess')
+    assert ev._worker_cpus is None
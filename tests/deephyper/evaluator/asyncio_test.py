@@ -0,0 +1,57 @@
+import time
+
+import pytest
+
+from deephyper.evaluator import Evaluator
+from deephyper.evaluator.test_functions import run, run_verbose, key
+
+
+@pytest.fixture
+def ev(monkeypatch):
+    monkeypatch.setattr(Evaluator, 'WORKERS_PER_NODE', 4)
+    ev = Evaluator.create(run, cache_key=key, method='asyncio')
+    yield ev
+    ev.shutdown()
+
+
+def test_as_completed(ev):
+    evals = [
+        dict(ID="test1", x1=3, x2=4, sleep=1),
+        dict(ID="test2", x1=1, x2=1),
+        dict(ID="test3", x1=3, x2=4, fail=True),
+    ]
+
+    async def search():
+        ev.add_eval_batch(evals)
+        return [x_y async for x_y in ev.as_completed()]
+
+    res = ev.loop.run_until_complete(search())
+    assert res[-1] == (evals[0], 25)
+    assert sorted(res[:2], key=lambda r: r[0]['ID']) == [
+        (evals[1], 2), (evals[2], Evaluator.FAIL_RETURN_VALUE)]
+
+
+def test_first_completion_is_returned_immediately(ev):
+    ev.add_eval(dict(ID="slow", x1=3, x2=4, sleep=30))
+    ev.add_eval(dict(ID="fast", x1=1, x2=1))
+
+    start = time.time()
+    res = ev.loop.run_until_complete(ev.get_finished_evals_async())
+    assert time.time() - start < 10
+    assert res == [(dict(ID="fast", x1=1, x2=1), 2)]
+
+
+def test_sync_interface(ev):
+    evals = [dict(ID=f"test{i}", x1=i, x2=0) for i in range(6)]
+    ev.add_eval_batch(evals)
+    assert list(ev.await_evals(evals, timeout=60)) == [(x, x['x1']**2) for x in evals]
+
+
+def test_long_output_lines(monkeypatch):
+    monkeypatch.setattr(Evaluator, 'WORKERS_PER_NODE', 1)
+    ev = Evaluator.create(run_verbose, method='asyncio')
+    # about 200 kB without a newline
+    x = dict(x1=1, x2=2, steps=3000)
+    ev.add_eval(x)
+    assert list(ev.await_evals([x], timeout=60)) == [(x, 5)]
+    ev.shutdown()
@@ -0,0 +1,39 @@
+import pytest
+
+from deephyper.evaluator import Evaluator
+from deephyper.evaluator.test_functions import run, run_batch, key
+
+
+@pytest.fixture(params=['processPool', 'threadPool'])
+def ev(request, monkeypatch):
+    monkeypatch.setattr(Evaluator, 'WORKERS_PER_NODE', 2)
+    ev = Evaluator.create(run_batch, cache_key=key, method=request.param, batch_size=4)
+    yield ev
+    ev.shutdown()
+
+
+def test_micro_batches(ev):
+    evals = [dict(x1=i, x2=1) for i in range(10)]
+    assert ev.num_free_workers() == 8
+    ev.add_eval_batch(evals)
+
+    # two workers get a micro-batch of 4 configs each
+    assert len(ev.pending_evals) == 8
+    assert len({id(f) for f in ev.pending_evals.values()}) == 2
+    assert len(ev.queued_evals) == 2
+
+    res = list(ev.await_evals(evals, timeout=30))
+    assert res == [(x, x['x1']**2 + 1) for x in evals]
+    assert not ev.pending_evals
+
+
+def test_failed_micro_batch(ev):
+    evals = [dict(x1=1, x2=1), dict(x1=2, x2=1, fail=True)]
+    ev.add_eval_batch(evals)
+    res = list(ev.await_evals(evals, timeout=30))
+    assert [y for _, y in res] == [Evaluator.FAIL_RETURN_VALUE] * 2
+
+
+def test_batch_needs_in_process_backend():
+    with pytest.raises(ValueError):
+        Evaluator.create(run, method='subprocess', batch_size=4)
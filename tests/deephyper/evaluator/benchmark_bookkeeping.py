@@ -0,0 +1,58 @@
+"""Scaling benchmark of the Evaluator bookkeeping.
+
+Usage: python benchmark_bookkeeping.py [max_evals]
+
+Runs an AMBS-like driver loop (refill the free workers, read the finished
+evals) against an evaluator whose evals complete instantly, so that the
+measured time is the bookkeeping overhead of ``add_eval`` and
+``get_finished_evals`` alone. The time per eval should stay flat as the
+number of evals grows. Its absolute value depends on the machine and
+includes the journal and metrics updates of every eval, so only its
+flatness is meaningful.
+"""
+import sys
+import time
+from collections import namedtuple
+
+from deephyper.evaluator import Evaluator
+from deephyper.evaluator.test_functions import run
+
+WaitResult = namedtuple('WaitResult', ['active', 'done', 'failed', 'cancelled'])
+
+class InstantFuture:
+    def __init__(self, y):
+        self.y = y
+
+    def result(self):
+        return self.y
+
+class InstantEvaluator(Evaluator):
+    def __init__(self, run_function, num_workers):
+        super().__init__(run_function)
+        self.num_workers = num_workers
+
+    def _eval_exec(self, x):
+        return InstantFuture(x['x1'] + x['x2'])
+
+    def wait(self, futures, timeout=None, return_when='ANY_COMPLETED'):
+        return WaitResult(active=[], done=list(futures), failed=[], cancelled=[])
+
+def benchmark(max_evals, num_workers=64):
+    ev = InstantEvaluator(run, num_workers)
+    num_evals, checkpoint = 0, 1000
+    start = time.perf_counter()
+    last_count, last_time = 0, start
+    while num_evals < max_evals:
+        n = ev.num_free_workers()
+        ev.add_eval_batch([dict(x1=num_evals+i, x2=0.5) for i in range(n)])
+        num_evals += len(list(ev.get_finished_evals()))
+        if num_evals >= checkpoint:
+            now = time.perf_counter()
+            per_eval = (now - last_time) / (num_evals - last_count) * 1e6
+            print(f"{num_evals:>9d} evals  {per_eval:8.2f} us/eval  {now-start:8.2f} s total")
+            last_count, last_time = num_evals, now
+            checkpoint *= 10
+
+if __name__ == "__main__":
+    max_evals = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    benchmark(max_evals)
@@ -0,0 +1,79 @@
+"""Benchmark of the cost of the Evaluator keys on NAS-like configs.
+
+Usage: python benchmark_keys.py [num_evals]
+
+Every config carries a full NAS problem space (nested hyperparameters,
+function paths) and a 64-step ``arch_seq``, as the configs sent by the NAS
+environments. Each config is requested twice, so that half of the requests
+are lookups of an already known key. The legacy scheme used the JSON
+encoding of a config both as its key and as its uid.
+"""
+import sys
+import time
+from collections import namedtuple
+
+from deephyper.evaluator import Evaluator
+from deephyper.evaluator.test_functions import run
+
+WaitResult = namedtuple('WaitResult', ['active', 'done', 'failed', 'cancelled'])
+
+class InstantFuture:
+    def __init__(self, y):
+        self.y = y
+
+    def result(self):
+        return self.y
+
+class InstantEvaluator(Evaluator):
+    def __init__(self, run_function, num_workers=64):
+        super().__init__(run_function, journal_file=None)
+        self.num_workers = num_workers
+
+    def _eval_exec(self, x):
+        return InstantFuture(sum(x['arch_seq']))
+
+    def wait(self, futures, timeout=None, return_when='ANY_COMPLETED'):
+        return WaitResult(active=[], done=list(futures), failed=[], cancelled=[])
+
+class LegacyKeysEvaluator(InstantEvaluator):
+    def __init__(self, run_function, num_workers=64):
+        super().__init__(run_function, num_workers)
+        self._gen_uid = lambda d: self.encode(d)
+
+    def digest(self, x):
+        return self.encode(x)
+
+def nas_config(i):
+    space = {
+        'regression': True,
+        'load_data': {'func': 'deephyper.benchmark.nas.linearReg.load_data.load_data', 'kwargs': {'dim': 10}},
+        'preprocessing': {'func': 'deephyper.search.nas.model.preprocessing.minmaxstdscaler'},
+        'create_structure': {'func': 'deephyper.search.nas.model.baseline.anl_mlp_2.create_structure',
+                             'kwargs': {'num_cells': 5}},
+        'hyperparameters': {'batch_size': 100, 'learning_rate': 0.01, 'optimizer': 'adam', 'num_epochs': 10,
+                            'loss_metric': 'mean_squared_error', 'metrics': ['mean_squared_error']},
+    }
+    space['arch_seq'] = [((i * 7919 + j * 104729) % 1000) / 1000 for j in range(64)]
+    space['w'] = i % 128
+    return space
+
+def benchmark(Eval, configs):
+    ev = Eval(run)
+    start = time.perf_counter()
+    for x in configs:
+        ev.add_eval(x)
+    for x in configs:
+        ev.add_eval(dict(x)) # same config, new dict object
+    num_results = 0
+    while num_results < 2 * len(configs):
+        num_results += len(list(ev.get_finished_evals()))
+    elapsed = time.perf_counter() - start
+    key = next(iter(ev.key_uid_map))
+    return elapsed / (2 * len(configs)) * 1e6, len(key)
+
+if __name__ == "__main__":
+    num_evals = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    configs = [nas_config(i) for i in range(num_evals)]
+    for name, Eval in [('legacy JSON keys', LegacyKeysEvaluator), ('digest keys', InstantEvaluator)]:
+        per_eval, key_len = benchmark(Eval, configs)
+        print(f"{name:>16s}: {per_eval:7.2f} us per request, keys of {key_len} characters")
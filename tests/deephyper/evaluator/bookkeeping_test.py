@@ -0,0 +1,55 @@
+from deephyper.evaluator import Evaluator
+from deephyper.evaluator.test_functions import run, key
+
+
+def test_duplicate_requests_are_read_once_each(monkeypatch):
+    monkeypatch.setattr(Evaluator, 'WORKERS_PER_NODE', 2)
+    ev = Evaluator.create(run, cache_key=key, method='threadPool')
+    x = dict(ID="test1", x1=3, x2=4)
+    ev.add_eval(x)
+    ev.add_eval(x)
+    ev.add_eval(dict(ID="test2", x1=3, x2=4))
+    assert len(ev.pending_evals) == 1
+
+    res = []
+    while len(res) < 3:
+        res.extend(ev.get_finished_evals())
+    assert res.count((x, 25)) == 2
+    assert not ev.requested_evals
+
+    # cached uid: the request is ready without a new eval
+    ev.add_eval(dict(ID="test3", x1=3, x2=4))
+    assert not ev.pending_evals
+    assert list(ev.get_finished_evals()) == [({'ID':'test3','x1':3,'x2':4}, 25)]
+
+
+def test_awaited_requests_are_not_read_again(monkeypatch):
+    monkeypatch.setattr(Evaluator, 'WORKERS_PER_NODE', 2)
+    ev = Evaluator.create(run, cache_key=key, method='threadPool')
+    evals = [dict(ID="test1", x1=3, x2=4), dict(ID="test2", x1=1, x2=1)]
+    ev.add_eval_batch(evals)
+    assert list(ev.await_evals(evals)) == [(evals[0], 25), (evals[1], 2)]
+    assert list(ev.get_finished_evals()) == []
+
+
+def test_digest_is_canonical():
+    import numpy as np
+    ev = Evaluator.create(run, method='threadPool')
+    x = dict(x1=1.5, x2=2, opts=dict(a=[1, 2], b='c'))
+    same = dict(opts=dict(b='c', a=np.array([1, 2])), x2=np.int64(2), x1=np.float64(1.5))
+    assert ev.digest(x) == ev.digest(same)
+    assert len(ev.digest(x)) == 32
+    assert ev.digest(x) != ev.digest(dict(x, x1=1.25))
+
+    # equal numbers get equal digests whatever their type
+    digests = {ev.digest(dict(x=x)) for x in (1, 1.0, np.int32(1), np.float32(1.0), np.float64(1))}
+    assert len(digests) == 1
+    assert ev.digest(dict(x=[1, 2.0])) == ev.digest(dict(x=np.array([1.0, 2.0])))
+    assert ev.digest(dict(x=True)) != ev.digest(dict(x=1))
+    assert ev.digest(dict(x=np.bool_(True))) == ev.digest(dict(x=True))
+
+    # the default uid is the digest
+    ev.add_eval(x)
+    ev.add_eval(same)
+    assert len(ev.pending_evals) == 1
+    assert list(ev.await_evals([x], timeout=30)) == [(x, 1.5**2 + 2**2)]
@@ -0,0 +1,57 @@
+import pytest
+
+from deephyper.evaluator import Evaluator
+from deephyper.evaluator.cache import EvalCache
+from deephyper.evaluator.test_functions import run, key
+
+
+def test_cache_is_shared_across_evaluators(tmp_path, monkeypatch):
+    monkeypatch.setattr(Evaluator, 'WORKERS_PER_NODE', 2)
+    cache_file = str(tmp_path / 'cache.db')
+    evals = [dict(ID="test1", x1=3, x2=4), dict(ID="test2", x1=1, x2=1, fail=True)]
+
+    ev = Evaluator.create(run, cache_key=key, method='subprocess', cache_file=cache_file,
+                          cache_namespace='problem')
+    ev.add_eval_batch(evals)
+    first = list(ev.await_evals(evals))
+
+    # a restarted search finds the successful eval without running it
+    ev = Evaluator.create(run, cache_key=key, method='subprocess', cache_file=cache_file,
+                          cache_namespace='problem')
+    ev.add_eval_batch(evals)
+    assert len(ev.pending_evals) == 1
+    assert list(ev.await_evals(evals)) == first
+
+
+def test_cache_is_not_shared_across_problems(tmp_path, monkeypatch):
+    monkeypatch.setattr(Evaluator, 'WORKERS_PER_NODE', 2)
+    cache_file = str(tmp_path / 'cache.db')
+    evals = [dict(ID="test1", x1=3, x2=4)]
+
+    ev = Evaluator.create(run, cache_key=key, method='subprocess', cache_file=cache_file,
+                          cache_namespace='problem1')
+    ev.add_eval_batch(evals)
+    list(ev.await_evals(evals))
+
+    # the same run function evaluates the same config of another problem
+    ev = Evaluator.create(run, cache_key=key, method='subprocess', cache_file=cache_file,
+                          cache_namespace='problem2')
+    ev.add_eval_batch(evals)
+    assert len(ev.pending_evals) == 1
+    list(ev.await_evals(evals))
+
+    with pytest.raises(ValueError):
+        Evaluator.create(run, cache_key=key, method='subprocess', cache_file=cache_file)
+
+
+def test_cache_eviction(tmp_path):
+    cache = EvalCache(str(tmp_path / 'cache.db'), max_entries=10)
+    for i in range(15):
+        cache.put(f'uid{i}', i)
+    cache.get('uid0')
+    cache.evict()
+
+    assert len(cache) == 10
+    assert cache.get('uid0') == 0
+    assert cache.get('uid1') is None
+    assert cache.get('uid14') == 14
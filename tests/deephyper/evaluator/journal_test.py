@@ -0,0 +1,82 @@
+import csv
+import json
+
+from deephyper.evaluator import Evaluator
+from deephyper.evaluator import journal
+from deephyper.evaluator.test_functions import run, key
+
+
+def test_journal_and_compaction(tmp_path, monkeypatch):
+    monkeypatch.setattr(Evaluator, 'WORKERS_PER_NODE', 2)
+    path = str(tmp_path / 'results.jsonl')
+    ev = Evaluator.create(run, cache_key=key, method='threadPool', journal_file=path)
+    evals = [
+        dict(ID="test1", x1=3, x2=4),
+        dict(ID="test2", x1=3, x2=4),
+        dict(ID="test3", x1=1, x2=1),
+    ]
+    ev.add_eval_batch(evals)
+    list(ev.await_evals(evals))
+    ev.dump_evals()
+
+    records = list(journal.read(path))
+    assert sorted(r['x']['ID'] for r in records) == ["test1", "test2", "test3"]
+    assert all(r['objective'] == r['x']['x1']**2 + r['x']['x2']**2 for r in records)
+
+    ev.dump_evals(compact=True)
+    with open(tmp_path / 'results.csv') as fp:
+        rows = list(csv.DictReader(fp))
+    assert len(rows) == 3
+    assert set(rows[0]) == {'ID', 'x1', 'x2', 'objective', 'elapsed_sec'}
+    with open(tmp_path / 'results.json') as fp:
+        assert sorted(json.load(fp).values()) == [2, 25]
+
+
+def test_compaction_keeps_only_this_run(tmp_path):
+    path = str(tmp_path / 'results.jsonl')
+    for x1 in (1, 2):
+        ev = Evaluator.create(run, cache_key=key, method='threadPool', journal_file=path)
+        x = dict(x1=x1, x2=0)
+        ev.add_eval(x)
+        list(ev.await_evals([x]))
+        ev.dump_evals(compact=True)
+        ev.shutdown()
+
+    assert len({r['run'] for r in journal.read(path)}) == 2
+    with open(tmp_path / 'results.csv') as fp:
+        assert [row['x1'] for row in csv.DictReader(fp)] == ['2']
+    journal.compact(path)
+    with open(tmp_path / 'results.csv') as fp:
+        assert [row['x1'] for row in csv.DictReader(fp)] == ['1', '2']
+
+
+def test_read_skips_truncated_record(tmp_path):
+    path = tmp_path / 'results.jsonl'
+    path.write_text('{"uid": "a", "x": {}, "objective": 1, "elapsed_sec": 0}\n{"uid": "b", "x"')
+    assert [r['uid'] for r in journal.read(str(path))] == ['a']
+
+
+def test_restarted_journal_keeps_previous_records(tmp_path):
+    path = str(tmp_path / 'results.jsonl')
+    with open(path, 'w') as fp:
+        fp.write('{"uid": "a", "x": {}, "objective": 1, "elapsed_sec": 0}\n{"uid": "b", "x"')
+    jnl = journal.ResultsJournal(path)
+    jnl.append(dict(uid='c', x={}, objective=2, elapsed_sec=0))
+    jnl.close()
+    assert [r['uid'] for r in journal.read(path)] == ['a', 'c']
+
+
+def test_default_path_depends_on_rank(monkeypatch):
+    for var in journal.RANK_VARS: monkeypatch.delenv(var, raising=False)
+    assert journal.default_path() == 'results.jsonl'
+    monkeypatch.setenv('PMI_RANK', '0')
+    assert journal.default_path() == 'results.jsonl'
+    monkeypatch.setenv('PMI_RANK', '3')
+    assert journal.default_path() == 'results.3.jsonl'
+
+
+def test_compaction_next_to_rank_journal(tmp_path):
+    path = tmp_path / 'results.3.jsonl'
+    path.write_text('{"uid": "a", "x": {"x1": 1}, "objective": 1, "elapsed_sec": 0}\n')
+    journal.compact(str(path))
+    assert (tmp_path / 'results.3.json').exists() and (tmp_path / 'results.3.csv').exists()
@@ -0,0 +1,102 @@
+import pytest
+
+from deephyper.evaluator import Evaluator, journal
+from deephyper.evaluator.metrics import EvalMetrics, format_summary
+from deephyper.evaluator.test_functions import run, key
+
+
+def test_summary():
+    m = EvalMetrics()
+    for uid in 'abc': m.submitted(uid, now=0)
+    m.started('a', now=0)
+    m.started('b', now=1)
+    m.ended('a', worker=1, now=2)
+    m.ended('b', worker=2, now=5)
+    m.started('c', now=8) # 3 sec without any running eval
+    assert m.timings['b'] == dict(submit=0, start=1, end=5, worker=2)
+    assert m.queue_wait('c') == 8
+    assert m.run_time('c') is None
+    assert m.run_time_percentile(50) == pytest.approx(3)
+    assert m.run_time_percentile(50, min_count=3) is None
+
+    summary = m.summary(num_workers=2, now=10)
+    assert summary['num_finished'] == 2
+    assert summary['num_running'] == 1
+    assert summary['utilization'] == pytest.approx((2 + 4 + 2) / 20)
+    assert summary['throughput'] == pytest.approx(0.2)
+    assert summary['run_p50'] == pytest.approx(3)
+    assert summary['wait_p50'] == pytest.approx(0.5)
+    assert summary['idle_sec'] == summary['max_idle_gap'] == 3
+    assert 'utilization 40.0%' in format_summary(summary)
+
+
+def test_start_reported_by_the_worker():
+    m = EvalMetrics()
+    for uid in 'ab': m.submitted(uid, now=0)
+    m.started('a', now=1)
+    m.ended('a', worker=1, now=10, started=4) # waited 3 sec in the backend
+    assert m.queue_wait('a') == 4
+    assert m.run_time('a') == 6
+    m.started('b', now=1)
+    m.ended('b', worker=1, now=10, started=0.5) # the clock of the worker is late
+    assert m.queue_wait('b') == 1
+
+
+@pytest.mark.parametrize('method,options', [
+    ('subprocess', {}),
+    ('subprocess', dict(persistent=True)),
+    ('processPool', {}),
+    ('threadPool', {}),
+    ('asyncio', {}),
+])
+def test_workers_are_recorded(method, options, monkeypatch):
+    monkeypatch.setattr(Evaluator, 'WORKERS_PER_NODE', 1)
+    ev = Evaluator.create(run, cache_key=key, method=method, journal_file=None, **options)
+    try:
+        x = dict(x1=1, x2=0, sleep=0.2)
+        ev.add_eval(x)
+        list(ev.await_evals([x], timeout=30))
+        timing = ev.eval_timing(x)
+        assert timing['worker'] is not None
+        assert 0.2 <= timing['run_time'] < 5
+    finally:
+        ev.shutdown()
+
+
+def test_time_queued_in_the_backend_is_not_run_time(monkeypatch):
+    monkeypatch.setattr(Evaluator, 'WORKERS_PER_NODE', 1)
+    ev = Evaluator.create(run, cache_key=key, method='threadPool', journal_file=None)
+    stuck = dict(x1=1, x2=0, sleep=1)
+    ev.add_eval(stuck)
+    assert ev.stop_eval(stuck)
+    # the thread of the stopped eval is still busy: the next eval waits for it in the pool
+    x = dict(x1=2, x2=0)
+    ev.add_eval(x)
+    list(ev.await_evals([x], timeout=30))
+    timing = ev.eval_timing(x)
+    assert timing['queue_wait'] >= 0.5
+    assert timing['run_time'] < 0.5
+
+
+def test_evaluator_records_timings(tmp_path, monkeypatch):
+    monkeypatch.setattr(Evaluator, 'WORKERS_PER_NODE', 1)
+    path = str(tmp_path / 'results.jsonl')
+    ev = Evaluator.create(run, cache_key=key, method='threadPool', journal_file=path)
+    evals = [dict(x1=1, x2=0, sleep=0.2), dict(x1=2, x2=0, sleep=0.2)]
+    ev.add_eval_batch(evals)
+    list(ev.await_evals(evals, timeout=30))
+
+    first, second = ev.eval_timing(evals[0]), ev.eval_timing(evals[1])
+    assert first['run_time'] >= 0.2
+    assert second['queue_wait'] >= 0.2 # waited for the only worker
+    assert second['start'] >= first['end']
+    assert ev.eval_timing(dict(x1=3, x2=0)) is None
+
+    metrics = ev.metrics()
+    assert metrics['num_finished'] == 2
+    assert 0.5 < metrics['utilization'] <= 1
+
+    ev.dump_evals()
+    records = list(journal.read(path))
+    assert [r['run_sec'] >= 0.2 for r in records] == [True, True]
+    assert records[1]['queue_wait_sec'] >= 0.2
@@ -0,0 +1,92 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+pytest.importorskip('mpi4py')
+MPIRUN = shutil.which('mpirun')
+pytestmark = pytest.mark.skipif(MPIRUN is None, reason='mpirun is not available')
+
+DRIVER = textwrap.dedent('''
+    import json, time
+    from deephyper.evaluator import Evaluator
+    from deephyper.evaluator.test_functions import run_partial, key
+
+    ev = Evaluator.create(run_partial, cache_key=key, method='mpi', eval_timeout=2)
+    if ev.is_worker:
+        ev.serve()
+        raise SystemExit
+    evals = [dict(x1=i, x2=i, steps=2) for i in range(6)]
+    evals.append(dict(x1=0, x2=1, fail=True))
+    evals.append(dict(x1=7, x2=7, steps=1, sleep=10))
+    start = time.time()
+    ev.add_eval_batch(evals)
+    res = list(ev.await_evals(evals, timeout=30))
+    print(json.dumps(dict(
+        num_workers=ev.num_workers,
+        objectives=[y for x, y in res],
+        partials=ev.partial_results(evals[1]),
+        elapsed=time.time() - start,
+    )))
+''')
+
+
+KILL_DRIVER = textwrap.dedent('''
+    import json, time
+    from deephyper.evaluator import Evaluator
+    from deephyper.evaluator.test_functions import run_partial, key
+
+    ev = Evaluator.create(run_partial, cache_key=key, method='mpi', eval_timeout=1)
+    if ev.is_worker:
+        ev.serve()
+        raise SystemExit
+    # the first eval reports every 0.1 sec for 30 sec: it is aborted at a report
+    evals = [dict(x1=3, x2=4, steps=300, step_sleep=0.1), dict(x1=1, x2=1, steps=1)]
+    start = time.time()
+    ev.add_eval_batch(evals)
+    res = list(ev.await_evals(evals, timeout=30))
+    print(json.dumps(dict(objectives=[y for x, y in res], elapsed=time.time() - start)))
+''')
+
+
+def mpirun(tmp_path, num_ranks, driver_text=DRIVER):
+    driver = tmp_path / 'driver.py'
+    driver.write_text(driver_text)
+    env = dict(os.environ, OMPI_ALLOW_RUN_AS_ROOT='1', OMPI_ALLOW_RUN_AS_ROOT_CONFIRM='1',
+               OMPI_MCA_rmaps_base_oversubscribe='1')
+    proc = subprocess.run([MPIRUN, '-n', str(num_ranks), sys.executable, str(driver)],
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env,
+                          timeout=60, cwd=tmp_path)
+    assert proc.returncode == 0, proc.stderr.decode()
+    return json.loads(proc.stdout.decode().strip().splitlines()[-1])
+
+
+def test_workers_serve_evals_from_rank_0(tmp_path):
+    out = mpirun(tmp_path, 3)
+    assert out['num_workers'] == 2
+    fail = sys.float_info.max
+    # the timed out eval is finished with its last partial objective
+    assert out['objectives'] == [0, 2, 8, 18, 32, 50, fail, 99]
+    assert out['partials'] == [[1, 3], [2, 2.5]]
+    assert out['elapsed'] < 10
+
+
+def test_killed_eval_frees_its_rank(tmp_path):
+    # a single worker rank: the second eval runs once the first one is aborted
+    out = mpirun(tmp_path, 2, KILL_DRIVER)
+    # the aborted eval is finished with its last partial objective
+    assert 25 < out['objectives'][0] <= 26
+    assert out['objectives'][1] == 2
+    assert out['elapsed'] < 10
+    assert out['elapsed'] < 10
+
+
+def test_needs_more_than_one_rank():
+    from deephyper.evaluator import Evaluator
+    from deephyper.evaluator.test_functions import run
+    with pytest.raises(RuntimeError):
+        Evaluator.create(run, method='mpi')
@@ -0,0 +1,121 @@
+import time
+
+import pytest
+
+from deephyper.evaluator import Evaluator
+from deephyper.evaluator.test_functions import run_partial
+
+
+@pytest.fixture(params=['subprocess', 'persistent', 'processPool', 'forkserver', 'threadPool'])
+def ev(request, monkeypatch):
+    monkeypatch.setattr(Evaluator, 'WORKERS_PER_NODE', 4)
+    if request.param == 'persistent':
+        ev = Evaluator.create(run_partial, method='subprocess', persistent=True)
+    elif request.param == 'forkserver':
+        ev = Evaluator.create(run_partial, method='processPool', start_method='forkserver')
+    else:
+        ev = Evaluator.create(run_partial, method=request.param)
+    if request.param in ('processPool', 'forkserver'):
+        # the evals sleep without reporting: their processes are terminated right away
+        monkeypatch.setattr(ev, 'SHUTDOWN_TIMEOUT', 0)
+    yield ev
+    ev.shutdown()
+
+
+def poll_partials(ev, x, n, timeout=20):
+    start = time.time()
+    while len(ev.partial_results(x)) < n and time.time() - start < timeout:
+        list(ev.get_finished_evals())
+    return ev.partial_results(x)
+
+
+def test_partial_results_and_stop(ev):
+    x = dict(x1=1, x2=2, steps=2, sleep=30)
+    ev.add_eval(x)
+    assert poll_partials(ev, x, 2) == [(1, 6.0), (2, 5.5)]
+
+    assert ev.stop_eval(x)
+    assert not ev.stop_eval(x)
+    assert list(ev.get_finished_evals()) == [(x, 5.5)]
+
+
+def test_median_stopping_rule(ev):
+    good = [dict(x1=i, x2=0, steps=2) for i in range(3)]
+    ev.add_eval_batch(good)
+    list(ev.await_evals(good, timeout=20))
+
+    bad = dict(x1=10, x2=0, steps=2, step_sleep=0.1, sleep=30)
+    better = dict(x1=0.5, x2=0, steps=2, step_sleep=0.1, sleep=30)
+    ev.add_eval_batch([bad, better])
+    poll_partials(ev, bad, 2)
+    poll_partials(ev, better, 2)
+
+    assert ev.stop_losing_evals(min_steps=2) == [ev._gen_uid(bad)]
+    assert ev.finished_evals[ev._gen_uid(bad)] == 100.5
+    assert ev._gen_uid(better) in ev.pending_evals
+
+
+def test_stopped_eval_frees_its_process(monkeypatch):
+    monkeypatch.setattr(Evaluator, 'WORKERS_PER_NODE', 1)
+    ev = Evaluator.create(run_partial, method='processPool')
+    x = dict(x1=1, x2=2, steps=300, step_sleep=0.1)
+    ev.add_eval(x)
+    poll_partials(ev, x, 1)
+    assert ev.stop_eval(x)
+
+    # the stopped eval is aborted at its next report, and its process takes the next one
+    start = time.time()
+    y = dict(x1=0, x2=1, steps=1)
+    ev.add_eval(y)
+    assert list(ev.await_evals([y], timeout=20)) == [(y, 1)]
+    assert time.time() - start < 10
+    # the evals are forgotten once they ended
+    deadline = time.time() + 5
+    while ev._futures and time.time() < deadline: ev._read_partials()
+    assert not ev._futures
+    ev.shutdown()
+
+
+def test_stopped_eval_keeps_its_process_until_it_stops(monkeypatch):
+    monkeypatch.setattr(Evaluator, 'WORKERS_PER_NODE', 1)
+    ev = Evaluator.create(run_partial, method='processPool')
+    x = dict(x1=1, x2=2, steps=1, sleep=2)
+    ev.add_eval(x)
+    poll_partials(ev, x, 1)
+    assert ev.stop_eval(x)
+
+    # the eval does not report anymore: its process is still busy
+    y = dict(x1=0, x2=1, steps=1)
+    ev.add_eval(y)
+    assert ev.num_free_workers() == 0
+    assert not ev.pending_evals
+    assert list(ev.await_evals([y], timeout=20)) == [(y, 1)]
+    ev.shutdown()
+
+
+def test_shutdown_aborts_the_running_evals(monkeypatch):
+    monkeypatch.setattr(Evaluator, 'WORKERS_PER_NODE', 2)
+    ev = Evaluator.create(run_partial, method='processPool')
+    evals = [dict(x1=i, x2=0, steps=300, step_sleep=0.1) for i in range(3)]
+    ev.add_eval_batch(evals)
+    poll_partials(ev, evals[0], 1)
+
+    start = time.time()
+    ev.shutdown()
+    assert time.time() - start < 5
+    assert not ev.queued_evals
+
+
+def test_shutdown_terminates_stuck_evals(monkeypatch):
+    monkeypatch.setattr(Evaluator, 'WORKERS_PER_NODE', 1)
+    ev = Evaluator.create(run_partial, method='processPool')
+    monkeypatch.setattr(ev, 'SHUTDOWN_TIMEOUT', 1)
+    x = dict(x1=1, x2=0, steps=1, sleep=30)
+    ev.add_eval(x)
+    poll_partials(ev, x, 1)
+    processes = list(ev.executor._processes.values())
+
+    start = time.time()
+    ev.shutdown()
+    assert time.time() - start < 10
+    assert not any(process.is_alive() for process in processes)
@@ -0,0 +1,59 @@
+import pytest
+
+from deephyper.evaluator import Evaluator
+from deephyper.evaluator.test_functions import run, key
+
+
+@pytest.fixture(params=['subprocess', 'threadPool'])
+def ev(request, monkeypatch):
+    monkeypatch.setattr(Evaluator, 'WORKERS_PER_NODE', 2)
+    ev = Evaluator.create(run, cache_key=key, method=request.param)
+    yield ev
+    ev.shutdown()
+
+
+def test_dispatch_is_bounded(ev):
+    evals = [dict(ID=f"test{i}", x1=i, x2=0, sleep=0.2) for i in range(5)]
+    ev.add_eval_batch(evals)
+
+    assert len(ev.pending_evals) == 2
+    assert len(ev.queued_evals) == 3
+    assert ev.num_free_workers() == 0
+    assert ev.counter == 5
+
+    res = list(ev.await_evals(evals, timeout=60))
+    assert res == [(x, x['x1']**2) for x in evals]
+    assert len(ev.pending_evals) == len(ev.queued_evals) == 0
+
+
+def test_queue_priority(ev):
+    ev.add_eval(dict(ID="test1", x1=1, x2=0, sleep=0.2))
+    ev.add_eval(dict(ID="test2", x1=2, x2=0, sleep=0.2))
+    ev.add_eval(dict(ID="low", x1=3, x2=0), priority=-1)
+    ev.add_eval(dict(ID="fifo", x1=4, x2=0))
+    ev.add_eval(dict(ID="high", x1=5, x2=0), priority=10)
+
+    order = [x for _, _, _, x in sorted(ev.queued_evals)]
+    assert [x['ID'] for x in order] == ["high", "fifo", "low"]
+
+    res = []
+    while len(res) < 5:
+        res.extend(ev.get_finished_evals())
+    assert sorted(y for _, y in res) == [1, 4, 9, 16, 25]
+
+
+def test_batch_is_submitted_at_once(ev, monkeypatch):
+    batches = []
+    eval_exec_batch = ev._eval_exec_batch
+    def spy(XX):
+        batches.append([x['ID'] for x in XX])
+        return eval_exec_batch(XX)
+    monkeypatch.setattr(ev, '_eval_exec_batch', spy)
+
+    evals = [dict(ID=f"test{i}", x1=i, x2=0, sleep=0.2) for i in range(3)]
+    ev.add_eval_batch(evals)
+    assert batches == [["test0", "test1"]]
+
+    res = list(ev.await_evals(evals, timeout=60))
+    assert res == [(x, x['x1']**2) for x in evals]
+    assert batches == [["test0", "test1"], ["test2"]]
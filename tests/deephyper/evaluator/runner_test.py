@@ -0,0 +1,48 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from deephyper.evaluator import Evaluator, journal, runner
+from deephyper.evaluator import test_functions
+from deephyper.evaluator.test_functions import run_metrics
+
+
+def run_runner(func_name, x, env):
+    module_path = os.path.dirname(test_functions.__file__)
+    args = [sys.executable, runner.__file__, module_path, test_functions.__name__, func_name, json.dumps(x)]
+    return subprocess.run(args, env=dict(os.environ, **env), stdout=subprocess.PIPE, timeout=60)
+
+
+def test_partials_are_written_to_the_result_file(tmp_path):
+    path = str(tmp_path / 'task1.result.json')
+    proc = run_runner('run_partial', dict(x1=1, x2=2, steps=2), {runner.RESULT_FILE_VAR: path})
+    assert proc.returncode == 0
+    assert b'DH-PARTIAL' not in proc.stdout
+    with open(path) as fp:
+        record = runner.decode_result(fp.read())
+    assert record['objective'] == 5
+    assert record['partials'] == [[1, 6.0], [2, 5.5]]
+    assert Evaluator._parse_record(record)[0] == 5
+    assert 'partials' not in Evaluator._parse_record(record)[1]
+
+
+def test_record_without_objective_is_a_failure():
+    y, _, ok = Evaluator._parse_record(dict(partials=[[1, 6.0]]))
+    assert y == Evaluator.FAIL_RETURN_VALUE and not ok
+
+
+@pytest.mark.parametrize('method', ['subprocess', 'processPool', 'threadPool'])
+def test_run_function_returns_metrics(method, tmp_path):
+    path = str(tmp_path / 'results.jsonl')
+    ev = Evaluator.create(run_metrics, method=method, journal_file=path)
+    x = dict(x1=3, x2=4)
+    ev.add_eval(x)
+    assert list(ev.await_evals([x], timeout=60)) == [(x, 25)]
+    ev.dump_evals()
+    record, = journal.read(path)
+    assert record['objective'] == 25
+    assert record['metrics']['norm'] == 5
+    ev.shutdown()
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from deephyper.evaluator import Evaluator, shared_data
+from deephyper.evaluator.test_functions import load_data, run_shared
+
+
+def test_share_and_load(tmp_path):
+    data = load_data()
+    dirname = shared_data.share(data, dirname=str(tmp_path / 'data'), cleanup=False)
+    (t_X, t_y), (v_X, v_y) = shared_data.load(dirname)
+
+    assert isinstance(t_X, np.memmap)
+    assert not t_X.flags.writeable
+    np.testing.assert_array_equal(t_X, data[0][0])
+    np.testing.assert_array_equal(v_y, data[1][1])
+    assert shared_data.load(dirname) is shared_data.load(dirname)
+
+
+def test_share_load_data():
+    config = dict(func='deephyper.evaluator.test_functions.load_data', kwargs=dict(n=6))
+    dirname = shared_data.share_load_data(config)
+    assert config['shared'] == dirname
+    (t_X, _), _ = shared_data.load(dirname)
+    assert t_X.shape == (6, 3)
+
+
+
+def load_vocabulary():
+    X = np.arange(6.0).reshape(3, 2)
+    return (X, X), (X, dict(word_to_id={'a': 0}))
+
+
+def test_unshareable_data_is_not_shared():
+    assert shared_data.shareable(load_data())
+    assert not shared_data.shareable(load_vocabulary())
+    assert not shared_data.shareable((np.arange(3), (x for x in range(3))))
+
+    config = dict(func=load_vocabulary)
+    assert shared_data.share_load_data(config) is None
+    assert 'shared' not in config
+
+@pytest.mark.parametrize('method', ['processPool', 'subprocess'])
+def test_workers_map_shared_data(method, monkeypatch):
+    monkeypatch.setattr(Evaluator, 'WORKERS_PER_NODE', 2)
+    dirname = shared_data.share(load_data())
+    ev = Evaluator.create(run_shared, method=method)
+    evals = [dict(shared=dirname, i=i) for i in range(4)]
+    ev.add_eval_batch(evals)
+    res = list(ev.await_evals(evals, timeout=30))
+    assert [y for _, y in res] == [3.0, 12.0, 21.0, 30.0]
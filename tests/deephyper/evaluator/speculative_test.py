@@ -0,0 +1,47 @@
+import time
+
+import pytest
+
+from deephyper.evaluator import Evaluator
+from deephyper.evaluator.test_functions import run, run_straggler
+
+
+@pytest.fixture(params=['subprocess', 'processPool', 'threadPool'])
+def ev(request, monkeypatch):
+    monkeypatch.setattr(Evaluator, 'WORKERS_PER_NODE', 2)
+    monkeypatch.setattr(Evaluator, 'SPECULATION_MIN_EVALS', 3)
+    ev = Evaluator.create(run_straggler, method=request.param, speculation_percentile=90)
+    yield ev
+    ev.shutdown()
+
+
+def test_straggler_is_duplicated(ev, tmp_path):
+    evals = [dict(x1=i, x2=0, marker=str(tmp_path / f'{i}')) for i in range(4)]
+    ev.add_eval_batch(evals)
+    list(ev.await_evals(evals, timeout=30))
+
+    # the first attempt sleeps 20 sec: its duplicate does not
+    straggler = dict(x1=3, x2=4, sleep=20, marker=str(tmp_path / 'straggler'))
+    ev.add_eval(straggler)
+    start = time.time()
+    res = list(ev.await_evals([straggler], timeout=15))
+
+    assert time.time() - start < 10
+    assert res == [(straggler, 25)]
+    assert not ev.pending_evals and not ev._speculative
+    # the worker of the killed copy is free once the copy stopped
+    deadline = time.time() + 5
+    while ev.num_free_workers() < 2 and time.time() < deadline: time.sleep(0.1)
+    assert ev.num_free_workers() == 2
+
+
+def test_no_duplicate_without_run_times(ev, tmp_path):
+    x = dict(x1=1, x2=1, marker=str(tmp_path / 'first'))
+    ev.add_eval(x)
+    assert list(ev.await_evals([x], timeout=30)) == [(x, 2)]
+    assert not ev._speculative
+
+
+def test_speculation_needs_single_evals():
+    with pytest.raises(ValueError):
+        Evaluator.create(run, method='threadPool', batch_size=4, speculation_percentile=90)
@@ -0,0 +1,113 @@
+import time
+
+import pytest
+
+from deephyper.evaluator import Evaluator, journal
+from deephyper.evaluator.test_functions import run, run_verbose, key
+
+
+@pytest.fixture
+def persistent_ev(monkeypatch):
+    monkeypatch.setattr(Evaluator, 'WORKERS_PER_NODE', 2)
+    ev = Evaluator.create(run, cache_key=key, method='subprocess',
+                          persistent=True, max_evals_per_worker=2)
+    yield ev
+    ev.shutdown()
+
+
+def test_persistent_workers_are_reused(persistent_ev):
+    ev = persistent_ev
+    evals = [dict(ID=f"test{i}", x1=i, x2=1) for i in range(5)]
+    ev.add_eval_batch(evals)
+    res = list(ev.await_evals(evals, timeout=60))
+
+    assert res == [(x, x['x1']**2 + 1) for x in evals]
+    # 5 evals on 2 workers recycled every 2 evals
+    assert len(ev._pool._idle) + len(ev._pool._busy) <= 2
+
+
+def test_persistent_worker_failure(persistent_ev):
+    ev = persistent_ev
+    evals = [
+        dict(ID="test1", x1=3, x2=4, fail=True),
+        dict(ID="test2", x1=3, x2=4),
+    ]
+    ev.add_eval_batch(evals)
+    res = list(ev.await_evals(evals, timeout=60))
+
+    assert res[0][1] == Evaluator.FAIL_RETURN_VALUE
+    assert res[1][1] == 25
+
+
+def test_persistent_worker_crash_is_replaced(persistent_ev):
+    ev = persistent_ev
+    crashed = [dict(ID="test1", x1=3, x2=4, sleep=30)]
+    ev.add_eval_batch(crashed)
+    ev._pool._busy[0].proc.kill()
+    assert list(ev.await_evals(crashed, timeout=60)) == [(crashed[0], Evaluator.FAIL_RETURN_VALUE)]
+
+    evals = [dict(ID="test2", x1=1, x2=1)]
+    ev.add_eval_batch(evals)
+    assert list(ev.await_evals(evals, timeout=60)) == [(evals[0], 2)]
+
+
+def test_shutdown_stops_the_workers(persistent_ev):
+    ev = persistent_ev
+    ev.add_eval_batch([dict(ID="test1", x1=1, x2=1, sleep=30), dict(ID="test2", x1=1, x2=1)])
+    list(ev.await_evals([dict(ID="test2", x1=1, x2=1)], timeout=60))
+    procs = [worker.proc for worker in ev._pool._busy + ev._pool._idle]
+    assert len(procs) == 2
+
+    ev.shutdown()
+    assert [proc.wait(timeout=10) is not None for proc in procs] == [True, True]
+    assert not ev._pool._busy and not ev._pool._idle
+
+@pytest.fixture
+def ev(monkeypatch):
+    monkeypatch.setattr(Evaluator, 'WORKERS_PER_NODE', 4)
+    ev = Evaluator.create(run, cache_key=key, method='subprocess')
+    yield ev
+    ev.shutdown()
+
+
+def test_wait_returns_on_first_completion(ev):
+    ev.add_eval(dict(ID="test4", x1=10, x2=10, sleep=30))
+    ev.add_eval(dict(ID="test1", x1=3, x2=4))
+
+    start = time.time()
+    res = []
+    while not res:
+        res.extend(ev.get_finished_evals())
+
+    assert time.time() - start < 10
+    assert res == [({'ID':'test1','x1':3,'x2':4}, 25)]
+
+
+def test_get_finished_fail(ev):
+    ev.add_eval(dict(ID="test1", x1=3, x2=4, fail=True))
+    ev.add_eval(dict(ID="test2", x1=3, x2=4, fail=False))
+
+    res = []
+    while len(res) < 2:
+        res.extend(ev.get_finished_evals())
+
+    assert sorted(r[1] for r in res) == [25, Evaluator.FAIL_RETURN_VALUE]
+
+
+@pytest.mark.parametrize('persistent', [False, True])
+def test_result_channel_ignores_output(persistent, tmp_path, monkeypatch):
+    monkeypatch.setattr(Evaluator, 'WORKERS_PER_NODE', 2)
+    path = str(tmp_path / 'results.jsonl')
+    ev = Evaluator.create(run_verbose, method='subprocess', persistent=persistent, journal_file=path)
+    evals = [dict(x1=3, x2=4, lines=20000), dict(x1=1, x2=1, fail=True)]
+    ev.add_eval_batch(evals)
+    futures = list(ev.pending_evals.values())
+    res = list(ev.await_evals(evals, timeout=60))
+
+    assert res == [(evals[0], 25), (evals[1], Evaluator.FAIL_RETURN_VALUE)]
+    assert futures[0].metrics['run_sec'] >= 0
+    if not persistent:
+        assert len(futures[0].stdout) <= futures[0].MAX_OUTPUT
+    ev.dump_evals()
+    assert [r['metrics'] is not None for r in journal.read(path)] == [True, True]
+    ev.shutdown()
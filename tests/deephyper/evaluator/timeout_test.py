@@ -0,0 +1,58 @@
+import time
+
+import pytest
+
+from deephyper.evaluator import Evaluator
+from deephyper.evaluator.test_functions import run, run_verbose, key
+
+
+@pytest.fixture(params=['subprocess', 'processPool', 'forkserver', 'threadPool'])
+def ev(request, monkeypatch):
+    monkeypatch.setattr(Evaluator, 'WORKERS_PER_NODE', 2)
+    if request.param == 'forkserver':
+        ev = Evaluator.create(run, cache_key=key, method='processPool', eval_timeout=1,
+                              start_method='forkserver')
+    else:
+        ev = Evaluator.create(run, cache_key=key, method=request.param, eval_timeout=1)
+    yield ev
+    ev.shutdown()
+
+
+def test_timed_out_eval_fails_and_frees_its_slot(ev):
+    evals = [
+        dict(ID="slow", x1=3, x2=4, sleep=5),
+        dict(ID="fast", x1=1, x2=1),
+        dict(ID="queued", x1=1, x2=2),
+    ]
+    start = time.time()
+    ev.add_eval_batch(evals)
+    res = list(ev.await_evals(evals, timeout=30))
+
+    assert time.time() - start < 4
+    assert res == [
+        (evals[0], Evaluator.FAIL_RETURN_VALUE),
+        (evals[1], 2),
+        (evals[2], 5),
+    ]
+    assert not ev.pending_evals
+
+
+def test_get_finished_evals_kills_timed_out_eval(ev):
+    ev.add_eval(dict(ID="slow", x1=3, x2=4, sleep=5))
+    start = time.time()
+    res = []
+    while not res:
+        res.extend(ev.get_finished_evals())
+    assert time.time() - start < 4
+    assert res[0][1] == Evaluator.FAIL_RETURN_VALUE
+
+
+@pytest.mark.parametrize('persistent', [False, True])
+def test_killed_eval_ignores_its_output(monkeypatch, persistent):
+    monkeypatch.setattr(Evaluator, 'WORKERS_PER_NODE', 1)
+    ev = Evaluator.create(run_verbose, method='subprocess', eval_timeout=1, persistent=persistent)
+    x = dict(x1=3, x2=4, sleep=5)
+    ev.add_eval(x)
+    # the eval printed "DH-OUTPUT: -1" before it was killed
+    assert list(ev.await_evals([x], timeout=30)) == [(x, Evaluator.FAIL_RETURN_VALUE)]
+    ev.shutdown()
@@ -0,0 +1,37 @@
+import time
+
+from deephyper.evaluator import Evaluator
+from deephyper.search.hps.ambs import AMBS
+
+PROBLEM = 'deephyper.benchmark.hps.rosen2.problem.Problem'
+RUN = 'deephyper.evaluator.test_functions.run_partial'
+
+
+def test_losing_evals_are_stopped(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(Evaluator, 'WORKERS_PER_NODE', 5)
+    search = AMBS(PROBLEM, RUN, 'threadPool', stop_losing_evals_after=2)
+    ev = search.evaluator
+    try:
+        good = [dict(x1=i, x2=0, steps=2) for i in range(3)]
+        ev.add_eval_batch(good)
+        list(ev.await_evals(good, timeout=20))
+        bad = dict(x1=10, x2=0, steps=2, step_sleep=0.1, sleep=30)
+        ev.add_eval(bad)
+        deadline = time.time() + 20
+        while len(ev.partial_results(bad)) < 2 and time.time() < deadline: time.sleep(0.1)
+
+        search._stop_losing_evals()
+        assert list(ev.get_finished_evals()) == [(bad, 100.5)]
+    finally:
+        ev.shutdown()
+
+
+def test_evals_are_not_stopped_by_default(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    search = AMBS(PROBLEM, RUN, 'threadPool')
+    try:
+        assert search.args.stop_losing_evals_after is None
+        search._stop_losing_evals()
+    finally:
+        search.evaluator.shutdown()
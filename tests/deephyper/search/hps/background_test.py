@@ -0,0 +1,39 @@
+import pytest
+
+from deephyper.search.hps.optimizer import BackgroundOptimizer
+
+
+def take(background, n):
+    XX = []
+    while len(XX) < n:
+        XX += background.take(n - len(XX), timeout=10)
+    return XX
+
+
+def test_ready_points_are_refilled(make_optimizer, rosen):
+    opt = make_optimizer()
+    XX = opt.ask_initial(4)
+    background = BackgroundOptimizer(opt, buffer_size=3)
+    background.start()
+    try:
+        new = take(background, 3)
+        background.tell([(x, rosen(x)) for x in XX])
+        new += take(background, 5)
+    finally:
+        background.stop()
+    assert len({tuple(x.values()) for x in XX + new}) == 12
+    # the 4 results were told and the buffer was refilled
+    assert opt._optimizer.yi[:4] == [rosen(x) for x in XX]
+    assert opt.counter == len(opt._optimizer.yi) >= 12
+
+
+def test_failure_is_raised_by_take(make_optimizer, monkeypatch):
+    opt = make_optimizer()
+    opt.ask_initial(4)
+    def fail(*args, **kwargs): raise ValueError("no point")
+    monkeypatch.setattr(opt, 'ask', fail)
+    background = BackgroundOptimizer(opt, buffer_size=2)
+    background.start()
+    background._thread.join(timeout=10)
+    with pytest.raises(RuntimeError):
+        background.take(1)
@@ -0,0 +1,73 @@
+"""Benchmark of the latency of ``Optimizer.tell`` as the history grows.
+
+Usage: python benchmark_tell.py [max_history]
+
+The history is filled with random points, then batches of 8 results are told
+to the optimizer. The legacy scheme told the whole history to a wiped
+``skopt.Optimizer`` at every call; the incremental one replaces the lies in
+place and refits once per call (``--refit-every 1``) or once every 32 results
+(``--refit-every 32``). In the "no fit" rows the surrogate is never fitted:
+only the bookkeeping of the history is measured.
+"""
+import sys
+import time
+
+import numpy as np
+
+from deephyper.benchmark.hps.rosen2.problem import Problem
+from deephyper.search.hps.ambs import AMBS
+from deephyper.search.hps.optimizer import Optimizer
+
+BATCH = 8
+
+def rosen(x):
+    return (1 - x['x1'])**2 + 100 * (x['x2'] - x['x1']**2)**2
+
+class LegacyOptimizer(Optimizer):
+    def tell(self, xy_data):
+        maxval = max(self._optimizer.yi) if self._optimizer.yi else 0.0
+        for x, y in xy_data:
+            self.evals[tuple(x[k] for k in self.space)] = (y if y < sys.float_info.max else maxval)
+        self._optimizer.Xi = []
+        self._optimizer.yi = []
+        XX, YY = self._xy_from_dict()
+        self._optimizer.tell(XX, YY)
+
+def random_points(opt, n):
+    """``n`` new random points handed out by ``opt``, without refitting."""
+    XX = opt._optimizer.space.rvs(n_samples=n, random_state=opt.counter)
+    for x in XX: opt._append(x, 0.0, fit=False)
+    opt.counter += n
+    return [opt.to_dict(x) for x in XX]
+
+def benchmark(Opt, fit, refit_every, sizes):
+    opt = Opt(Problem, BATCH, AMBS.parse_args(['--refit-every', str(refit_every)]))
+    if not fit: opt._optimizer._n_initial_points = np.inf
+    latencies = {}
+    for size in sizes:
+        while opt.counter < size:
+            XX = random_points(opt, BATCH)
+            start = time.perf_counter()
+            opt.tell([(x, rosen(x)) for x in XX])
+            elapsed = time.perf_counter() - start
+        times = []
+        for _ in range(4):
+            XX = random_points(opt, BATCH)
+            start = time.perf_counter()
+            opt.tell([(x, rosen(x)) for x in XX])
+            times.append(time.perf_counter() - start)
+        latencies[size] = np.mean(times) * 1e3
+    return latencies
+
+if __name__ == "__main__":
+    max_history = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    sizes = [n for n in (250, 500, 1000, 2000, 4000, 8000) if n <= max_history]
+    print(f"{'history':>8s}" + ''.join(f"{n:>9d}" for n in sizes) + "   (ms per tell of 8 results)")
+    for fit in [False, True]:
+        print('RF learner' if fit else 'no fit')
+        for name, Opt, refit_every in [('legacy', LegacyOptimizer, 1),
+                                       ('refit 1', Optimizer, 1),
+                                       ('refit 32', Optimizer, 32)]:
+            if not fit and refit_every > 1: continue
+            latencies = benchmark(Opt, fit, refit_every, sizes)
+            print(f"{name:>8s}" + ''.join(f"{latencies[n]:9.1f}" for n in sizes))
@@ -0,0 +1,17 @@
+import pytest
+
+from deephyper.benchmark.hps.rosen2.problem import Problem
+from deephyper.search.hps.ambs import AMBS
+from deephyper.search.hps.optimizer import Optimizer
+
+
+@pytest.fixture
+def rosen():
+    """Objective of the rosen2 problem."""
+    return lambda x: (1 - x['x1'])**2 + 100 * (x['x2'] - x['x1']**2)**2
+
+
+@pytest.fixture
+def make_optimizer():
+    """Factory of AMBS optimizers of the rosen2 problem with 4 workers, taking AMBS command line arguments."""
+    return lambda *args: Optimizer(Problem, 4, AMBS.parse_args(list(args)))
@@ -0,0 +1,85 @@
+import numpy as np
+
+from deephyper.search.hps.optimizer import _skopt
+from deephyper.search.hps.optimizer.optimizer import WindowedGaussianProcessRegressor
+
+
+def test_tell_replaces_lies_in_place(make_optimizer, rosen):
+    opt = make_optimizer('--liar-strategy', 'cl_max')
+    XX = opt.ask_initial(4)
+    opt.tell([(x, rosen(x)) for x in XX[:3]])
+    assert opt._optimizer.yi[:3] == [rosen(x) for x in XX[:3]]
+    assert opt._optimizer.yi[3] == 0.0 # still the initial lie
+
+    new = [x for batch in opt.ask(n_points=2) for x in batch]
+    # lies are the max of the known objectives
+    assert opt._optimizer.yi[4:] == [max(opt._optimizer.yi[:4])] * 2
+    opt.tell([(XX[3], rosen(XX[3]))] + [(x, rosen(x)) for x in new])
+    assert opt._optimizer.yi == [rosen(x) for x in XX + new]
+    assert len(opt._optimizer.Xi) == opt.counter == 6
+
+
+def test_refits_are_throttled(make_optimizer, rosen, monkeypatch):
+    opt = make_optimizer('--refit-every', '3')
+    fits = []
+    fit = opt._fit
+    monkeypatch.setattr(opt, '_fit', lambda: fits.append(len(opt._optimizer.yi)) or fit())
+
+    XX = opt.ask_initial(4)
+    opt.tell([(x, rosen(x)) for x in XX])
+    assert fits == [4]
+    for _ in range(3):
+        x, = next(opt.ask(n_points=1))
+        opt.tell([(x, rosen(x))])
+    # one fit for the 3 results
+    assert fits == [4, 7]
+
+
+def test_batch_is_proposed_with_few_fits(make_optimizer, rosen, monkeypatch):
+    opt = make_optimizer()
+    XX = opt.ask_initial(4)
+    opt.tell([(x, rosen(x)) for x in XX])
+    fits = []
+    fit = opt._fit
+    monkeypatch.setattr(opt, '_fit', lambda: fits.append(len(opt._optimizer.yi)) or fit())
+
+    new = [x for batch in opt.ask(n_points=40, batch_size=16) for x in batch]
+    assert len(new) == 40
+    assert len({tuple(x.values()) for x in XX + new}) == 44
+    # the first 16 points use the model fitted by tell
+    assert fits == [20, 36]
+
+    x = opt.ask()
+    assert isinstance(x, dict)
+    assert len(opt._optimizer.Xi) == opt.counter == 45
+
+
+def test_candidates_are_scored_by_chunks(make_optimizer, rosen, monkeypatch):
+    opt = make_optimizer('--surrogate-jobs', '2', '--n-candidates', '1000')
+    assert opt._optimizer.base_estimator_.n_jobs == 2
+    XX = opt.ask_initial(4)
+    opt.tell([(x, rosen(x)) for x in XX])
+    est = opt._optimizer.models[-1]
+    space = opt._optimizer.space
+    X = space.transform(space.rvs(n_samples=1000, random_state=0))
+    monkeypatch.setattr(opt, 'SCORE_CHUNK', 300)
+    values = opt._score(est, X, ['EI', 'LCB'])
+    for func, v in zip(['EI', 'LCB'], values):
+        expected = _skopt.acquisition(X, est, min(opt._optimizer.yi), func, opt._optimizer.acq_func_kwargs)
+        assert np.allclose(v, expected)
+
+
+def test_gp_window_keeps_best_and_recent_points():
+    gp = WindowedGaussianProcessRegressor(max_points=6)
+    y = np.array([5, 1, 7, 3, 9, 2, 8, 6, 4, 0])
+    assert list(np.flatnonzero(gp._window(y))) == [1, 5, 6, 7, 8, 9]
+
+
+def test_windowed_gp_is_fitted_on_a_bounded_number_of_points(make_optimizer, rosen):
+    opt = make_optimizer('--learner', 'GP', '--gp-max-points', '10', '--n-candidates', '500')
+    XX = opt.ask_initial(4)
+    opt.tell([(x, rosen(x)) for x in XX])
+    new = [x for batch in opt.ask(n_points=20) for x in batch]
+    opt.tell([(x, rosen(x)) for x in new])
+    assert len(opt._optimizer.yi) == 24
+    assert len(opt._optimizer.models[-1].y_train_) == 10
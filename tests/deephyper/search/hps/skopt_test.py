@@ -0,0 +1,28 @@
+import numpy as np
+
+from deephyper.search.hps.optimizer import _skopt
+from deephyper.search.hps.optimizer.optimizer import _Predictions
+
+
+def test_initial_points_and_refit(make_optimizer, rosen):
+    opt = make_optimizer('--learner', 'RF')
+    sk = opt._optimizer
+    assert _skopt.num_initial_points_left(sk) == 4
+    XX = opt.ask_initial(4)
+    assert _skopt.num_initial_points_left(sk) == 0
+    opt.tell([(x, rosen(x)) for x in XX])
+    model = sk.models[-1]
+    _skopt.refit(sk)
+    assert sk.models[-1] is not model
+    assert len(sk.Xi) == len(sk.yi) == 4 # nothing was told
+
+
+def test_acquisition_of_predictions():
+    mu, std = np.array([0.0, 1.0, 2.0]), np.array([1.0, 0.5, 0.0])
+    X = np.zeros((3, 1))
+    model = _Predictions(mu, std)
+    lcb = _skopt.acquisition(X, model, 0.0, 'LCB', {'kappa': 2.0})
+    assert np.allclose(lcb, mu - 2.0 * std)
+    ei = _skopt.acquisition(X, model, 0.0, 'EI', {'xi': 0.0})
+    # lower is better: the point with the most spread below y_opt is the best
+    assert np.argmin(ei) == 0 and ei[2] == 0.0
@@ -0,0 +1,19 @@
+import pytest
+
+from deephyper.search.nas.nas_search import NeuralArchitectureSearch
+
+
+class NasSearch(NeuralArchitectureSearch):
+    @staticmethod
+    def _extend_parser(parser):
+        return parser
+
+
+def test_data_is_shared_on_request():
+    assert not NasSearch.parse_args([]).share_data
+    assert NasSearch.parse_args(['--share-data']).share_data
+
+
+def test_mpi_evaluator_is_rejected():
+    with pytest.raises(SystemExit):
+        NasSearch.parse_args(['--evaluator', 'mpi'])
@@ -0,0 +1,35 @@
+import pytest
+
+from deephyper.search import Search
+
+PROBLEM = 'deephyper.benchmark.hps.rosen2.problem.Problem'
+RUN = 'deephyper.evaluator.test_functions.run'
+
+
+class NoSearch(Search):
+    @staticmethod
+    def _extend_parser(parser):
+        return parser
+
+
+def test_persistent_workers_option(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    search = NoSearch(PROBLEM, RUN, 'subprocess', persistent_workers=True, max_evals_per_worker=3)
+    try:
+        assert search.evaluator.persistent
+        assert search.evaluator._pool.max_evals_per_worker == 3
+    finally:
+        search.evaluator.shutdown()
+
+    with pytest.raises(ValueError):
+        NoSearch(PROBLEM, RUN, 'threadPool', persistent_workers=True)
+
+
+def test_cache_options(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    search = NoSearch(PROBLEM, RUN, 'threadPool', cache_file=str(tmp_path / 'cache.db'), cache_max_entries=10)
+    try:
+        assert search.evaluator._cache.max_entries == 10
+        assert NoSearch.parse_args(['--cache-max-entries', '5']).cache_max_entries == 5
+    finally:
+        search.evaluator.shutdown()